@@ -1,7 +1,7 @@
 from django import forms
 from django.contrib.auth import get_user_model
 
-from hub.models import Assignment, Material
+from hub.models import Assignment, Cohort, Material
 
 
 class CreateMaterialForm(forms.ModelForm):
@@ -26,18 +26,42 @@ class CreateMaterialForm(forms.ModelForm):
 class CreateAssignmentForm(forms.ModelForm):
     assigned_to = forms.ModelMultipleChoiceField(
         queryset=get_user_model().objects.filter(user_type="student"),
-        required=True,
+        required=False,
         widget=forms.SelectMultiple,
     )
+    cohorts = forms.ModelMultipleChoiceField(
+        queryset=Cohort.objects.all(),
+        required=False,
+        widget=forms.SelectMultiple,
+        help_text="Every student in these cohorts is assigned the work",
+    )
 
     class Meta:
         model = Assignment
-        fields = ("title", "description", "material", "due_date", "assigned_to")
+        fields = (
+            "title",
+            "description",
+            "material",
+            "due_date",
+            "assigned_to",
+            "cohorts",
+        )
         widgets = {
             "due_date": forms.DateTimeInput(attrs={"type": "datetime-local"}),
             "description": forms.Textarea(attrs={"rows": 3}),
         }
 
+    def __init__(self, *args, created_by=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only the teacher's own cohorts can be assigned work
+        self.fields["cohorts"].queryset = Cohort.objects.filter(created_by=created_by)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get("assigned_to") and not cleaned_data.get("cohorts"):
+            raise forms.ValidationError("Choose at least one student or cohort.")
+        return cleaned_data
+
     def save(self, commit=True):
         assignment = super().save(commit=False)
         if commit:
@@ -46,6 +70,34 @@ class CreateAssignmentForm(forms.ModelForm):
         return assignment
 
 
+class CreateCohortForm(forms.ModelForm):
+    students = forms.ModelMultipleChoiceField(
+        queryset=get_user_model().objects.filter(user_type="student"),
+        required=False,
+        widget=forms.SelectMultiple,
+    )
+
+    class Meta:
+        model = Cohort
+        fields = ("name", "description", "students")
+        widgets = {
+            "description": forms.Textarea(attrs={"rows": 3}),
+        }
+
+    def __init__(self, *args, created_by=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.instance.created_by = created_by
+
+    def clean_name(self):
+        name = self.cleaned_data["name"]
+        taken = Cohort.objects.filter(
+            created_by=self.instance.created_by, name=name
+        ).exclude(pk=self.instance.pk)
+        if taken.exists():
+            raise forms.ValidationError("You already have a cohort with this name.")
+        return name
+
+
 class AnnouncementForm(forms.Form):
     RECIPIENT_CHOICES = (
         ("students", "All Students"),
@@ -53,3 +105,24 @@ class AnnouncementForm(forms.Form):
     )
     recipient_group = forms.ChoiceField(choices=RECIPIENT_CHOICES)
     content = forms.CharField(widget=forms.Textarea(attrs={"rows": 4}))
+
+
+class GradebookImportForm(forms.Form):
+    gradebook = forms.FileField(
+        help_text="CSV or XLSX with username, assignment, score, grade and feedback"
+    )
+    dry_run = forms.BooleanField(
+        required=False, initial=True, help_text="Preview the changes only"
+    )
+
+    def clean_gradebook(self):
+        gradebook = self.cleaned_data["gradebook"]
+        if not gradebook.name.lower().endswith((".csv", ".xlsx")):
+            raise forms.ValidationError("Upload a .csv or .xlsx file.")
+        return gradebook
+
+
+class GradebookExportForm(forms.Form):
+    format = forms.ChoiceField(
+        choices=[("csv", "CSV"), ("xlsx", "Excel workbook")], required=False
+    )
@@ -11,6 +11,10 @@ urlpatterns = [
     path("parent/", views.parent_dashboard, name="parent"),
     path("create-material/", views.create_material, name="create_material"),
     path("create-assignment/", views.create_assignment, name="create_assignment"),
+    path("create-cohort/", views.create_cohort, name="create_cohort"),
+    path("grading/", views.grading_queue, name="grading_queue"),
+    path("grading/import/", views.import_grades, name="import_grades"),
+    path("grading/export/", views.export_grades, name="export_grades"),
     path("students/", views.students_list, name="students_list"),
     path("announcement/", views.send_announcement, name="send_announcement"),
     path("firebase-settings/", views.firebase_settings, name="firebase_settings"),
@@ -1,15 +1,33 @@
+import tempfile
+
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
 
 from chat.models import ChatRoom, Message
-from hub.models import Assignment, Material, StudentProgress
-
-from .forms import AnnouncementForm, CreateAssignmentForm, CreateMaterialForm
+from hub.forms import GradingQueueForm
+from hub.gradebook import (apply_import, gradebook_csv, gradebook_rows,
+                           plan_import, read_gradebook, write_gradebook_xlsx)
+from hub.grading import GradingError, bulk_grade, grading_page, validate_grades
+from hub.models import (Assignment, AssignmentSubmission, Material,
+                        StudentProgress)
+from hub.pagination import InvalidCursor
+from hub.uploads import finish_upload, open_completed_upload
+
+from .forms import (AnnouncementForm, CreateAssignmentForm, CreateCohortForm,
+                    CreateMaterialForm, GradebookExportForm,
+                    GradebookImportForm)
 
 User = get_user_model()
 
+# Rows of a gradebook diff shown on the page
+PREVIEW_ROWS = 200
+
 
 @login_required
 def dashboard_index(request):
@@ -127,13 +145,28 @@ def create_material(request):
         return redirect("users:dashboard")
 
     if request.method == "POST":
-        form = CreateMaterialForm(request.POST, request.FILES)
+        files = request.FILES
+        upload = None
+        upload_id = request.POST.get("upload_id")
+        if upload_id and "file" not in files:
+            # A file sent earlier through the resumable upload API
+            try:
+                upload = open_completed_upload(upload_id, request.user, "material")
+                files = MultiValueDict({"file": [upload]})
+            except ValidationError as e:
+                messages.error(request, e.messages[0])
+
+        form = CreateMaterialForm(request.POST, files)
         if form.is_valid():
             material = form.save(commit=False)
             material.uploaded_by = request.user
             material.save()
+            if upload:
+                finish_upload(upload)
             messages.success(request, "Material uploaded successfully.")
             return redirect("dashboard:teacher")
+        if upload:
+            upload.close()
     else:
         form = CreateMaterialForm()
 
@@ -147,20 +180,173 @@ def create_assignment(request):
         return redirect("users:dashboard")
 
     if request.method == "POST":
-        form = CreateAssignmentForm(request.POST)
+        form = CreateAssignmentForm(request.POST, created_by=request.user)
         if form.is_valid():
             assignment = form.save(commit=False)
             assignment.created_by = request.user
             assignment.save()
+            # Cohort members are added in the background (hub.fanout)
             form.save_m2m()
             messages.success(request, "Assignment created and assigned to students.")
             return redirect("dashboard:teacher")
     else:
-        form = CreateAssignmentForm()
+        form = CreateAssignmentForm(created_by=request.user)
 
     return render(request, "dashboard/create_assignment.html", {"form": form})
 
 
+@login_required
+def create_cohort(request):
+    """Teacher view to group students into a cohort"""
+    if not request.user.is_teacher:
+        return redirect("users:dashboard")
+
+    if request.method == "POST":
+        form = CreateCohortForm(request.POST, created_by=request.user)
+        if form.is_valid():
+            cohort = form.save()
+            messages.success(request, f"Cohort '{cohort.name}' created.")
+            return redirect("dashboard:create_assignment")
+    else:
+        form = CreateCohortForm(created_by=request.user)
+
+    return render(request, "dashboard/create_cohort.html", {"form": form})
+
+
+def _submitted_grades(post):
+    """Grade rows from the queue form, skipping rows left blank"""
+    rows = []
+    for pk in post.getlist("submission"):
+        row = {
+            "id": pk,
+            "numeric_score": post.get(f"score-{pk}", "").strip(),
+            "grade": post.get(f"grade-{pk}", ""),
+            "teacher_feedback": post.get(f"feedback-{pk}", "").strip(),
+        }
+        if row["numeric_score"] or row["grade"]:
+            rows.append(row)
+    return rows
+
+
+@login_required
+def grading_queue(request):
+    """Teacher view listing ungraded submissions, graded a page at a time"""
+    if not request.user.is_teacher:
+        return redirect("users:dashboard")
+
+    if request.method == "POST":
+        grades, errors = validate_grades(_submitted_grades(request.POST))
+        if errors:
+            messages.error(request, "Scores must be whole numbers from 0 to 100.")
+        elif grades:
+            try:
+                graded = bulk_grade(request.user, grades)
+                messages.success(request, f"Graded {len(graded)} submissions.")
+            except GradingError as e:
+                messages.error(request, str(e))
+        return redirect(request.get_full_path())
+
+    form = GradingQueueForm(request.GET)
+    params = form.cleaned_data if form.is_valid() else {}
+    try:
+        submissions, next_cursor = grading_page(
+            request.user,
+            params.get("assignment"),
+            params.get("cursor"),
+            params.get("limit"),
+        )
+    except InvalidCursor:
+        params = {**params, "cursor": None}
+        submissions, next_cursor = grading_page(
+            request.user, params.get("assignment"), None, params.get("limit")
+        )
+
+    next_page_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query["cursor"] = next_cursor
+        next_page_url = f"{request.path}?{query.urlencode()}"
+
+    context = {
+        "submissions": submissions,
+        "assignments": Assignment.objects.filter(created_by=request.user).only(
+            "pk", "title"
+        ),
+        "selected_assignment": params.get("assignment"),
+        "grade_choices": AssignmentSubmission.GRADE_CHOICES,
+        "next_page_url": next_page_url,
+    }
+    return render(request, "dashboard/grading_queue.html", context)
+
+
+@login_required
+def import_grades(request):
+    """Teacher view to preview and apply a gradebook spreadsheet"""
+    if not request.user.is_teacher:
+        return redirect("users:dashboard")
+
+    plan = None
+    if request.method == "POST":
+        form = GradebookImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            gradebook = form.cleaned_data["gradebook"]
+            try:
+                rows = read_gradebook(gradebook, gradebook.name)
+            except (ValueError, KeyError, UnicodeDecodeError) as e:
+                form.add_error("gradebook", f"Cannot read gradebook: {e}")
+            else:
+                plan = plan_import(request.user, rows)
+                if not form.cleaned_data["dry_run"]:
+                    apply_import(request.user, plan)
+                    messages.success(
+                        request, f"Updated {len(plan.changes)} grades from the sheet."
+                    )
+    else:
+        form = GradebookImportForm()
+
+    context = {
+        "form": form,
+        "plan": plan,
+        "changes": plan.changes[:PREVIEW_ROWS] if plan else [],
+        "errors": plan.errors[:PREVIEW_ROWS] if plan else [],
+    }
+    return render(request, "dashboard/import_grades.html", context)
+
+
+@login_required
+def export_grades(request):
+    """Teacher download of the gradebook: students by assignments, streamed"""
+    if not request.user.is_teacher:
+        return redirect("users:dashboard")
+
+    form = GradebookExportForm(request.GET)
+    export_format = (form.is_valid() and form.cleaned_data["format"]) or "csv"
+    filename = f"gradebook-{timezone.localdate():%Y-%m-%d}.{export_format}"
+    rows = gradebook_rows(request.user)
+
+    if export_format == "xlsx":
+        # XLSX is a zip whose index comes last, so it is built in a temporary
+        # file (row by row, in write-only mode) and then streamed from disk
+        handle = tempfile.TemporaryFile()
+        write_gradebook_xlsx(rows, handle)
+        handle.seek(0)
+        response = FileResponse(
+            handle,
+            as_attachment=True,
+            filename=filename,
+            content_type=(
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            ),
+        )
+    else:
+        response = StreamingHttpResponse(
+            gradebook_csv(rows), content_type="text/csv; charset=utf-8"
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response["Cache-Control"] = "private, no-store"
+    return response
+
+
 @login_required
 def students_list(request):
     """List all students for the teacher to manage"""
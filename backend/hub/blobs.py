@@ -0,0 +1,128 @@
+"""
+Reference counting for content-addressed material files.
+
+Every stored material file has a FileBlob row counting the materials that
+point at it. Uploading a file that already exists only bumps the count;
+blobs whose count has dropped to zero are removed by ``gc_file_blobs``.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import (Case, Count, F, IntegerField, OuterRef,
+                              PositiveIntegerField, Subquery, Value, When)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .files import preview_name_for
+from .models import FileBlob, Material
+from .storage import material_storage
+
+logger = logging.getLogger(__name__)
+
+# Unreferenced blobs younger than this may be about to be re-used by an
+# upload that found the file on disk but has not recorded its reference yet.
+GC_GRACE_PERIOD = timedelta(hours=1)
+
+
+def retain_blob(name, sha256="", size=0):
+    """Record one more reference to the stored file ``name``"""
+    with transaction.atomic():
+        blob, created = FileBlob.objects.get_or_create(
+            name=name, defaults={"sha256": sha256, "size": size or 0, "ref_count": 1}
+        )
+        if not created:
+            FileBlob.objects.filter(pk=blob.pk).update(
+                ref_count=F("ref_count") + 1, updated_at=timezone.now()
+            )
+
+
+def retain_blobs(references):
+    """
+    Bulk form of ``retain_blob`` for ``{name: (sha256, size, count)}``.
+
+    Missing rows are inserted, then every count is raised with one UPDATE
+    per chunk of names.
+    """
+    names = list(references)
+    FileBlob.objects.bulk_create(
+        [
+            FileBlob(name=name, sha256=sha256, size=size or 0, ref_count=0)
+            for name, (sha256, size, _) in references.items()
+        ],
+        ignore_conflicts=True,
+    )
+    now = timezone.now()
+    for start in range(0, len(names), 500):
+        chunk = names[start : start + 500]
+        FileBlob.objects.filter(name__in=chunk).update(
+            ref_count=F("ref_count")
+            + Case(
+                *[When(name=name, then=Value(references[name][2])) for name in chunk],
+                default=Value(0),
+                output_field=PositiveIntegerField(),
+            ),
+            updated_at=now,
+        )
+
+
+def release_blob(name):
+    """Drop one reference; the file itself is left for garbage collection"""
+    if name:
+        FileBlob.objects.filter(name=name, ref_count__gt=0).update(
+            ref_count=F("ref_count") - 1, updated_at=timezone.now()
+        )
+
+
+def update_blob_refs(material, previous_name):
+    """Move a material's reference from ``previous_name`` to its current file"""
+    current_name = material.file.name or ""
+    if current_name == previous_name:
+        return
+    if current_name:
+        retain_blob(current_name, material.file_sha256, material.file_size)
+    release_blob(previous_name)
+
+
+def reconcile_ref_counts():
+    """Recount references from the material table in one UPDATE"""
+    references = (
+        Material.objects.filter(file=OuterRef("name"))
+        .values("file")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    return FileBlob.objects.update(
+        ref_count=Coalesce(Subquery(references, output_field=IntegerField()), Value(0))
+    )
+
+
+def collect_garbage(grace_period=GC_GRACE_PERIOD, dry_run=False):
+    """Delete unreferenced blobs older than ``grace_period``; returns names"""
+    cutoff = timezone.now() - grace_period
+    storage = material_storage()
+    removed = []
+    candidates = FileBlob.objects.filter(ref_count=0, updated_at__lt=cutoff)
+    for blob in candidates.only("pk", "name").iterator():
+        if dry_run:
+            removed.append(blob.name)
+            continue
+        with transaction.atomic():
+            # Re-check under a row lock in case an upload just claimed it
+            locked = (
+                FileBlob.objects.select_for_update()
+                .filter(pk=blob.pk, ref_count=0)
+                .first()
+            )
+            if locked is None or Material.objects.filter(file=blob.name).exists():
+                continue
+            try:
+                storage.delete(blob.name)
+                storage.delete(preview_name_for(blob.name))
+            except OSError as e:
+                logger.error(f"Failed to delete blob {blob.name}: {e}")
+                continue
+            locked.delete()
+        removed.append(blob.name)
+    return removed
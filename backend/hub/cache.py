@@ -0,0 +1,78 @@
+import logging
+import time
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+VERSION_TIMEOUT = None  # version counters never expire
+
+
+def cache_get(key, default=None):
+    """Read from the cache, treating an unreachable backend as a miss"""
+    try:
+        return cache.get(key, default)
+    except Exception as e:
+        logger.warning(f"Cache read failed for {key}: {e}")
+        return default
+
+
+def cache_set(key, value, timeout=None):
+    """Write to the cache, ignoring backend outages"""
+    try:
+        cache.set(key, value, timeout)
+    except Exception as e:
+        logger.warning(f"Cache write failed for {key}: {e}")
+
+
+def _version_key(namespace):
+    return f"hub:version:{namespace}"
+
+
+def _initial_version():
+    # Seeded from the clock so an evicted counter never restarts at a
+    # number that older entries were stored under.
+    return int(time.time() * 1000)
+
+
+def get_version(namespace):
+    """Current version number of a cache namespace"""
+    key = _version_key(namespace)
+    try:
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, _initial_version(), VERSION_TIMEOUT)
+            version = cache.get(key, 0)
+        return version
+    except Exception as e:
+        logger.warning(f"Cache version read failed for {namespace}: {e}")
+        return 0
+
+
+def bump_version(namespace):
+    """Invalidate every key built from ``namespace`` by moving its version on"""
+    key = _version_key(namespace)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Counter missing or evicted; any new seed invalidates old keys
+            cache.add(key, _initial_version(), VERSION_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Cache version bump failed for {namespace}: {e}")
+
+
+def user_namespace(user_id):
+    """Version namespace for everything rendered specifically for one user"""
+    return f"user:{user_id}"
+
+
+def get_redis_client():
+    """Raw redis client behind the default cache, or None for other backends"""
+    from django.core.cache import caches
+    from django.core.cache.backends.redis import RedisCache
+
+    backend = caches["default"]
+    if not isinstance(backend, RedisCache):
+        return None
+    return backend._cache.get_client(write=True)
@@ -0,0 +1,166 @@
+from django.db.models import Count, F
+
+from .cache import cache_get, cache_set, get_version
+from .models import Material
+from .pagination import keyset_page
+from .tags import TAG_MODE_ANY, filter_by_tags, parse_tags
+
+DEFAULT_PAGE_SIZE = 24
+
+FACETS_CACHE_NAMESPACE = "catalog-facets"
+FACETS_CACHE_TIMEOUT = 60 * 60  # invalidated by version bumps, not expiry
+
+# Newest first; ``id`` breaks ties so the cursor position is unique.
+# Served by the (is_active, created_at) index, and by (subject, grade_level)
+# or (material_type, difficulty_level) when those filters are applied.
+CATALOG_ORDERING = ("-created_at", "-id")
+
+# Trending first (hub.popularity); only materials with recorded activity.
+# Walks the MaterialPopularity score index.
+POPULAR_ORDERING = ("-popularity_score", "-id")
+SORT_POPULAR = "popular"
+
+CATALOG_FILTERS = ("subject", "grade_level", "material_type", "difficulty_level")
+
+# Columns needed to render a catalog card or its JSON representation
+CATALOG_FIELDS = (
+    "id",
+    "title",
+    "material_type",
+    "difficulty_level",
+    "grade_level",
+    "estimated_time",
+    "external_link",
+    "file",
+    "file_size",
+    "file_mime_type",
+    "file_sha256",
+    "preview_name",
+    "tags",
+    "created_at",
+    "subject__id",
+    "subject__name",
+    "subject__color_code",
+)
+
+
+def catalog_queryset(filters):
+    """Active materials narrowed by the cleaned catalog filters"""
+    queryset = (
+        Material.objects.filter(is_active=True)
+        .select_related("subject")
+        .only(*CATALOG_FIELDS)
+    )
+    lookups = {name: filters[name] for name in CATALOG_FILTERS if filters.get(name)}
+    queryset = queryset.filter(**lookups)
+    if filters.get("tags"):
+        queryset = filter_by_tags(
+            queryset, filters["tags"], filters.get("tag_mode") or TAG_MODE_ANY
+        )
+    return queryset
+
+
+def catalog_page(filters):
+    """Return ``(materials, next_cursor)`` for one page of the catalog"""
+    queryset = catalog_queryset(filters)
+    ordering = CATALOG_ORDERING
+    if filters.get("sort") == SORT_POPULAR:
+        queryset = queryset.filter(popularity__isnull=False).annotate(
+            popularity_score=F("popularity__score")
+        )
+        ordering = POPULAR_ORDERING
+    return keyset_page(
+        queryset,
+        ordering,
+        cursor=filters.get("cursor") or None,
+        limit=filters.get("limit") or DEFAULT_PAGE_SIZE,
+    )
+
+
+def serialize_material(material):
+    """JSON-friendly representation of a catalog entry"""
+    return {
+        "id": material.pk,
+        "title": material.title,
+        "subject": {
+            "id": material.subject.pk,
+            "name": material.subject.name,
+            "color_code": material.subject.color_code,
+        },
+        "material_type": material.material_type,
+        "difficulty_level": material.difficulty_level,
+        "grade_level": material.grade_level,
+        "estimated_time": material.estimated_time,
+        "tags": parse_tags(material.tags),
+        "has_file": bool(material.file),
+        "file_size": material.file_size,
+        "file_mime_type": material.file_mime_type or None,
+        "preview_url": material.preview_url,
+        "external_link": material.external_link or None,
+        "created_at": material.created_at.isoformat(),
+    }
+
+
+def _choice_facet(counts, choices):
+    """Counts for one choices-backed facet, in declaration order"""
+    return [
+        {"value": value, "label": label, "count": counts[value]}
+        for value, label in choices
+        if counts.get(value)
+    ]
+
+
+def compute_facets():
+    """
+    Count active materials per subject, grade, type and difficulty.
+
+    A single GROUP BY over all four columns returns one row per distinct
+    combination; the per-facet totals are rolled up from those rows.
+    """
+    rows = (
+        Material.objects.filter(is_active=True)
+        .values(
+            "subject_id",
+            "subject__name",
+            "grade_level",
+            "material_type",
+            "difficulty_level",
+        )
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+
+    subjects = {}
+    grades, types, difficulties = {}, {}, {}
+    total = 0
+    for row in rows:
+        n = row["n"]
+        total += n
+        subject = subjects.setdefault(
+            row["subject_id"],
+            {"id": row["subject_id"], "name": row["subject__name"], "count": 0},
+        )
+        subject["count"] += n
+        grades[row["grade_level"]] = grades.get(row["grade_level"], 0) + n
+        types[row["material_type"]] = types.get(row["material_type"], 0) + n
+        difficulties[row["difficulty_level"]] = (
+            difficulties.get(row["difficulty_level"], 0) + n
+        )
+
+    return {
+        "total": total,
+        "subject": sorted(subjects.values(), key=lambda s: s["name"]),
+        "grade_level": _choice_facet(grades, Material.GRADE_LEVELS),
+        "material_type": _choice_facet(types, Material.MATERIAL_TYPES),
+        "difficulty_level": _choice_facet(difficulties, Material.DIFFICULTY_LEVELS),
+    }
+
+
+def catalog_facets():
+    """Facet counts from the cache, recomputed after any material change"""
+    key = f"hub:facets:{get_version(FACETS_CACHE_NAMESPACE)}"
+    facets = cache_get(key)
+    if facets is None:
+        facets = compute_facets()
+        cache_set(key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
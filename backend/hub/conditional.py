@@ -0,0 +1,184 @@
+"""
+Validators for conditional GETs on the hub pages.
+
+Each page's state, combined with the URL, the user and the user's cache
+version, becomes the ETag. A matching ``If-None-Match`` is answered with
+304 by ``django.views.decorators.http.condition`` before the view runs.
+
+No page pays a query of its own for this. The catalog and calendar feeds
+are validated by cache versions alone, which saves already bump. Detail
+pages load their row here, once, and the view renders that same object,
+so its ``updated_at`` columns cost nothing extra. Only the assignment
+list runs an aggregate, because edits to assignments bump no version.
+
+Pages rendered for a signed-in user carry per-user data that has no
+timestamp, so they only get an ETag; anonymous material detail pages also
+get Last-Modified. Assignment pages change with the calendar (due-date badges)
+and never get Last-Modified.
+"""
+
+import hashlib
+
+from django.contrib import messages
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .cache import get_version, user_namespace
+from .catalog import FACETS_CACHE_NAMESPACE, SORT_POPULAR
+from .feed import feed_queryset
+from .ical import feed_state, feed_user_id
+from .models import Assignment, Material
+from .popularity import POPULARITY_CACHE_NAMESPACE
+from .recommendations import RECOMMENDATIONS_CACHE_NAMESPACE
+
+
+def _user_stamp(request):
+    user = request.user
+    if not user.is_authenticated:
+        return "anon"
+    return f"{user.pk}:{get_version(user_namespace(user.pk))}"
+
+
+def _state(request, key, compute):
+    """Compute the page's validator inputs once per request"""
+    cache = request.__dict__.setdefault("_conditional_state", {})
+    if key not in cache:
+        # Flash messages are shown once; a 304 would swallow them
+        cache[key] = None if len(messages.get_messages(request)) else compute()
+    return cache[key]
+
+
+def _etag(request, state):
+    if state is None:
+        return None
+    parts = [request.get_full_path(), _user_stamp(request)]
+    parts.extend(str(value) for value in state.values())
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def _last_modified(request, state, *fields):
+    if state is None or request.user.is_authenticated:
+        return None
+    stamps = [state[field] for field in fields if state.get(field)]
+    return max(stamps) if stamps else None
+
+
+def _row(request, key, load):
+    """Load a page's object once per request, for the validators and the view"""
+    rows = request.__dict__.setdefault("_conditional_rows", {})
+    if key not in rows:
+        rows[key] = load()
+    return rows[key]
+
+
+def _materials_list_state(request):
+    def compute():
+        # Bumped by every material and subject change
+        state = {"facets": get_version(FACETS_CACHE_NAMESPACE)}
+        if request.GET.get("sort") == SORT_POPULAR:
+            # The order moves with every activity flush
+            state["popularity"] = get_version(POPULARITY_CACHE_NAMESPACE)
+        return state
+
+    return _state(request, "materials_list", compute)
+
+
+def materials_list_etag(request):
+    return _etag(request, _materials_list_state(request))
+
+
+def detail_material(request, pk):
+    """The material shown by ``material_detail``, or None"""
+    return _row(
+        request,
+        ("material", pk),
+        lambda: Material.objects.select_related("subject").filter(pk=pk).first(),
+    )
+
+
+def _material_state(request, pk):
+    def compute():
+        material = detail_material(request, pk)
+        if material is None:
+            return None
+        return {
+            "updated_at": material.updated_at,
+            "subject__updated_at": material.subject.updated_at,
+            # The similar-materials panel changes when they are rebuilt
+            "recommendations": get_version(RECOMMENDATIONS_CACHE_NAMESPACE),
+        }
+
+    return _state(request, ("material", pk), compute)
+
+
+def material_detail_etag(request, pk):
+    return _etag(request, _material_state(request, pk))
+
+
+def material_detail_last_modified(request, pk):
+    return _last_modified(
+        request, _material_state(request, pk), "updated_at", "subject__updated_at"
+    )
+
+
+def _assignments_list_state(request):
+    def compute():
+        assignments = feed_queryset(request.user)
+        now = timezone.now()
+        return {
+            # Due-date badges change with the calendar, not the rows
+            "today": timezone.localdate(now),
+            **assignments.aggregate(
+                latest=Max("updated_at"),
+                material_latest=Max("material__updated_at"),
+                subject_latest=Max("material__subject__updated_at"),
+                count=Count("pk"),
+                overdue=Count("pk", filter=Q(due_date__lt=now)),
+            ),
+        }
+
+    return _state(request, "assignments_list", compute)
+
+
+def assignments_list_etag(request):
+    return _etag(request, _assignments_list_state(request))
+
+
+def detail_assignment(request, assignment_id):
+    """The assignment shown by ``assignment_detail``, or None"""
+    return _row(
+        request,
+        ("assignment", assignment_id),
+        lambda: Assignment.objects.select_related("material__subject", "created_by")
+        .filter(pk=assignment_id)
+        .first(),
+    )
+
+
+def _assignment_state(request, assignment_id):
+    def compute():
+        assignment = detail_assignment(request, assignment_id)
+        if assignment is None:
+            return None
+        now = timezone.now()
+        return {
+            "updated_at": assignment.updated_at,
+            "material__updated_at": assignment.material.updated_at,
+            "material__subject__updated_at": assignment.material.subject.updated_at,
+            "today": timezone.localdate(now),
+            "overdue": assignment.due_date < now,
+        }
+
+    return _state(request, ("assignment", assignment_id), compute)
+
+
+def assignment_detail_etag(request, assignment_id):
+    return _etag(request, _assignment_state(request, assignment_id))
+
+
+def calendar_feed_etag(request, token):
+    # Versions only, never a query: calendar apps poll this constantly
+    user_id = feed_user_id(token)
+    if user_id is None:
+        return None
+    return feed_state(user_id)[0]
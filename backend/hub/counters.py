@@ -0,0 +1,151 @@
+"""
+Write-behind buffering for ``Material.download_count``.
+
+Downloads are counted in Redis (a hash of material id -> pending hits) when
+the default cache is Redis, or in a per-process buffer otherwise. Pending
+hits are written with one ``UPDATE ... SET download_count = download_count
++ CASE ...`` per chunk, either opportunistically after
+``DOWNLOAD_COUNTER_FLUSH_INTERVAL`` seconds or by the
+``flush_download_counts`` management command. With Redis the interval is a
+``SET NX`` key with that expiry, so the first download after it lapses
+flushes for every worker, and only one worker does. The same flush adds
+them to the trending scores in ``hub.popularity``.
+"""
+
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.db.models.functions import Coalesce
+
+from .cache import get_redis_client
+from .models import Material
+from .popularity import EVENT_WEIGHTS, add_activity
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "hub:downloads:pending"
+FLUSH_LOCK_KEY = "hub:downloads:flush-lock"
+FLUSH_CHUNK_SIZE = 500
+
+_buffer = Counter()
+_buffer_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _flush_interval():
+    return getattr(settings, "DOWNLOAD_COUNTER_FLUSH_INTERVAL", 30)
+
+
+def apply_increments(increments):
+    """Add ``{material_id: hits}`` to download_count in bulk"""
+    items = [(pk, hits) for pk, hits in increments.items() if hits]
+    for start in range(0, len(items), FLUSH_CHUNK_SIZE):
+        chunk = items[start : start + FLUSH_CHUNK_SIZE]
+        Material.objects.filter(pk__in=[pk for pk, _ in chunk]).update(
+            download_count=Coalesce(F("download_count"), Value(0))
+            + Case(
+                *[When(pk=pk, then=Value(hits)) for pk, hits in chunk],
+                default=Value(0),
+                output_field=PositiveIntegerField(),
+            )
+        )
+    # Trending scores follow downloads at flush time, not per request
+    add_activity({pk: hits * EVENT_WEIGHTS["download"] for pk, hits in items})
+    return len(items)
+
+
+def _record_redis(client, material_id):
+    """Count a hit; True when this worker should flush now"""
+    client.hincrby(PENDING_KEY, str(material_id), 1)
+    interval = max(1, int(_flush_interval()))
+    return bool(client.set(FLUSH_LOCK_KEY, "1", nx=True, ex=interval))
+
+
+def _flush_redis(client):
+    """Atomically claim the pending hash, apply it, and restore it on failure"""
+    processing_key = f"{PENDING_KEY}:{uuid.uuid4().hex}"
+    try:
+        client.rename(PENDING_KEY, processing_key)
+    except Exception:
+        # Nothing pending (RENAME fails on a missing key)
+        return 0
+
+    increments = {
+        int(pk): int(hits) for pk, hits in client.hgetall(processing_key).items()
+    }
+    try:
+        with transaction.atomic():
+            flushed = apply_increments(increments)
+    except Exception:
+        for pk, hits in increments.items():
+            client.hincrby(PENDING_KEY, str(pk), hits)
+        client.delete(processing_key)
+        raise
+    client.delete(processing_key)
+    return flushed
+
+
+def _flush_memory():
+    global _last_flush
+    with _buffer_lock:
+        increments = dict(_buffer)
+        _buffer.clear()
+        _last_flush = time.monotonic()
+    try:
+        with transaction.atomic():
+            return apply_increments(increments)
+    except Exception:
+        with _buffer_lock:
+            _buffer.update(increments)
+        raise
+
+
+def flush_download_counts():
+    """Write all pending hits to the database; returns materials updated"""
+    flushed = _flush_memory()
+    client = get_redis_client()
+    if client is not None:
+        flushed += _flush_redis(client)
+    return flushed
+
+
+def record_download(material_id):
+    """Count one download without touching the material row"""
+    client = get_redis_client()
+    if client is not None:
+        try:
+            due = _record_redis(client, material_id)
+        except Exception as e:
+            logger.warning(f"Redis download counter unavailable: {e}")
+        else:
+            if due:
+                try:
+                    _flush_redis(client)
+                except Exception as e:
+                    logger.error(f"Failed to flush download counts: {e}")
+            return
+
+    with _buffer_lock:
+        _buffer[material_id] += 1
+        due = time.monotonic() - _last_flush >= _flush_interval()
+    if due:
+        try:
+            _flush_memory()
+        except Exception as e:
+            logger.error(f"Failed to flush download counts: {e}")
+
+
+@atexit.register
+def _flush_on_exit():
+    if _buffer:
+        try:
+            _flush_memory()
+        except Exception as e:
+            logger.error(f"Lost {sum(_buffer.values())} buffered downloads: {e}")
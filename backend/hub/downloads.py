@@ -0,0 +1,186 @@
+"""
+Serving protected media files.
+
+After the view has checked permissions, the byte transfer is handed to the
+front proxy when ``SENDFILE_BACKEND`` is configured:
+
+* ``nginx``  - ``X-Accel-Redirect`` to an ``internal`` location that aliases
+  MEDIA_ROOT under ``SENDFILE_URL_PREFIX``
+* ``apache`` - ``X-Sendfile`` with the absolute file path (mod_xsendfile)
+
+Otherwise the file is streamed from Django with support for single byte
+ranges (``Range``/``If-Range``) and ``If-None-Match`` revalidation.
+"""
+
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (FileResponse, HttpResponse, HttpResponseNotModified,
+                         StreamingHttpResponse)
+from django.utils.http import (content_disposition_header, http_date,
+                               parse_etags, quote_etag)
+
+from .files import guess_mime_type
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Types browsers can display or seek in place; everything else downloads
+INLINE_TYPE_PREFIXES = ("audio/", "video/", "image/", "application/pdf", "text/")
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _etag_matches(header, etag):
+    """Weak comparison as required for If-None-Match"""
+    if not header:
+        return False
+    tags = parse_etags(header)
+    return "*" in tags or etag.removeprefix("W/") in {
+        tag.removeprefix("W/") for tag in tags
+    }
+
+
+def parse_range(header, size):
+    """
+    Parse a single ``bytes=`` range against a file of ``size`` bytes.
+
+    Returns ``(start, end)`` inclusive, None when the header should be
+    ignored (absent, malformed or multi-range), or raises ValueError when
+    the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+
+def _iter_range(fieldfile, start, length):
+    """Yield ``length`` bytes of ``fieldfile`` starting at ``start``"""
+    handle = fieldfile.storage.open(fieldfile.name, "rb")
+    try:
+        handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+def _offload_response(fieldfile):
+    """Empty response telling the proxy which file to send, or None"""
+    backend = getattr(settings, "SENDFILE_BACKEND", "")
+    if backend == "nginx":
+        response = HttpResponse()
+        prefix = settings.SENDFILE_URL_PREFIX.rstrip("/")
+        response["X-Accel-Redirect"] = f"{prefix}/{quote(fieldfile.name)}"
+        return response
+    if backend == "apache":
+        response = HttpResponse()
+        response["X-Sendfile"] = fieldfile.path
+        return response
+    return None
+
+
+def serve_file(
+    request,
+    fieldfile,
+    *,
+    filename=None,
+    size=None,
+    etag=None,
+    last_modified=None,
+    content_type=None,
+):
+    """
+    Build the response that delivers ``fieldfile`` to an authorized user.
+
+    Callers should pass ``size``, ``etag`` and ``last_modified`` when they
+    already know them so no storage stat is needed before offloading.
+    """
+    filename = filename or fieldfile.name.rsplit("/", 1)[-1]
+    content_type = content_type or guess_mime_type(filename)
+    as_attachment = not content_type.startswith(INLINE_TYPE_PREFIXES)
+
+    response = _offload_response(fieldfile)
+    if response is not None:
+        # The proxy handles Range and conditional requests itself
+        response["Content-Type"] = content_type
+        response["Content-Disposition"] = content_disposition_header(
+            as_attachment, filename
+        )
+        return response
+
+    if size is None:
+        size = fieldfile.size
+    if etag is None:
+        mtime = last_modified.timestamp() if last_modified else 0
+        etag = f"{size:x}-{int(mtime):x}"
+    etag = quote_etag(etag)
+
+    if _etag_matches(request.META.get("HTTP_IF_NONE_MATCH"), etag):
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return response
+
+    range_header = request.META.get("HTTP_RANGE")
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if if_range and if_range.strip() != etag:
+        # The client's partial copy is stale: send the whole file instead
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+    if byte_range is None:
+        response = FileResponse(
+            fieldfile.storage.open(fieldfile.name, "rb"),
+            content_type=content_type,
+        )
+        response["Content-Length"] = str(size)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _iter_range(fieldfile, start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(length)
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Content-Disposition"] = content_disposition_header(
+        as_attachment, filename
+    )
+    response["Cache-Control"] = "private, max-age=3600"
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
@@ -0,0 +1,118 @@
+"""
+Copying cohort members onto assignment rosters.
+
+Assigning work to a cohort only records the cohort on the assignment and
+flags its roster as pending, so the request costs the same for ten students
+or a thousand. Once the transaction commits, a background thread inserts
+the members into the roster table with chunked ``bulk_create`` and clears
+the flag. Students who join a cohort later are added to its assignments
+that are still open.
+
+``bulk_create`` skips ``m2m_changed``, so the cache versions that handler
+would bump are bumped here. With ``ROSTER_FANOUT_WORKERS = 0`` the fan-out
+runs inline, which is what the tests use. A fan-out lost with its process
+or dropped by a full queue leaves the flag set; the ``fan_out_rosters``
+command, run on a schedule, finishes it.
+"""
+
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import bump_version, user_namespace
+from .ical import bump_calendars
+from .models import Assignment
+from .roster import ROSTER_ASSIGNMENT, ROSTER_USER, Roster, roster_namespace
+
+logger = logging.getLogger(__name__)
+
+FANOUT_CHUNK_SIZE = 1000
+QUEUE_SIZE = 1000
+
+_jobs = None
+_jobs_lock = threading.Lock()
+
+
+def add_to_roster(assignment_id, user_ids):
+    """Insert roster rows in chunks, skipping students already on it"""
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), FANOUT_CHUNK_SIZE):
+        Roster.objects.bulk_create(
+            [
+                Roster(**{ROSTER_ASSIGNMENT: assignment_id, ROSTER_USER: user_id})
+                for user_id in user_ids[start : start + FANOUT_CHUNK_SIZE]
+            ],
+            ignore_conflicts=True,
+        )
+    bump_version(roster_namespace(assignment_id))
+    bump_calendars(user_ids)
+    return len(user_ids)
+
+
+def fan_out_roster(assignment_id):
+    """Add every member of the assignment's cohorts to its roster"""
+    members = (
+        get_user_model()
+        .objects.filter(cohorts__assignments=assignment_id)
+        .values_list("pk", flat=True)
+        .distinct()
+        .order_by("pk")
+    )
+    with transaction.atomic():
+        added = add_to_roster(assignment_id, members)
+        Assignment.objects.filter(pk=assignment_id).update(roster_pending=False)
+    # New assignments change the students' assignment list validators by
+    # themselves; only their calendar feeds needed a bump
+    return added
+
+
+def cohort_joined(cohort_ids, user_ids):
+    """Put students who joined cohorts on those cohorts' open assignments"""
+    assignments = Assignment.objects.filter(
+        cohorts__in=cohort_ids, is_active=True, due_date__gt=timezone.now()
+    ).values_list("pk", flat=True)
+    for assignment_id in set(assignments):
+        add_to_roster(assignment_id, user_ids)
+    for user_id in user_ids:
+        # Their cached panels on those assignments said "not assigned"
+        bump_version(user_namespace(user_id))
+
+
+def _work():
+    while True:
+        assignment_id = _jobs.get()
+        try:
+            fan_out_roster(assignment_id)
+        except Exception:
+            logger.exception(f"Failed to fan out roster of assignment {assignment_id}")
+        finally:
+            connection.close()
+
+
+def _get_jobs():
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = queue.Queue(maxsize=QUEUE_SIZE)
+            for i in range(settings.ROSTER_FANOUT_WORKERS):
+                threading.Thread(
+                    target=_work, name=f"roster-fanout-{i}", daemon=True
+                ).start()
+        return _jobs
+
+
+def enqueue_fanout(assignment_id):
+    """Schedule a fan-out; returns immediately unless ROSTER_FANOUT_WORKERS is 0"""
+    if getattr(settings, "ROSTER_FANOUT_WORKERS", 0) <= 0:
+        fan_out_roster(assignment_id)
+        return
+    try:
+        _get_jobs().put_nowait(assignment_id)
+    except queue.Full:
+        # fan_out_rosters picks up anything left pending
+        logger.warning(f"Roster fan-out queue full, skipping {assignment_id}")
@@ -0,0 +1,103 @@
+"""
+The assignment feed behind the assignments page and its JSON endpoint.
+
+One query returns a page of active assignments with their material and
+subject. For a student it also carries their own submission's status,
+grade and time, read by correlated subqueries on the (assignment, student)
+unique index, and an overdue flag. Pages are keyset-paginated in due-date
+order, which the (due_date, is_active) index serves directly.
+"""
+
+from django.db.models import (BooleanField, Case, OuterRef, Subquery, Value,
+                              When)
+from django.utils import timezone
+
+from .models import Assignment, AssignmentSubmission
+from .pagination import keyset_page
+
+DEFAULT_PAGE_SIZE = 24
+
+# Soonest due first; ``id`` makes the cursor position unique
+FEED_ORDERING = ("due_date", "id")
+
+
+def is_student(user):
+    return user.is_authenticated and user.user_type == "student"
+
+
+def feed_queryset(user):
+    """Active assignments visible to ``user``: their own for students"""
+    assignments = Assignment.objects.filter(is_active=True)
+    if is_student(user):
+        assignments = assignments.filter(assigned_to=user)
+    return assignments
+
+
+def annotated_feed(user, now=None):
+    """``feed_queryset`` with everything a feed row renders, in one query"""
+    now = now or timezone.now()
+    assignments = feed_queryset(user).select_related("material__subject")
+    assignments = assignments.annotate(
+        overdue=Case(
+            When(due_date__lt=now, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        )
+    )
+    if is_student(user):
+        mine = AssignmentSubmission.objects.filter(
+            assignment=OuterRef("pk"), student=user
+        )
+        assignments = assignments.annotate(
+            submission_status=Subquery(mine.values("status")[:1]),
+            submission_grade=Subquery(mine.values("grade")[:1]),
+            submitted_at=Subquery(mine.values("submitted_at")[:1]),
+        )
+    return assignments
+
+
+def assignment_feed(user, cursor=None, limit=None):
+    """Return ``(assignments, next_cursor)`` for one page of the feed"""
+    return keyset_page(
+        annotated_feed(user),
+        FEED_ORDERING,
+        cursor=cursor or None,
+        limit=limit or DEFAULT_PAGE_SIZE,
+    )
+
+
+def serialize_assignment(assignment):
+    """JSON-friendly representation of a feed row"""
+    material = assignment.material
+    data = {
+        "id": assignment.pk,
+        "title": assignment.title,
+        "description": assignment.description,
+        "due_date": assignment.due_date.isoformat(),
+        "overdue": assignment.overdue,
+        "days_until_due": assignment.days_until_due,
+        "priority": assignment.priority,
+        "max_score": assignment.max_score,
+        "material": {
+            "id": material.pk,
+            "title": material.title,
+            "estimated_time": material.estimated_time,
+            "difficulty_level": material.difficulty_level,
+            "subject": {
+                "id": material.subject.pk,
+                "name": material.subject.name,
+                "color_code": material.subject.color_code,
+            },
+        },
+    }
+    if hasattr(assignment, "submission_status"):
+        data["submission"] = (
+            {
+                "status": assignment.submission_status,
+                "grade": assignment.submission_grade or None,
+                "submitted_at": assignment.submitted_at.isoformat(),
+            }
+            if assignment.submission_status
+            else None
+        )
+    return data
@@ -0,0 +1,60 @@
+import hashlib
+import mimetypes
+import os
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def guess_mime_type(name):
+    """MIME type for a file name, defaulting to an opaque byte stream"""
+    content_type, encoding = mimetypes.guess_type(name)
+    if encoding or not content_type:
+        return "application/octet-stream"
+    return content_type
+
+
+def file_extension(name):
+    """Lower-case extension without the dot"""
+    return os.path.splitext(name)[1][1:].lower()
+
+
+def preview_name_for(name):
+    """Storage name of the thumbnail kept next to the file ``name``"""
+    return f"{name}.preview.jpg"
+
+
+def _hash_stream(handle):
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def stream_metadata(handle, name):
+    """Size, MIME type, extension and SHA-256 of an open binary file"""
+    size, sha256 = _hash_stream(handle)
+    return {
+        "size": size,
+        "mime_type": guess_mime_type(name),
+        "ext": file_extension(name),
+        "sha256": sha256,
+    }
+
+
+def file_metadata(fieldfile):
+    """
+    Size, MIME type, extension and SHA-256 of a FieldFile.
+
+    Uploads that have not been saved yet are read from the in-memory or
+    temporary file Django received; stored files are read from storage.
+    """
+    if not fieldfile._committed:
+        handle = fieldfile.file
+        handle.seek(0)
+        metadata = stream_metadata(handle, fieldfile.name)
+        handle.seek(0)
+        return metadata
+    with fieldfile.storage.open(fieldfile.name, "rb") as handle:
+        return stream_metadata(handle, fieldfile.name)
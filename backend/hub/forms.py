@@ -0,0 +1,87 @@
+from django import forms
+
+from .catalog import SORT_POPULAR
+from .models import AssignmentSubmission, Material
+from .tags import TAG_MODE_ALL, TAG_MODE_ANY, parse_tags
+
+
+class CatalogFilterForm(forms.Form):
+    """Query-string filters for the materials catalog"""
+
+    subject = forms.IntegerField(required=False, min_value=1)
+    grade_level = forms.ChoiceField(
+        required=False, choices=(("", "All grades"),) + Material.GRADE_LEVELS
+    )
+    material_type = forms.ChoiceField(
+        required=False, choices=(("", "All types"),) + Material.MATERIAL_TYPES
+    )
+    difficulty_level = forms.ChoiceField(
+        required=False, choices=(("", "All levels"),) + Material.DIFFICULTY_LEVELS
+    )
+    tags = forms.CharField(required=False, max_length=500)
+    tag_mode = forms.ChoiceField(
+        required=False,
+        choices=((TAG_MODE_ANY, "Any tag"), (TAG_MODE_ALL, "All tags")),
+    )
+    sort = forms.ChoiceField(
+        required=False,
+        choices=(("", "Newest first"), (SORT_POPULAR, "Popular this week")),
+    )
+    cursor = forms.CharField(required=False, max_length=500)
+    limit = forms.IntegerField(required=False, min_value=1, max_value=100)
+
+    def clean_tags(self):
+        return parse_tags(self.cleaned_data["tags"])
+
+
+class MaterialSearchForm(forms.Form):
+    """Free-text material search"""
+
+    q = forms.CharField(required=False, max_length=200, strip=True)
+    limit = forms.IntegerField(required=False, min_value=1, max_value=50)
+
+
+class AssignmentFeedForm(forms.Form):
+    """Paging parameters for the assignment feed"""
+
+    cursor = forms.CharField(required=False, max_length=500)
+    limit = forms.IntegerField(required=False, min_value=1, max_value=100)
+
+
+class GradingQueueForm(forms.Form):
+    """Filter and paging parameters for the grading queue"""
+
+    assignment = forms.IntegerField(required=False, min_value=1)
+    cursor = forms.CharField(required=False, max_length=500)
+    limit = forms.IntegerField(required=False, min_value=1, max_value=100)
+
+
+class GradeForm(forms.Form):
+    """One submission's grade within a bulk grading request"""
+
+    id = forms.IntegerField(min_value=1)
+    numeric_score = forms.IntegerField(required=False, min_value=0, max_value=100)
+    grade = forms.ChoiceField(
+        required=False,
+        choices=(("", "From score"),) + AssignmentSubmission.GRADE_CHOICES,
+    )
+    teacher_feedback = forms.CharField(required=False, max_length=5000)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("numeric_score") is None and not cleaned_data.get("grade"):
+            raise forms.ValidationError("Provide a numeric score or a letter grade.")
+        return cleaned_data
+
+
+class TrendingForm(forms.Form):
+    """Size of the trending materials list"""
+
+    limit = forms.IntegerField(required=False, min_value=1, max_value=50)
+
+
+class TagLookupForm(forms.Form):
+    """Prefix lookup for the tag list"""
+
+    prefix = forms.CharField(required=False, max_length=50)
+    limit = forms.IntegerField(required=False, min_value=1, max_value=200)
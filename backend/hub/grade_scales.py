@@ -0,0 +1,115 @@
+"""
+Letter-grade scales that evaluate in Python, in SQL and in NumPy.
+
+A ``GradingScale`` is a list of cut-offs: the lowest score that earns each
+letter, plus the letter for everything below. The same definition gives
+three evaluations:
+
+* ``letter(score)`` for one value,
+* ``case(field)``, a SQL ``CASE`` expression that querysets can annotate,
+  filter and group by, so reports are aggregated in the database,
+* ``letters(scores)``, a vectorized lookup over an array with
+  ``numpy.searchsorted``, for data that is already in memory.
+
+``distribution`` counts rows per letter with one GROUP BY. A column of
+letters entered by hand can be given to take precedence over the score.
+"""
+
+from django.db.models import Case, CharField, Count, Value, When
+from django.db.models.functions import Coalesce, NullIf
+
+
+class GradingScale:
+    def __init__(self, cutoffs, below="F"):
+        # Best letter first
+        self.cutoffs = tuple(sorted(cutoffs, reverse=True))
+        self.below = below
+
+    @property
+    def choices(self):
+        """Every letter of the scale, best first"""
+        return tuple(letter for _, letter in self.cutoffs) + (self.below,)
+
+    def letter(self, score):
+        """Letter for one score; None for no score"""
+        if score is None:
+            return None
+        for minimum, letter in self.cutoffs:
+            if score >= minimum:
+                return letter
+        return self.below
+
+    def case(self, field):
+        """SQL expression giving the letter for the numeric column ``field``"""
+        return Case(
+            *[
+                When(**{f"{field}__gte": minimum}, then=Value(letter))
+                for minimum, letter in self.cutoffs
+            ],
+            When(**{f"{field}__isnull": False}, then=Value(self.below)),
+            default=Value(None),
+            output_field=CharField(max_length=3),
+        )
+
+    def letters(self, scores):
+        """Letters for an array of scores at once; NaN (no score) gives None"""
+        import numpy as np
+
+        scores = np.asarray(scores, dtype=float)
+        minimums = np.array([minimum for minimum, _ in reversed(self.cutoffs)])
+        names = np.array(
+            [self.below] + [letter for _, letter in reversed(self.cutoffs)] + [None],
+            dtype=object,
+        )
+        positions = np.searchsorted(minimums, scores, side="right")
+        positions[np.isnan(scores)] = len(names) - 1
+        return names[positions]
+
+    def distribution(self, queryset, field, stored=None, by=None):
+        """
+        ``{letter: count}`` over the graded rows, grouped in the database.
+
+        A non-blank letter in the ``stored`` column wins over the one the
+        scale gives ``field``. With ``by``, returns ``{value: {letter: count}}``
+        for each value of that column.
+        """
+        letter = self.case(field)
+        if stored:
+            letter = Coalesce(NullIf(stored, Value("")), letter)
+        groups = [by, "letter"] if by else ["letter"]
+        rows = (
+            queryset.annotate(letter=letter)
+            .filter(letter__isnull=False)
+            .values(*groups)
+            .annotate(count=Count("pk"))
+            .order_by(*groups)
+        )
+        counts = {}
+        for row in rows:
+            group = counts.setdefault(
+                row[by] if by else None, dict.fromkeys(self.choices, 0)
+            )
+            group[row["letter"]] = row["count"]
+        if by:
+            return counts
+        return counts.get(None, dict.fromkeys(self.choices, 0))
+
+
+# The scale AssignmentSubmission.clean assigns letters with
+SUBMISSION_SCALE = GradingScale(
+    [
+        (97, "A+"),
+        (93, "A"),
+        (90, "A-"),
+        (87, "B+"),
+        (83, "B"),
+        (80, "B-"),
+        (77, "C+"),
+        (73, "C"),
+        (70, "C-"),
+        (60, "D"),
+    ]
+)
+
+# The coarser scale shown next to progress scores
+PROGRESS_SCALE = GradingScale([(90, "A"), (80, "B"), (70, "C"), (60, "D")])
@@ -0,0 +1,402 @@
+"""
+Gradebook import and export as CSV or XLSX spreadsheets.
+
+Each row names a student by ``username`` and one of the teacher's
+assignments by id or exact title. It gives a ``score`` (0-100) and may add
+a ``grade`` letter and ``feedback``. The score goes onto the student's
+submission for that assignment and onto their progress record for the
+assignment's material, whichever of the two exist.
+
+Nothing is looked up row by row. Usernames, submissions and progress
+records are each fetched with a few chunked ``__in`` queries, rows are
+validated against those lookups in memory, and letters missing from the
+sheet are computed for the whole sheet at once from ``SUBMISSION_SCALE``,
+the scale ``AssignmentSubmission.clean`` uses. ``plan_import`` returns the
+diff without writing, which is the dry run. ``apply_import`` writes the
+planned changes with chunked ``bulk_update`` in one transaction.
+
+The export is the other shape: one row per student, one column per
+assignment, scores in the cells. ``gradebook_rows`` walks the students
+with a server-side cursor, ordered by username, and fetches the scores
+of each chunk of students by id. Scores are matched on the students
+actually read, so one leaving the class mid-export cannot shift the rest.
+Only a chunk of rows is held in memory, whatever the size of the class.
+"""
+
+import csv
+import io
+import zipfile
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import bump_version, user_namespace
+from .grade_scales import SUBMISSION_SCALE
+from .models import Assignment, AssignmentSubmission, StudentProgress
+from .roster import ROSTER_ASSIGNMENT, ROSTER_USER, Roster
+
+LOOKUP_CHUNK_SIZE = 2000
+UPDATE_CHUNK_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+
+REQUIRED_COLUMNS = ("username", "assignment", "score")
+LETTERS = {value for value, _ in AssignmentSubmission.GRADE_CHOICES}
+
+
+def _rows_from_csv(handle):
+    text = io.TextIOWrapper(handle, encoding="utf-8-sig", newline="")
+    try:
+        yield from csv.DictReader(text)
+    except csv.Error as e:
+        # Reported like any other unreadable sheet by the view and command
+        raise ValueError(f"not a valid CSV file ({e})") from e
+    finally:
+        text.detach()
+
+
+def _rows_from_xlsx(handle):
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        workbook = load_workbook(handle, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        # Reported like any other unreadable sheet by the view and command
+        raise ValueError(f"not a valid .xlsx workbook ({e})") from e
+    try:
+        sheet = workbook.worksheets[0]
+        values = sheet.iter_rows(values_only=True)
+        header = [str(cell or "").strip() for cell in next(values, ())]
+        for cells in values:
+            if any(cell not in (None, "") for cell in cells):
+                yield dict(zip(header, cells))
+    finally:
+        workbook.close()
+
+
+def read_gradebook(handle, name):
+    """Rows of a ``.csv`` or ``.xlsx`` sheet as dicts keyed by lower-case header"""
+    reader = _rows_from_xlsx if name.lower().endswith(".xlsx") else _rows_from_csv
+    rows = [
+        {str(key).strip().lower(): value for key, value in row.items() if key}
+        for row in reader(handle)
+    ]
+    if rows:
+        missing = [name for name in REQUIRED_COLUMNS if name not in rows[0]]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+    return rows
+
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+
+def parse_score(value):
+    """A whole-number percentage from a CSV string or spreadsheet number"""
+    try:
+        score = float(_text(value))
+    except ValueError:
+        return None
+    if not score.is_integer() or not 0 <= score <= 100:
+        return None
+    return int(score)
+
+
+@dataclass
+class GradeChange:
+    row: int  # 1-based data row
+    username: str
+    assignment: str
+    old_score: object
+    new_score: int
+    old_grade: str
+    new_grade: str
+    targets: tuple  # "submission" and/or "progress"
+
+
+@dataclass
+class GradebookPlan:
+    changes: list = field(default_factory=list)
+    errors: list = field(default_factory=list)  # (row, message)
+    unchanged: int = 0
+    submissions: list = field(default_factory=list)
+    progress: list = field(default_factory=list)
+
+
+def _chunks(values, size=LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def _student_ids(usernames):
+    found = {}
+    students = get_user_model().objects.filter(user_type="student")
+    for chunk in _chunks(usernames):
+        found.update(students.filter(username__in=chunk).values_list("username", "pk"))
+    return found
+
+
+def _assignment_lookup(teacher):
+    """``{key: assignment}`` for ids and unambiguous titles"""
+    assignments = list(
+        Assignment.objects.filter(created_by=teacher).only("pk", "title", "material_id")
+    )
+    titles = {}
+    for assignment in assignments:
+        titles.setdefault(assignment.title.strip().lower(), []).append(assignment)
+    lookup = {
+        title: matches[0] for title, matches in titles.items() if len(matches) == 1
+    }
+    lookup.update((str(a.pk), a) for a in assignments)
+    return lookup
+
+
+def _records(student_ids, assignments):
+    """Existing submissions and progress rows for the sheet's students"""
+    assignment_ids = {a.pk for a in assignments}
+    material_ids = {a.material_id for a in assignments}
+    submissions, progress = {}, {}
+    for chunk in _chunks(student_ids):
+        for submission in AssignmentSubmission.objects.filter(
+            student_id__in=chunk, assignment_id__in=assignment_ids
+        ).only(
+            "pk",
+            "assignment_id",
+            "student_id",
+            "numeric_score",
+            "grade",
+            "teacher_feedback",
+            "status",
+            "revision_requested",
+            "graded_at",
+        ):
+            submissions[(submission.assignment_id, submission.student_id)] = submission
+        for record in StudentProgress.objects.filter(
+            student_id__in=chunk, material_id__in=material_ids
+        ).only("pk", "material_id", "student_id", "score", "teacher_feedback"):
+            progress[(record.material_id, record.student_id)] = record
+    return submissions, progress
+
+
+def plan_import(teacher, rows):
+    """Validate ``rows`` and work out what would change; writes nothing"""
+    plan = GradebookPlan()
+    students = _student_ids({_text(row.get("username")) for row in rows})
+    assignments = _assignment_lookup(teacher)
+
+    parsed = []
+    for number, row in enumerate(rows, start=1):
+        username = _text(row.get("username"))
+        key = _text(row.get("assignment"))
+        problems = []
+        student_id = students.get(username)
+        if student_id is None:
+            problems.append(f"unknown student {username!r}")
+        assignment = assignments.get(key.lower().removesuffix(".0"))
+        if assignment is None:
+            problems.append(f"unknown or ambiguous assignment {key!r}")
+        score = parse_score(row.get("score"))
+        if score is None:
+            problems.append(f"invalid score {_text(row.get('score'))!r}")
+        grade = _text(row.get("grade")).upper()
+        if grade and grade not in LETTERS:
+            problems.append(f"invalid grade {grade!r}")
+        if problems:
+            plan.errors.append((number, "; ".join(problems)))
+        else:
+            notes = _text(row.get("feedback"))
+            parsed.append(
+                (number, username, student_id, assignment, score, grade, notes)
+            )
+
+    submissions, progress = _records(
+        {row[2] for row in parsed}, {row[3] for row in parsed}
+    )
+    derived = SUBMISSION_SCALE.letters([row[4] for row in parsed])
+    seen = set()
+    for row, derived_grade in zip(parsed, derived):
+        number, username, student_id, assignment, score, grade, notes = row
+        if (assignment.pk, student_id) in seen:
+            plan.errors.append((number, "student and assignment repeated"))
+            continue
+        seen.add((assignment.pk, student_id))
+        grade = grade or derived_grade
+        submission = submissions.get((assignment.pk, student_id))
+        record = progress.get((assignment.material_id, student_id))
+        if submission is None and record is None:
+            plan.errors.append(
+                (number, f"{username} has no submission or progress to grade")
+            )
+            continue
+
+        if submission is not None:
+            old_score, old_grade = submission.numeric_score, submission.grade
+            notes = notes or submission.teacher_feedback
+        else:
+            old_score, old_grade = record.score, ""
+            notes = notes or record.teacher_feedback
+        targets = []
+        if submission is not None and (
+            submission.numeric_score,
+            submission.grade,
+            submission.teacher_feedback,
+        ) != (score, grade, notes):
+            submission.numeric_score = score
+            submission.grade = grade
+            submission.teacher_feedback = notes
+            plan.submissions.append(submission)
+            targets.append("submission")
+        if record is not None and (record.score, record.teacher_feedback) != (
+            score,
+            notes,
+        ):
+            record.score = score
+            record.teacher_feedback = notes
+            plan.progress.append(record)
+            targets.append("progress")
+        if not targets:
+            plan.unchanged += 1
+            continue
+        plan.changes.append(
+            GradeChange(
+                number,
+                username,
+                assignment.title,
+                old_score,
+                score,
+                old_grade,
+                grade if submission is not None else "",
+                tuple(targets),
+            )
+        )
+    return plan
+
+
+def apply_import(teacher, plan, now=None):
+    """Write a plan's changes in one transaction; returns the rows updated"""
+    now = now or timezone.now()
+    for submission in plan.submissions:
+        submission.graded_by = teacher
+        submission.graded_at = now
+        # Mirrors AssignmentSubmission.save, which bulk_update skips
+        submission.status = "returned" if submission.revision_requested else "graded"
+    for record in plan.progress:
+        record.graded_by = teacher
+        record.graded_at = now
+    with transaction.atomic():
+        AssignmentSubmission.objects.bulk_update(
+            plan.submissions,
+            [
+                "numeric_score",
+                "grade",
+                "teacher_feedback",
+                "graded_by",
+                "graded_at",
+                "status",
+            ],
+            batch_size=UPDATE_CHUNK_SIZE,
+        )
+        StudentProgress.objects.bulk_update(
+            plan.progress,
+            ["score", "teacher_feedback", "graded_by", "graded_at"],
+            batch_size=UPDATE_CHUNK_SIZE,
+        )
+    # bulk_update skips the signals that invalidate the students' panels
+    students = {s.student_id for s in plan.submissions}
+    students.update(r.student_id for r in plan.progress)
+    for student_id in students:
+        bump_version(user_namespace(student_id))
+    return len(plan.submissions) + len(plan.progress)
+
+
+def _cell_text(value):
+    """Text that spreadsheet apps will not run as a formula"""
+    value = _text(value)
+    return f"'{value}" if value.startswith(("=", "+", "-", "@")) else value
+
+
+def _export_students(teacher):
+    """Students on a roster of, or with work submitted to, the teacher's assignments"""
+    assignments = Assignment.objects.filter(created_by=teacher).values("pk")
+    rostered = Roster.objects.filter(
+        **{f"{ROSTER_ASSIGNMENT}__in": assignments}
+    ).values(ROSTER_USER)
+    submitted = AssignmentSubmission.objects.filter(
+        assignment__created_by=teacher
+    ).values("student_id")
+    return (
+        get_user_model()
+        .objects.filter(Q(pk__in=rostered) | Q(pk__in=submitted), user_type="student")
+        .order_by("username")
+        .values_list("pk", "username", "first_name", "last_name")
+    )
+
+
+def _export_scores(teacher, student_ids):
+    """``{student_id: [(assignment_id, score), ...]}`` for a chunk of students"""
+    scores = {}
+    for student_id, assignment_id, score in AssignmentSubmission.objects.filter(
+        assignment__created_by=teacher,
+        student_id__in=student_ids,
+        numeric_score__isnull=False,
+    ).values_list("student_id", "assignment_id", "numeric_score"):
+        scores.setdefault(student_id, []).append((assignment_id, score))
+    return scores
+
+
+def gradebook_rows(teacher):
+    """Yield a header, then one list per student with a score per assignment"""
+    columns = list(
+        Assignment.objects.filter(created_by=teacher)
+        .order_by("due_date", "pk")
+        .values_list("pk", "title")
+    )
+    position = {pk: index for index, (pk, _) in enumerate(columns)}
+    yield ["username", "name"] + [_cell_text(title) for _, title in columns]
+
+    students = _export_students(teacher).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    while True:
+        chunk = list(islice(students, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            break
+        scores = _export_scores(teacher, [pk for pk, *_ in chunk])
+        for pk, username, first_name, last_name in chunk:
+            cells = [None] * len(columns)
+            for assignment_id, score in scores.get(pk, ()):
+                # Skips assignments created since the header was written
+                if assignment_id in position:
+                    cells[position[assignment_id]] = score
+            name = f"{first_name} {last_name}".strip()
+            yield [_cell_text(username), _cell_text(name)] + cells
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the value back"""
+
+    def write(self, value):
+        return value
+
+
+def gradebook_csv(rows):
+    """Encode rows as CSV lines, one at a time"""
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(["" if cell is None else cell for cell in row])
+
+
+def write_gradebook_xlsx(rows, handle):
+    """Write rows to ``handle`` as an XLSX workbook"""
+    from openpyxl import Workbook
+
+    # A write-only workbook spools each row to disk as it is appended
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Gradebook")
+    for row in rows:
+        sheet.append(row)
+    workbook.save(handle)
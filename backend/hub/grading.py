@@ -0,0 +1,175 @@
+"""
+The teacher's grading queue and bulk grading.
+
+The queue lists submitted work that still needs a grade on the teacher's
+own assignments. It is ordered by assignment and then id, so a page is a
+seek along the (assignment, status) index. Filtering to one assignment,
+the usual case, reads exactly the rows to be graded.
+
+``bulk_grade`` applies a whole class's scores in one transaction. It locks
+and loads the rows with one query and writes them back with one
+``bulk_update``, instead of a ``full_clean()`` and ``save()`` per
+submission. Values are validated by ``GradeForm`` beforehand. Letters
+missing from the input come from ``SUBMISSION_SCALE``, the scale used by
+``AssignmentSubmission.clean``. ``bulk_update`` skips signals, so the
+students' cache versions are bumped here.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_version, user_namespace
+from .forms import GradeForm
+from .grade_scales import SUBMISSION_SCALE
+from .models import Assignment, AssignmentSubmission
+from .pagination import keyset_page
+
+DEFAULT_PAGE_SIZE = 30
+MAX_BULK_GRADES = 500
+UNGRADED_STATUSES = ("submitted", "under_review")
+
+# Groups a class together; ``id`` makes the cursor position unique
+QUEUE_ORDERING = ("assignment", "id")
+
+GRADED_FIELDS = [
+    "numeric_score",
+    "grade",
+    "teacher_feedback",
+    "graded_by",
+    "graded_at",
+    "status",
+]
+
+
+class GradingError(ValueError):
+    """Raised when grades refer to submissions the teacher cannot grade"""
+
+
+def is_teacher(user):
+    return user.is_authenticated and user.user_type == "teacher"
+
+
+def grading_queue(teacher, assignment_id=None):
+    """Ungraded submissions on ``teacher``'s assignments"""
+    submissions = AssignmentSubmission.objects.filter(
+        assignment__created_by=teacher, status__in=UNGRADED_STATUSES
+    )
+    if assignment_id:
+        submissions = submissions.filter(assignment_id=assignment_id)
+    return submissions
+
+
+def grading_page(teacher, assignment_id=None, cursor=None, limit=None):
+    """Return ``(submissions, next_cursor)`` for one page of the queue"""
+    submissions = grading_queue(teacher, assignment_id).select_related(
+        "assignment", "student"
+    )
+    return keyset_page(
+        submissions,
+        QUEUE_ORDERING,
+        cursor=cursor or None,
+        limit=limit or DEFAULT_PAGE_SIZE,
+    )
+
+
+def serialize_submission(submission):
+    """JSON-friendly representation of a queue row"""
+    return {
+        "id": submission.pk,
+        "assignment": {
+            "id": submission.assignment_id,
+            "title": submission.assignment.title,
+            "max_score": submission.assignment.max_score,
+        },
+        "student": {
+            "id": submission.student_id,
+            "name": submission.student.get_full_name() or submission.student.username,
+        },
+        "status": submission.status,
+        "submitted_at": submission.submitted_at.isoformat(),
+        "submission_text": submission.submission_text,
+        "submission_notes": submission.submission_notes,
+        "has_file": bool(submission.submission_file),
+        "numeric_score": submission.numeric_score,
+        "grade": submission.grade or None,
+    }
+
+
+def grade_distribution(teacher, assignment_id=None):
+    """
+    ``[{"id", "title", "letters": {letter: count}}]`` per assignment.
+
+    A letter the teacher entered wins; otherwise it comes from the numeric
+    score through ``SUBMISSION_SCALE``. The counting is one GROUP BY query
+    however many submissions there are.
+    """
+    submissions = AssignmentSubmission.objects.filter(assignment__created_by=teacher)
+    if assignment_id:
+        submissions = submissions.filter(assignment_id=assignment_id)
+    counts = SUBMISSION_SCALE.distribution(
+        submissions, "numeric_score", stored="grade", by="assignment_id"
+    )
+    titles = dict(Assignment.objects.filter(pk__in=counts).values_list("pk", "title"))
+    return [
+        {"id": pk, "title": titles[pk], "letters": letters}
+        for pk, letters in counts.items()
+    ]
+
+
+def validate_grades(rows):
+    """Clean raw grade rows; returns ``(grades, {index: errors})``"""
+    grades, errors = [], {}
+    seen = set()
+    for index, row in enumerate(rows):
+        form = GradeForm(row if isinstance(row, dict) else {})
+        if not form.is_valid():
+            errors[index] = form.errors
+        elif form.cleaned_data["id"] in seen:
+            errors[index] = {"id": ["Submission graded twice in one request."]}
+        else:
+            seen.add(form.cleaned_data["id"])
+            grades.append(form.cleaned_data)
+    return grades, errors
+
+
+def bulk_grade(teacher, grades, now=None):
+    """
+    Apply ``[{"id", "numeric_score", "grade", "teacher_feedback"}]``.
+
+    All rows are updated or none are. Raises GradingError when an id does
+    not belong to one of ``teacher``'s assignments. Returns the updated
+    submissions.
+    """
+    now = now or timezone.now()
+    by_id = {row["id"]: row for row in grades}
+    with transaction.atomic():
+        submissions = (
+            AssignmentSubmission.objects.select_for_update()
+            .filter(assignment__created_by=teacher)
+            .in_bulk(list(by_id))
+        )
+        missing = sorted(by_id.keys() - submissions.keys())
+        if missing:
+            raise GradingError(f"Submissions not found: {', '.join(map(str, missing))}")
+
+        for pk, submission in submissions.items():
+            row = by_id[pk]
+            score = row.get("numeric_score")
+            submission.numeric_score = score
+            submission.grade = row.get("grade") or SUBMISSION_SCALE.letter(score) or ""
+            submission.teacher_feedback = (
+                row.get("teacher_feedback") or submission.teacher_feedback
+            )
+            submission.graded_by = teacher
+            submission.graded_at = now
+            # Mirrors AssignmentSubmission.save, which bulk_update skips
+            submission.status = (
+                "returned" if submission.revision_requested else "graded"
+            )
+        AssignmentSubmission.objects.bulk_update(
+            submissions.values(), GRADED_FIELDS, batch_size=500
+        )
+
+    for student_id in {s.student_id for s in submissions.values()}:
+        bump_version(user_namespace(student_id))
+    return list(submissions.values())
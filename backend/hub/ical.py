@@ -0,0 +1,198 @@
+"""
+iCalendar feeds of assignment due dates for students and parents.
+
+Calendar apps poll subscribed feeds often and send no cookies, so a feed
+is addressed by a signed token rather than a session. Every user has a
+version in the ``calendar:<id>`` namespace. For a student it moves when an
+assignment on their roster is added, removed, edited or deleted. For a
+parent it moves when their set of children changes. ``hub.signals`` and
+the roster fan-out do the bumping.
+
+A parent's feed covers their children, so its ETag combines the parent's
+version with each child's. The ETag and the rendered body are cached under
+those versions. A poll of an unchanged feed is therefore answered, with a
+304 or the cached body, by cache reads alone; the database is only
+queried after a version has moved.
+"""
+
+import hashlib
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.core import signing
+
+from .cache import bump_version, cache_get, cache_set, get_version
+from .models import Assignment
+from .roster import ROSTER_ASSIGNMENT, ROSTER_USER, Roster
+
+CALENDAR_CACHE_TIMEOUT = 60 * 60 * 24 * 7  # invalidated by version bumps
+TOKEN_SALT = "hub.calendar"
+PRODID = "-//PG Tutoring Hub//Assignments//EN"
+UID_DOMAIN = "pg-tutoring-hub"
+
+# Fields whose change can alter which students a user's feed covers
+MEMBERSHIP_FIELDS = frozenset({"user_type", "email", "parent_email"})
+
+PRIORITIES = {"urgent": 1, "high": 3, "medium": 5, "low": 9}
+
+
+def calendar_namespace(user_id):
+    """Version namespace for the feed of one user"""
+    return f"calendar:{user_id}"
+
+
+def bump_calendars(user_ids):
+    for user_id in set(user_ids):
+        bump_version(calendar_namespace(user_id))
+
+
+def bump_parent_calendars(emails):
+    """Parents at ``emails`` gained or lost a child"""
+    emails = {email for email in emails if email}
+    if emails:
+        parents = get_user_model().objects.filter(user_type="parent", email__in=emails)
+        bump_calendars(parents.values_list("pk", flat=True))
+
+
+def feed_token(user):
+    """URL token for ``user``'s feed; it stays valid until SECRET_KEY changes"""
+    return signing.Signer(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def feed_user_id(token):
+    """The user a feed token was issued to, or None for a forged token"""
+    try:
+        return int(signing.Signer(salt=TOKEN_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def _members(user_id, version):
+    """Students a feed covers: the student themselves or a parent's children"""
+    key = f"hub:calendar:members:{user_id}:{version}"
+    members = cache_get(key)
+    if members is None:
+        User = get_user_model()
+        user = User.objects.filter(pk=user_id).values("user_type", "email").first()
+        members = []
+        if user is None:
+            pass
+        elif user["user_type"] == "student":
+            members = [user_id]
+        elif user["user_type"] == "parent" and user["email"]:
+            children = User.objects.filter(
+                user_type="student", parent_email=user["email"]
+            ).order_by("pk")
+            members = list(children.values_list("pk", flat=True))
+        cache_set(key, members, CALENDAR_CACHE_TIMEOUT)
+    return members
+
+
+def feed_state(user_id):
+    """``(etag, member ids)`` of a user's feed, from the cache when warm"""
+    version = get_version(calendar_namespace(user_id))
+    members = _members(user_id, version)
+    stamps = [f"{user_id}:{version}"]
+    stamps.extend(
+        f"{member}:{get_version(calendar_namespace(member))}"
+        for member in members
+        if member != user_id
+    )
+    return hashlib.sha1("|".join(stamps).encode()).hexdigest(), members
+
+
+def _escape(text):
+    return (
+        str(text)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    """Split a content line into pieces of at most 75 octets (RFC 5545 3.1)"""
+    data = line.encode()
+    pieces = []
+    while len(data) > 75:
+        # Continuations start with a space; never cut inside a UTF-8 sequence
+        cut = 75 if not pieces else 74
+        while data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        pieces.append(data[:cut].decode())
+        data = data[cut:]
+    pieces.append(data.decode())
+    return "\r\n ".join(pieces)
+
+
+def _timestamp(value):
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _event(assignment, student_id, name, link):
+    summary = f"{name}: {assignment.title}" if name else assignment.title
+    description = f"{assignment.material.title}\n\n{assignment.description}"
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:assignment-{assignment.pk}-{student_id}@{UID_DOMAIN}",
+        f"DTSTAMP:{_timestamp(assignment.updated_at)}",
+        f"DTSTART:{_timestamp(assignment.due_date)}",
+        f"DTEND:{_timestamp(assignment.due_date)}",
+        f"SUMMARY:{_escape(summary)}",
+        f"DESCRIPTION:{_escape(description)}",
+        f"PRIORITY:{PRIORITIES.get(assignment.priority, 0)}",
+    ]
+    if link:
+        lines.append(f"URL:{link(assignment)}")
+    lines.append("END:VEVENT")
+    return lines
+
+
+def build_calendar(user_id, members, link=None):
+    """Render the feed of ``members``' active assignments as iCalendar text"""
+    rows = Roster.objects.filter(**{f"{ROSTER_USER}__in": members})
+    pairs = list(rows.values_list(ROSTER_ASSIGNMENT, ROSTER_USER))
+    assignments = Assignment.objects.filter(
+        pk__in={assignment_id for assignment_id, _ in pairs}, is_active=True
+    ).select_related("material")
+    assignments = {assignment.pk: assignment for assignment in assignments}
+
+    names = {}
+    if members != [user_id]:
+        # A parent's feed says whose assignment each event is
+        children = get_user_model().objects.filter(pk__in=members)
+        names = {
+            pk: first_name or username
+            for pk, first_name, username in children.values_list(
+                "pk", "first_name", "username"
+            )
+        }
+
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        "X-WR-CALNAME:Assignments",
+    ]
+    pairs = [pair for pair in pairs if pair[0] in assignments]
+    pairs.sort(key=lambda pair: (assignments[pair[0]].due_date, pair))
+    for assignment_id, student_id in pairs:
+        lines.extend(
+            _event(assignments[assignment_id], student_id, names.get(student_id), link)
+        )
+    lines.append("END:VCALENDAR")
+    return "".join(f"{_fold(line)}\r\n" for line in lines)
+
+
+def calendar_body(user_id, etag, members, link=None):
+    """The feed rendered for ``etag``, built only on a cache miss"""
+    key = f"hub:calendar:feed:{user_id}:{etag}"
+    body = cache_get(key)
+    if body is None:
+        body = build_calendar(user_id, members, link)
+        cache_set(key, body, CALENDAR_CACHE_TIMEOUT)
+    return body
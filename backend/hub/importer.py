@@ -0,0 +1,316 @@
+"""
+Bulk material import from a CSV or JSON manifest.
+
+Rows are processed in batches. Each batch is validated with set lookups
+and one subject query instead of ``full_clean()`` per row. Its files are
+copied into the content-addressed store by a thread pool, and its
+materials are inserted with a single ``bulk_create``. Because bulk_create
+skips ``save()`` and the post_save signals, the tag links, search index
+entries and blob reference counts are then brought up to date for the
+whole batch at once.
+
+Every batch commits on its own, and the caller gets the manifest indices
+it committed, so an interrupted import can be resumed without duplicates.
+When a batch fails to commit, the files it already copied are recorded as
+unreferenced blobs, so ``gc_file_blobs`` removes them.
+"""
+
+import csv
+import json
+import os
+import threading
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.validators import FileExtensionValidator, URLValidator
+from django.db import transaction
+
+from .blobs import retain_blobs
+from .files import stream_metadata
+from .models import Material, Subject, material_upload_path
+from .search import rebuild_search_index
+from .storage import material_storage
+from .tags import sync_material_tags
+from .uploads import MAX_UPLOAD_SIZE
+
+BATCH_SIZE = 500
+FILE_WORKERS = 8
+
+REQUIRED_FIELDS = (
+    "title",
+    "description",
+    "material_type",
+    "subject",
+    "difficulty_level",
+    "grade_level",
+    "estimated_time",
+)
+
+
+def read_manifest(path):
+    """Rows of a ``.csv`` (header row) or ``.json`` (list of objects) file"""
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as handle:
+            rows = json.load(handle)
+        if not isinstance(rows, list):
+            raise ValueError("JSON manifest must be a list of objects")
+        return rows
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        return list(csv.DictReader(handle))
+
+
+class FileSource:
+    """Files referenced by the manifest, from a directory or a zip archive"""
+
+    def __init__(self, path):
+        self.path = path
+        self.is_zip = bool(path) and zipfile.is_zipfile(path)
+        self._local = threading.local()
+        if self.is_zip:
+            with zipfile.ZipFile(path) as archive:
+                self._sizes = {
+                    info.filename: info.file_size
+                    for info in archive.infolist()
+                    if not info.is_dir()
+                }
+
+    def _archive(self):
+        # ZipFile handles are not safe to share between threads
+        if not hasattr(self._local, "archive"):
+            self._local.archive = zipfile.ZipFile(self.path)
+        return self._local.archive
+
+    def _local_path(self, name):
+        root = os.path.realpath(self.path)
+        full = os.path.realpath(os.path.join(root, name))
+        if os.path.commonpath([root, full]) != root:
+            return None
+        return full
+
+    def size(self, name):
+        """Size in bytes, or None when the file is missing"""
+        if not self.path:
+            return None
+        if self.is_zip:
+            return self._sizes.get(name)
+        full = self._local_path(name)
+        if full is None or not os.path.isfile(full):
+            return None
+        return os.path.getsize(full)
+
+    def open(self, name):
+        if self.is_zip:
+            return self._archive().open(name)
+        return open(self._local_path(name), "rb")
+
+
+@dataclass
+class ImportResult:
+    created: list = field(default_factory=list)
+    errors: list = field(default_factory=list)  # (index, message)
+
+
+class MaterialImporter:
+    """Validate, ingest and insert manifest rows batch by batch"""
+
+    def __init__(
+        self,
+        source,
+        uploaded_by,
+        *,
+        create_subjects=False,
+        workers=FILE_WORKERS,
+        dry_run=False,
+    ):
+        self.source = source
+        self.uploaded_by = uploaded_by
+        self.create_subjects = create_subjects
+        self.workers = workers
+        self.dry_run = dry_run
+        # Names of subjects created, or that a dry run would create
+        self.new_subjects = set()
+        self.storage = material_storage()
+        self.material_types = {value for value, _ in Material.MATERIAL_TYPES}
+        self.difficulties = {value for value, _ in Material.DIFFICULTY_LEVELS}
+        self.grades = {value for value, _ in Material.GRADE_LEVELS}
+        self.extensions = set()
+        for validator in Material._meta.get_field("file").validators:
+            if isinstance(validator, FileExtensionValidator):
+                self.extensions.update(validator.allowed_extensions)
+        self.validate_url = URLValidator()
+
+    # Validation
+
+    def _subject_ids(self, names):
+        """``{lower-case name: id}`` for a batch, creating subjects if allowed"""
+        found = {}
+        for pk, name in Subject.objects.values_list("pk", "name"):
+            if name.lower() in names:
+                found[name.lower()] = pk
+        missing = names - found.keys()
+        if missing and self.create_subjects:
+            self.new_subjects.update(name.title() for name in missing)
+            if self.dry_run:
+                # Nothing is written, but the real run would create them
+                return {**found, **dict.fromkeys(missing)}
+            Subject.objects.bulk_create(
+                [Subject(name=name.title()) for name in sorted(missing)],
+                ignore_conflicts=True,
+            )
+            return self._subject_ids(names)
+        return found
+
+    def validate(self, batch):
+        """Split ``[(index, row)]`` into ``[(index, row, subject_id)]`` and errors"""
+        errors = []
+        subject_names = {
+            str(row.get("subject", "")).strip().lower() for _, row in batch
+        } - {""}
+        subjects = self._subject_ids(subject_names)
+
+        valid = []
+        for index, row in batch:
+            problems = [
+                f"missing {name}" for name in REQUIRED_FIELDS if not row.get(name)
+            ]
+            if row.get("material_type") not in self.material_types:
+                problems.append(f"invalid material_type {row.get('material_type')!r}")
+            if row.get("difficulty_level") not in self.difficulties:
+                problems.append(
+                    f"invalid difficulty_level {row.get('difficulty_level')!r}"
+                )
+            if str(row.get("grade_level", "")) not in self.grades:
+                problems.append(f"invalid grade_level {row.get('grade_level')!r}")
+            try:
+                minutes = int(row.get("estimated_time") or 0)
+                if not 1 <= minutes <= 1440:
+                    raise ValueError
+            except (TypeError, ValueError):
+                problems.append("estimated_time must be 1-1440 minutes")
+
+            if len(str(row.get("title", ""))) > 200:
+                problems.append("title longer than 200 characters")
+            if len(str(row.get("tags") or "")) > 500:
+                problems.append("tags longer than 500 characters")
+
+            subject = str(row.get("subject", "")).strip().lower()
+            if row.get("subject") and subject not in subjects:
+                problems.append(f"unknown subject {row.get('subject')!r}")
+
+            file_name = row.get("file") or ""
+            link = row.get("external_link") or ""
+            if bool(file_name) == bool(link):
+                problems.append("provide exactly one of file or external_link")
+            elif file_name:
+                size = self.source.size(file_name)
+                ext = os.path.splitext(file_name)[1][1:].lower()
+                if size is None:
+                    problems.append(f"file not found: {file_name}")
+                elif size > MAX_UPLOAD_SIZE:
+                    problems.append(f"file too large: {file_name}")
+                elif ext not in self.extensions:
+                    problems.append(f"file type not allowed: {file_name}")
+            elif len(link) > 200:
+                problems.append("external_link longer than 200 characters")
+            else:
+                try:
+                    self.validate_url(link)
+                except ValidationError:
+                    problems.append(f"invalid external_link {link!r}")
+
+            if problems:
+                errors.append((index, "; ".join(problems)))
+            else:
+                valid.append((index, row, subjects.get(subject)))
+        return valid, errors
+
+    # File ingestion
+
+    def _ingest(self, name):
+        """Copy one source file into the content-addressed store"""
+        # Hash first: the content decides the stored name
+        with self.source.open(name) as handle:
+            metadata = stream_metadata(handle, name)
+        target = material_upload_path(
+            Material(file_sha256=metadata["sha256"]), os.path.basename(name)
+        )
+        with self.source.open(name) as handle:
+            metadata["name"] = self.storage.save(target, File(handle))
+        return name, metadata
+
+    def ingest_files(self, names):
+        """``{source name: metadata}``, copying each distinct file once"""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return dict(pool.map(self._ingest, sorted(set(names))))
+
+    # Insertion
+
+    def _build(self, row, subject_id, metadata):
+        material = Material(
+            title=row["title"],
+            description=row["description"],
+            material_type=row["material_type"],
+            subject_id=subject_id,
+            difficulty_level=row["difficulty_level"],
+            grade_level=str(row["grade_level"]),
+            estimated_time=int(row["estimated_time"]),
+            tags=row.get("tags") or "",
+            external_link=row.get("external_link") or "",
+            is_active=str(row.get("is_active", "true")).lower()
+            not in ("0", "false", "no"),
+            uploaded_by=self.uploaded_by,
+        )
+        if metadata:
+            material.file = metadata["name"]
+            material.original_filename = os.path.basename(row["file"])[:255]
+            material.file_size = metadata["size"]
+            material.file_mime_type = metadata["mime_type"]
+            material.file_ext = metadata["ext"]
+            material.file_sha256 = metadata["sha256"]
+        return material
+
+    def import_batch(self, batch):
+        """Validate, ingest and insert one batch; returns an ImportResult"""
+        valid, errors = self.validate(batch)
+        result = ImportResult(errors=errors)
+        if self.dry_run or not valid:
+            return result
+
+        files = self.ingest_files(row["file"] for _, row, _ in valid if row.get("file"))
+        materials = [
+            self._build(row, subject_id, files.get(row.get("file")))
+            for _, row, subject_id in valid
+        ]
+
+        try:
+            with transaction.atomic():
+                Material.objects.bulk_create(materials)
+                sync_material_tags(materials)
+                rebuild_search_index([material.pk for material in materials])
+
+                references = {}
+                counts = Counter(m.file.name for m in materials if m.file)
+                for material in materials:
+                    if material.file and material.file.name not in references:
+                        references[material.file.name] = (
+                            material.file_sha256,
+                            material.file_size,
+                            counts[material.file.name],
+                        )
+                retain_blobs(references)
+        except Exception:
+            # The copies are stored but nothing points at them: record them
+            # with no references so gc_file_blobs can remove them
+            retain_blobs(
+                {m["name"]: (m["sha256"], m["size"], 0) for m in files.values()}
+            )
+            raise
+
+        result.created = [
+            (index, material) for (index, _, _), material in zip(valid, materials)
+        ]
+        return result
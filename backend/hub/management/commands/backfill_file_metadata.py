@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from hub.models import AssignmentSubmission, Material
+
+BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = "Record size, MIME type, extension and SHA-256 for stored files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute metadata for every file, not only missing rows",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        for model in (Material, AssignmentSubmission):
+            self.backfill(model, options["all"], options["batch_size"])
+
+    def backfill(self, model, recompute, batch_size):
+        field = model.FILE_FIELD
+        rows = model.objects.exclude(Q(**{f"{field}__isnull": True}) | Q(**{field: ""}))
+        if not recompute:
+            rows = rows.filter(Q(file_size__isnull=True) | Q(file_sha256=""))
+        rows = rows.only("pk", field).order_by("pk")
+
+        updated = missing = 0
+        batch = []
+        for instance in rows.iterator(chunk_size=batch_size):
+            try:
+                instance.capture_file_metadata(force=True)
+            except (FileNotFoundError, OSError) as e:
+                missing += 1
+                self.stderr.write(f"{model.__name__} {instance.pk}: {e}")
+                continue
+            batch.append(instance)
+            if len(batch) >= batch_size:
+                updated += self.write(model, batch)
+                batch = []
+        if batch:
+            updated += self.write(model, batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{model._meta.verbose_name_plural}: {updated} updated, "
+                f"{missing} missing files"
+            )
+        )
+
+    def write(self, model, batch):
+        model.objects.bulk_update(
+            batch, ["file_size", "file_mime_type", "file_ext", "file_sha256"]
+        )
+        return len(batch)
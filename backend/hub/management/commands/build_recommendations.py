@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hub.recommendations import (CONTENT_WEIGHT, TOP_K, build_similarities,
+                                 store_similarities)
+
+
+class Command(BaseCommand):
+    help = "Rebuild the precomputed similar-materials table from student progress"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-k",
+            type=int,
+            default=TOP_K,
+            help="Neighbours to keep per material",
+        )
+        parser.add_argument(
+            "--content-weight",
+            type=float,
+            default=CONTENT_WEIGHT,
+            help="Share of the score taken from subject/tag overlap (0-1)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Compute the neighbours without replacing the stored ones",
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options["content_weight"] <= 1:
+            raise CommandError("--content-weight must be between 0 and 1")
+
+        results = build_similarities(options["top_k"], options["content_weight"])
+        materials = len({material_id for material_id, *_ in results})
+        if options["dry_run"]:
+            self.stdout.write(
+                f"Would store {len(results)} neighbours for {materials} materials"
+            )
+            return
+        stored = store_similarities(results)
+        self.stdout.write(
+            self.style.SUCCESS(f"Stored {stored} neighbours for {materials} materials")
+        )
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hub.fanout import fan_out_roster
+from hub.models import Assignment
+
+
+class Command(BaseCommand):
+    help = "Copy cohort members onto assignment rosters still marked pending"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep running and sweep every N seconds (default: sweep once)",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            self.sweep()
+            if not interval:
+                break
+            time.sleep(interval)
+
+    def sweep(self):
+        pending = Assignment.objects.filter(roster_pending=True).values_list(
+            "pk", flat=True
+        )
+        total = 0
+        for assignment_id in list(pending):
+            added = fan_out_roster(assignment_id)
+            total += added
+            self.stdout.write(f"Assignment {assignment_id}: {added} students")
+        self.stdout.write(self.style.SUCCESS(f"Fanned out {total} roster entries"))
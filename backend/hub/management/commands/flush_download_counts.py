@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hub.counters import flush_download_counts
+
+
+class Command(BaseCommand):
+    help = "Write buffered material download counts to the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep running and flush every N seconds (default: flush once)",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            flushed = flush_download_counts()
+            self.stdout.write(f"Flushed download counts for {flushed} materials")
+            if not interval:
+                break
+            time.sleep(interval)
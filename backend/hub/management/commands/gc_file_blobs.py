@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from hub.blobs import GC_GRACE_PERIOD, collect_garbage, reconcile_ref_counts
+
+
+class Command(BaseCommand):
+    help = "Delete stored material files that no material references any more"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-minutes",
+            type=int,
+            default=int(GC_GRACE_PERIOD.total_seconds() // 60),
+            help="Keep unreferenced blobs released more recently than this",
+        )
+        parser.add_argument(
+            "--reconcile",
+            action="store_true",
+            help="Recount references from the materials table first",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List the blobs that would be deleted without deleting them",
+        )
+
+    def handle(self, *args, **options):
+        if options["reconcile"]:
+            count = reconcile_ref_counts()
+            self.stdout.write(f"Reconciled reference counts for {count} blobs")
+
+        removed = collect_garbage(
+            timedelta(minutes=options["grace_minutes"]), dry_run=options["dry_run"]
+        )
+        for name in removed:
+            self.stdout.write(name)
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(removed)} blobs"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from hub.models import AssignmentSubmission, Material
+from hub.previews import generate_preview
+from hub.thumbnails import IMAGE_TYPES
+
+
+class Command(BaseCommand):
+    help = "Render missing thumbnails for material and submission files"
+
+    def handle(self, *args, **options):
+        for model in (Material, AssignmentSubmission):
+            pending = (
+                model.objects.filter(preview_name="")
+                .filter(file_mime_type__in=IMAGE_TYPES + ("application/pdf",))
+                .values_list("pk", flat=True)
+                .order_by("pk")
+            )
+            done = 0
+            for pk in pending.iterator():
+                try:
+                    generate_preview(model._meta.label, pk)
+                    done += 1
+                except Exception as e:
+                    self.stderr.write(f"{model.__name__} {pk}: {e}")
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {done} processed")
@@ -0,0 +1,62 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from hub.gradebook import apply_import, plan_import, read_gradebook
+
+
+class Command(BaseCommand):
+    help = "Import scores from a gradebook spreadsheet (.csv or .xlsx)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "gradebook", help="Sheet with username, assignment and score columns"
+        )
+        parser.add_argument(
+            "--teacher", required=True, help="Username of the grading teacher"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the changes that would be made without saving them",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            teacher = get_user_model().objects.get(
+                username=options["teacher"], user_type="teacher"
+            )
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Unknown teacher {options['teacher']}")
+
+        started = time.monotonic()
+        try:
+            with open(options["gradebook"], "rb") as handle:
+                rows = read_gradebook(handle, options["gradebook"])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read gradebook: {e}")
+
+        plan = plan_import(teacher, rows)
+        for number, message in plan.errors:
+            self.stderr.write(f"Row {number}: {message}")
+        if options["dry_run"]:
+            for change in plan.changes:
+                self.stdout.write(
+                    f"Row {change.row}: {change.username} / {change.assignment}: "
+                    f"{change.old_score} -> {change.new_score} {change.new_grade} "
+                    f"({', '.join(change.targets)})"
+                )
+            updated = 0
+        else:
+            updated = apply_import(teacher, plan)
+
+        verb = "Would change" if options["dry_run"] else "Updated"
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {len(plan.changes)} grades ({updated} rows), "
+                f"{plan.unchanged} unchanged, {len(plan.errors)} invalid "
+                f"in {elapsed:.1f}s"
+            )
+        )
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from hub.cache import bump_version
+from hub.catalog import FACETS_CACHE_NAMESPACE
+from hub.importer import (BATCH_SIZE, FILE_WORKERS, FileSource,
+                          MaterialImporter, read_manifest)
+from hub.previews import generate_preview
+from hub.thumbnails import can_preview
+
+
+class Command(BaseCommand):
+    help = "Bulk-import materials from a CSV/JSON manifest and a directory or zip"
+
+    def add_arguments(self, parser):
+        parser.add_argument("manifest", help="CSV (with header) or JSON manifest")
+        parser.add_argument(
+            "--files", default="", help="Directory or .zip holding the files"
+        )
+        parser.add_argument(
+            "--uploaded-by", required=True, help="Username of the owning teacher"
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--workers", type=int, default=FILE_WORKERS)
+        parser.add_argument(
+            "--create-subjects",
+            action="store_true",
+            help="Create subjects named in the manifest that do not exist",
+        )
+        parser.add_argument(
+            "--state-file",
+            help="Progress file for resuming (default: <manifest>.import-state)",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore an existing progress file and import every row",
+        )
+        parser.add_argument(
+            "--previews",
+            action="store_true",
+            help="Render thumbnails for imported files before exiting",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Validate the manifest only"
+        )
+
+    def handle(self, *args, **options):
+        manifest = options["manifest"]
+        try:
+            rows = read_manifest(manifest)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read manifest: {e}")
+        if options["files"] and not os.path.exists(options["files"]):
+            raise CommandError(f"No such file or directory: {options['files']}")
+
+        try:
+            user = get_user_model().objects.get(username=options["uploaded_by"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Unknown user {options['uploaded_by']}")
+
+        state_path = options["state_file"] or f"{manifest}.import-state"
+        with open(manifest, "rb") as handle:
+            manifest_hash = hashlib.sha256(handle.read()).hexdigest()
+        done = set()
+        if not options["restart"] and not options["dry_run"]:
+            done = self.load_state(state_path, manifest_hash)
+            if done:
+                self.stdout.write(f"Resuming: {len(done)} rows already imported")
+
+        importer = MaterialImporter(
+            FileSource(options["files"]),
+            user,
+            create_subjects=options["create_subjects"],
+            workers=options["workers"],
+            dry_run=options["dry_run"],
+        )
+
+        pending = [(i, row) for i, row in enumerate(rows) if i not in done]
+        batch_size = max(options["batch_size"], 1)
+        started = time.monotonic()
+        created = errors = 0
+        previewable = []
+        try:
+            for start in range(0, len(pending), batch_size):
+                result = importer.import_batch(pending[start : start + batch_size])
+                for index, message in result.errors:
+                    # 1-based data row (a CSV header line is not counted)
+                    self.stderr.write(f"Row {index + 1}: {message}")
+                errors += len(result.errors)
+                created += len(result.created)
+                previewable.extend(
+                    material.pk
+                    for _, material in result.created
+                    if material.file and can_preview(material.file_mime_type)
+                )
+                if result.created:
+                    done.update(index for index, _ in result.created)
+                    self.save_state(state_path, manifest_hash, done)
+
+                processed = min(start + batch_size, len(pending))
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{processed}/{len(pending)} rows, {created} imported, "
+                    f"{errors} invalid ({processed / max(elapsed, 1e-6):.0f} rows/s)"
+                )
+        finally:
+            if created:
+                bump_version(FACETS_CACHE_NAMESPACE)
+
+        if options["previews"]:
+            for pk in previewable:
+                generate_preview("hub.Material", pk)
+            self.stdout.write(f"Rendered previews for {len(previewable)} files")
+
+        if importer.new_subjects:
+            verb = "Would create" if options["dry_run"] else "Created"
+            subjects = ", ".join(sorted(importer.new_subjects))
+            self.stdout.write(f"{verb} subjects: {subjects}")
+
+        verb = "Validated" if options["dry_run"] else "Imported"
+        count = len(pending) - errors if options["dry_run"] else created
+        self.stdout.write(
+            self.style.SUCCESS(f"{verb} {count} materials, {errors} invalid rows")
+        )
+        if not errors and not options["dry_run"] and os.path.exists(state_path):
+            os.remove(state_path)
+
+    def load_state(self, path, manifest_hash):
+        try:
+            with open(path) as handle:
+                state = json.load(handle)
+        except (OSError, ValueError):
+            return set()
+        if state.get("manifest_sha256") != manifest_hash:
+            raise CommandError(
+                f"{path} belongs to a different manifest; use --restart to ignore it"
+            )
+        return set(state.get("done", []))
+
+    def save_state(self, path, manifest_hash, done):
+        # Written after each committed batch; replace() keeps it consistent
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as handle:
+            json.dump({"manifest_sha256": manifest_hash, "done": sorted(done)}, handle)
+        os.replace(tmp_path, path)
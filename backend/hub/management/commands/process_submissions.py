@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hub.submissions import due_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Run submission processing jobs that are due, retried or abandoned"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep running and sweep every N seconds (default: sweep once)",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            states = [run_job(job_id) for job_id in list(due_jobs())]
+            done = states.count("done")
+            self.stdout.write(
+                f"Processed {done} submissions, {len(states) - done} not finished"
+            )
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from hub.uploads import purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = "Delete expired resumable uploads and their partial files"
+
+    def handle(self, *args, **options):
+        count = purge_expired_sessions()
+        self.stdout.write(self.style.SUCCESS(f"Purged {count} upload sessions"))
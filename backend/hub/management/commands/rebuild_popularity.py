@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from hub.popularity import rebuild_from_progress
+
+
+class Command(BaseCommand):
+    help = "Seed the trending scores from existing student progress"
+
+    def handle(self, *args, **options):
+        count = rebuild_from_progress()
+        self.stdout.write(self.style.SUCCESS(f"Scored {count} materials"))
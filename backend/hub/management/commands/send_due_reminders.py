@@ -0,0 +1,34 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from hub.reminders import REMINDER_LEAD, send_due_reminders
+
+
+class Command(BaseCommand):
+    help = "Remind students of assignments due soon that they have not submitted"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lead-hours",
+            type=int,
+            default=int(REMINDER_LEAD.total_seconds() // 3600),
+            help="Remind about assignments due within this many hours",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep running and sweep every N seconds (default: sweep once)",
+        )
+
+    def handle(self, *args, **options):
+        lead = timedelta(hours=options["lead_hours"])
+        interval = options["interval"]
+        while True:
+            reminded = send_due_reminders(lead=lead)
+            self.stdout.write(f"Sent due-soon reminders to {reminded} students")
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:37
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX hub_material_search_gin ON hub_material USING gin (search_vector)",
+    """
+    UPDATE hub_material SET search_vector =
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(tags, '')), 'C')
+    """,
+]
+POSTGRES_BACKWARD = ["DROP INDEX IF EXISTS hub_material_search_gin"]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE hub_material_fts USING fts5("
+    "title, description, tags, tokenize = 'porter unicode61')",
+    "INSERT INTO hub_material_fts (rowid, title, description, tags) "
+    "SELECT id, title, description, tags FROM hub_material",
+]
+SQLITE_BACKWARD = ["DROP TABLE IF EXISTS hub_material_fts"]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hub", "0003_assignmentsubmission"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="material",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(
+            _run({"postgresql": POSTGRES_FORWARD, "sqlite": SQLITE_FORWARD}),
+            _run({"postgresql": POSTGRES_BACKWARD, "sqlite": SQLITE_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hub", "0004_material_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("material_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Tag",
+                "verbose_name_plural": "Tags",
+                "ordering": ["name"],
+                "indexes": [
+                    models.Index(
+                        fields=["-material_count", "name"],
+                        name="hub_tag_materia_6dc71f_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="MaterialTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "material",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="material_tags",
+                        to="hub.material",
+                    ),
+                ),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="material_tags",
+                        to="hub.tag",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Material Tag",
+                "verbose_name_plural": "Material Tags",
+            },
+        ),
+        migrations.AddField(
+            model_name="material",
+            name="normalized_tags",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="materials",
+                through="hub.MaterialTag",
+                to="hub.tag",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="materialtag",
+            index=models.Index(
+                fields=["tag", "material"], name="hub_materia_tag_id_d2f26f_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="materialtag",
+            unique_together={("material", "tag")},
+        ),
+    ]
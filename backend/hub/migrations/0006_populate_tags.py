@@ -0,0 +1,56 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def _parse(raw):
+    names = []
+    for part in (raw or "").split(","):
+        name = " ".join(part.split()).lower()[:50]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def populate_tags(apps, schema_editor):
+    Material = apps.get_model("hub", "Material")
+    Tag = apps.get_model("hub", "Tag")
+    MaterialTag = apps.get_model("hub", "MaterialTag")
+
+    parsed = {
+        pk: _parse(tags)
+        for pk, tags in Material.objects.exclude(tags="").values_list("pk", "tags")
+    }
+    all_names = {name for names in parsed.values() for name in names}
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in sorted(all_names)], ignore_conflicts=True
+    )
+    tag_ids = dict(Tag.objects.values_list("name", "pk"))
+
+    MaterialTag.objects.bulk_create(
+        [
+            MaterialTag(material_id=pk, tag_id=tag_ids[name])
+            for pk, names in parsed.items()
+            for name in names
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+    counts = (
+        MaterialTag.objects.filter(material__is_active=True)
+        .values("tag_id")
+        .annotate(n=Count("id"))
+    )
+    for row in counts:
+        Tag.objects.filter(pk=row["tag_id"]).update(material_count=row["n"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hub", "0005_tags"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hub", "0006_populate_tags"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="assignmentsubmission",
+            name="file_ext",
+            field=models.CharField(blank=True, editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name="assignmentsubmission",
+            name="file_mime_type",
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="assignmentsubmission",
+            name="file_sha256",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=64
+            ),
+        ),
+        migrations.AddField(
+            model_name="assignmentsubmission",
+            name="file_size",
+            field=models.PositiveBigIntegerField(
+                blank=True, editable=False, help_text="Size in bytes", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="material",
+            name="file_ext",
+            field=models.CharField(blank=True, editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name="material",
+            name="file_mime_type",
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="material",
+            name="file_sha256",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=64
+            ),
+        ),
+        migrations.AddField(
+            model_name="material",
+            name="file_size",
+            field=models.PositiveBigIntegerField(
+                blank=True, editable=False, help_text="Size in bytes", null=True
+            ),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:50
+
+import django.core.validators
+import hub.models
+import hub.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hub", "0007_file_metadata"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="material",
+            name="original_filename",
+            field=models.CharField(
+                blank=True, help_text="File name as uploaded", max_length=255
+            ),
+        ),
+        migrations.AlterField(
+            model_name="material",
+            name="file",
+            field=models.FileField(
+                blank=True,
+                help_text="Upload educational material (max 50MB)",
+                null=True,
+                storage=hub.storage.material_storage,
+                upload_to=hub.models.material_upload_path,
+                validators=[
+                    hub.models.validate_file_size,
+                    django.core.validators.FileExtensionValidator(
+                        allowed_extensions=[
+                            "pdf",
+                            "doc",
+                            "docx",
+                            "ppt",
+                            "pptx",
+                            "xls",
+                            "xlsx",
+                            "jpg",
+                            "jpeg",
+                            "png",
+                            "gif",
+                            "svg",
+                            "mp4",
+                            "avi",
+                            "mov",
+                            "wmv",
+                            "mp3",
+                            "wav",
+                            "ogg",
+                            "zip",
+                            "rar",
+                            "txt",
+                        ]
+                    ),
+                ],
+            ),
+        ),
+        migrations.CreateModel(
+            name="FileBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("sha256", models.CharField(db_index=True, max_length=64)),
+                ("size", models.PositiveBigIntegerField(default=0)),
+                ("ref_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "File Blob",
+                "verbose_name_plural": "File Blobs",
+                "indexes": [
+                    models.Index(
+                        fields=["ref_count", "updated_at"],
+                        name="hub_fileblo_ref_cou_ded632_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hub", "0009_upload_sessions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="assignmentsubmission",
+            name="preview_name",
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="material",
+            name="preview_name",
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+    ]
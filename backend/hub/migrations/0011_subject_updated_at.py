@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hub", "0010_file_previews"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subject",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+    ]
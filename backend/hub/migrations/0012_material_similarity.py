@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hub", "0011_subject_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MaterialSimilarity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                ("rank", models.PositiveSmallIntegerField()),
+                (
+                    "material",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similar_entries",
+                        to="hub.material",
+                    ),
+                ),
+                (
+                    "similar",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="hub.material",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Material Similarity",
+                "verbose_name_plural": "Material Similarities",
+                "indexes": [
+                    models.Index(
+                        fields=["material", "rank"],
+                        name="hub_materia_materia_832804_idx",
+                    )
+                ],
+                "unique_together": {("material", "similar")},
+            },
+        ),
+    ]
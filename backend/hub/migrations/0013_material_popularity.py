@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hub", "0012_material_similarity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MaterialPopularity",
+            fields=[
+                (
+                    "material",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="popularity",
+                        serialize=False,
+                        to="hub.material",
+                    ),
+                ),
+                ("score", models.FloatField(db_index=True, default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Material Popularity",
+                "verbose_name_plural": "Material Popularity",
+            },
+        ),
+    ]
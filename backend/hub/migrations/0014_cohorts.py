@@ -0,0 +1,72 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hub", "0013_material_popularity"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="assignment",
+            name="roster_pending",
+            field=models.BooleanField(
+                default=False,
+                help_text="Cohort members still being added to the roster",
+            ),
+        ),
+        migrations.CreateModel(
+            name="Cohort",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("description", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="created_cohorts",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "students",
+                    models.ManyToManyField(
+                        blank=True,
+                        limit_choices_to={"user_type": "student"},
+                        related_name="cohorts",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Cohort",
+                "verbose_name_plural": "Cohorts",
+                "ordering": ["name"],
+                "unique_together": {("created_by", "name")},
+            },
+        ),
+        migrations.AddField(
+            model_name="assignment",
+            name="cohorts",
+            field=models.ManyToManyField(
+                blank=True, related_name="assignments", to="hub.cohort"
+            ),
+        ),
+    ]
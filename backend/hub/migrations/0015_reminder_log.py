@@ -0,0 +1,72 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hub", "0014_cohorts"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderLog",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("due_soon", "Due Soon")],
+                        default="due_soon",
+                        max_length=20,
+                    ),
+                ),
+                ("claimed_by", models.CharField(max_length=32)),
+                ("claimed_at", models.DateTimeField()),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "assignment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reminder_logs",
+                        to="hub.assignment",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reminder_logs",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Reminder Log",
+                "verbose_name_plural": "Reminder Logs",
+                "indexes": [
+                    models.Index(
+                        fields=["claimed_by", "sent_at"],
+                        name="hub_reminde_claimed_e10cfd_idx",
+                    ),
+                    models.Index(
+                        fields=["sent_at", "claimed_at"],
+                        name="hub_reminde_sent_at_6b0ee4_idx",
+                    ),
+                ],
+                "unique_together": {("assignment", "student", "kind")},
+            },
+        ),
+    ]
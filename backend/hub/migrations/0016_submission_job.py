@@ -0,0 +1,77 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:43
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hub", "0015_reminder_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubmissionJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "stage",
+                    models.CharField(
+                        choices=[
+                            ("metadata", "Checksum and metadata"),
+                            ("preview", "Preview"),
+                            ("notify", "Teacher notification"),
+                        ],
+                        default="metadata",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("run_after", models.DateTimeField(default=django.utils.timezone.now)),
+                ("claimed_at", models.DateTimeField(blank=True, null=True)),
+                ("last_error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "submission",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="processing_job",
+                        to="hub.assignmentsubmission",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Submission Job",
+                "verbose_name_plural": "Submission Jobs",
+                "indexes": [
+                    models.Index(
+                        fields=["state", "run_after"],
+                        name="hub_submiss_state_e2b09c_idx",
+                    )
+                ],
+            },
+        ),
+    ]
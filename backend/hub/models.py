@@ -1,10 +1,18 @@
 import os
+import uuid
 
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.core.validators import (FileExtensionValidator, MaxValueValidator,
                                     MinValueValidator)
 from django.db import models
+from django.urls import reverse
+from django.utils import timezone
+
+from .files import file_extension, file_metadata
+from .grade_scales import PROGRESS_SCALE, SUBMISSION_SCALE
+from .storage import material_storage
 
 
 def validate_file_size(file):
@@ -16,21 +24,25 @@ def validate_file_size(file):
 
 
 def material_upload_path(instance, filename):
-    """Generate organized upload path for materials"""
-    # Get file extension
-    ext = filename.split(".")[-1]
-    # Create organized path: materials/subject/year-month/filename
-    from datetime import datetime
-
-    date_path = datetime.now().strftime("%Y-%m")
-    subject_name = instance.subject.name.lower().replace(" ", "_")
-
-    # Sanitize filename
-    safe_filename = "".join(
-        c for c in filename if c.isalnum() or c in (" ", "-", "_", ".")
-    ).rstrip()
-
-    return os.path.join("materials", subject_name, date_path, safe_filename)
+    """
+    Content-addressed path for material files.
+
+    Files are named by their SHA-256 so identical uploads share one stored
+    copy, tracked by a FileBlob row. The original name is kept on the
+    material for downloads.
+    """
+    digest = instance.file_sha256
+    ext = "".join(c for c in file_extension(filename) if c.isalnum())
+    if not digest:
+        # Metadata not captured (e.g. saved outside Material.save)
+        from datetime import datetime
+
+        date_path = datetime.now().strftime("%Y-%m")
+        safe_filename = "".join(
+            c for c in filename if c.isalnum() or c in (" ", "-", "_", ".")
+        ).rstrip()
+        return os.path.join("materials", "uploads", date_path, safe_filename)
+    return f"materials/blobs/{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
 
 
 class Subject(models.Model):
@@ -43,6 +55,7 @@ class Subject(models.Model):
     )
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
 
     class Meta:
         ordering = ["name"]
@@ -64,9 +77,87 @@ class Subject(models.Model):
         return self.name
 
 
-class Material(models.Model):
+class FileMetadata(models.Model):
+    """
+    Size, type and checksum of an uploaded file, captured once on save.
+
+    Subclasses set ``FILE_FIELD`` to the name of their FileField so pages
+    listing many rows never need to stat storage, and ``PREVIEW_URL_NAME``
+    to the view serving their thumbnail.
+    """
+
+    FILE_FIELD = "file"
+    PREVIEW_URL_NAME = None
+
+    file_size = models.PositiveBigIntegerField(
+        null=True, blank=True, editable=False, help_text="Size in bytes"
+    )
+    file_mime_type = models.CharField(max_length=100, blank=True, editable=False)
+    file_ext = models.CharField(max_length=10, blank=True, editable=False)
+    file_sha256 = models.CharField(
+        max_length=64, blank=True, editable=False, db_index=True
+    )
+    # Thumbnail written by hub.previews once the upload has been saved
+    preview_name = models.CharField(max_length=255, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def capture_file_metadata(self, force=False):
+        """Record metadata for a new upload (or always, with ``force``)"""
+        fieldfile = getattr(self, self.FILE_FIELD)
+        if not fieldfile:
+            self._file_changed = bool(self.file_sha256)
+            self.file_size = None
+            self.file_mime_type = self.file_ext = self.file_sha256 = ""
+            self.preview_name = ""
+            return
+        if fieldfile._committed and not force:
+            return
+        self._file_changed = not fieldfile._committed
+        if self._file_changed:
+            self.preview_name = ""
+        metadata = file_metadata(fieldfile)
+        self.file_size = metadata["size"]
+        self.file_mime_type = metadata["mime_type"]
+        self.file_ext = metadata["ext"]
+        self.file_sha256 = metadata["sha256"]
+
+    def forget_file_metadata(self):
+        """Blank the metadata of a new upload that is captured later"""
+        fieldfile = getattr(self, self.FILE_FIELD)
+        if fieldfile and fieldfile._committed:
+            return
+        self.file_size = None
+        self.file_mime_type = self.file_ext = self.file_sha256 = ""
+        self.preview_name = ""
+
+    @property
+    def file_size_mb(self):
+        """Return file size in MB"""
+        if self.file_size:
+            return round(self.file_size / (1024 * 1024), 2)
+        return 0
+
+    @property
+    def file_extension(self):
+        """Return file extension"""
+        return self.file_ext.upper() or None
+
+    @property
+    def preview_url(self):
+        """Thumbnail URL, versioned by content so it can be cached for good"""
+        if not self.preview_name or not self.PREVIEW_URL_NAME:
+            return None
+        url = reverse(self.PREVIEW_URL_NAME, args=[self.pk])
+        return f"{url}?v={self.file_sha256[:16]}"
+
+
+class Material(FileMetadata):
     """Educational materials for students"""
 
+    PREVIEW_URL_NAME = "hub:material_preview"
+
     MATERIAL_TYPES = (
         ("worksheet", "Worksheet"),
         ("test", "Test"),
@@ -113,6 +204,7 @@ class Material(models.Model):
     # File upload with validation
     file = models.FileField(
         upload_to=material_upload_path,
+        storage=material_storage,
         blank=True,
         null=True,
         validators=[
@@ -146,6 +238,9 @@ class Material(models.Model):
         ],
         help_text="Upload educational material (max 50MB)",
     )
+    original_filename = models.CharField(
+        max_length=255, blank=True, help_text="File name as uploaded"
+    )
     external_link = models.URLField(blank=True, help_text="External resource link")
 
     # Metadata
@@ -155,12 +250,16 @@ class Material(models.Model):
         help_text="Estimated time in minutes (1-1440)",
     )
 
-    # Tags for better organization
+    # Tags for better organization. The string is the editable form; it is
+    # normalized into Tag/MaterialTag rows on save for indexed lookups.
     tags = models.CharField(
         max_length=500,
         blank=True,
         help_text="Comma-separated tags (e.g., algebra, fractions, beginner)",
     )
+    normalized_tags = models.ManyToManyField(
+        "Tag", through="MaterialTag", related_name="materials", blank=True
+    )
 
     # Tracking
     uploaded_by = models.ForeignKey(
@@ -173,6 +272,9 @@ class Material(models.Model):
     is_active = models.BooleanField(default=True)
     download_count = models.PositiveIntegerField(default=0, null=True, blank=True)
 
+    # Full-text search document (PostgreSQL only, maintained by hub.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "Material"
@@ -194,25 +296,123 @@ class Material(models.Model):
             )
 
     def save(self, *args, **kwargs):
+        from .blobs import update_blob_refs
+
         self.full_clean()
+        new_upload = bool(self.file) and not self.file._committed
+        if new_upload:
+            self.original_filename = os.path.basename(self.file.name)
+        previous_file = self.file.name or ""
+        if self.pk and (new_upload or not self.file):
+            previous_file = (
+                Material.objects.filter(pk=self.pk)
+                .values_list("file", flat=True)
+                .first()
+                or ""
+            )
+        self.capture_file_metadata()
         super().save(*args, **kwargs)
+        update_blob_refs(self, previous_file)
 
     def __str__(self):
         return f"{self.title} ({self.subject.name})"
 
     @property
-    def file_size_mb(self):
-        """Return file size in MB"""
-        if self.file:
-            return round(self.file.size / (1024 * 1024), 2)
-        return 0
+    def download_filename(self):
+        """Name to offer in Content-Disposition"""
+        if self.original_filename:
+            return self.original_filename
+        return os.path.basename(self.file.name) if self.file else ""
 
-    @property
-    def file_extension(self):
-        """Return file extension"""
-        if self.file:
-            return os.path.splitext(self.file.name)[1][1:].upper()
-        return None
+
+class Tag(models.Model):
+    """Normalized material tag with a precomputed active-material count"""
+
+    name = models.CharField(max_length=50, unique=True)
+    material_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["name"]
+        verbose_name = "Tag"
+        verbose_name_plural = "Tags"
+        indexes = [
+            models.Index(fields=["-material_count", "name"]),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class FileBlob(models.Model):
+    """A stored material file shared by every material with the same content"""
+
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "File Blob"
+        verbose_name_plural = "File Blobs"
+        indexes = [
+            # Garbage collection scans unreferenced blobs by age
+            models.Index(fields=["ref_count", "updated_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class MaterialTag(models.Model):
+    """Through table linking materials to tags"""
+
+    material = models.ForeignKey(
+        Material, on_delete=models.CASCADE, related_name="material_tags"
+    )
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="material_tags")
+
+    class Meta:
+        unique_together = ("material", "tag")
+        verbose_name = "Material Tag"
+        verbose_name_plural = "Material Tags"
+        indexes = [
+            # Inverted index: tag -> materials
+            models.Index(fields=["tag", "material"]),
+        ]
+
+    def __str__(self):
+        return f"{self.material_id} - {self.tag_id}"
+
+
+class Cohort(models.Model):
+    """A class or group of students that can be assigned work together"""
+
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    students = models.ManyToManyField(
+        settings.AUTH_USER_MODEL,
+        related_name="cohorts",
+        blank=True,
+        limit_choices_to={"user_type": "student"},
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="created_cohorts",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["name"]
+        unique_together = ("created_by", "name")
+        verbose_name = "Cohort"
+        verbose_name_plural = "Cohorts"
+
+    def __str__(self):
+        return self.name
 
 
 class Assignment(models.Model):
@@ -237,6 +437,11 @@ class Assignment(models.Model):
         related_name="assignments",
         limit_choices_to={"user_type": "student"},
     )
+    # Cohort members are copied into assigned_to by hub.fanout
+    cohorts = models.ManyToManyField(Cohort, related_name="assignments", blank=True)
+    roster_pending = models.BooleanField(
+        default=False, help_text="Cohort members still being added to the roster"
+    )
     due_date = models.DateTimeField()
     priority = models.CharField(
         max_length=10, choices=PRIORITY_LEVELS, default="medium"
@@ -429,24 +634,15 @@ class StudentProgress(models.Model):
     @property
     def grade_letter(self):
         """Convert numeric score to letter grade"""
-        if self.score is None:
-            return None
-
-        if self.score >= 90:
-            return "A"
-        elif self.score >= 80:
-            return "B"
-        elif self.score >= 70:
-            return "C"
-        elif self.score >= 60:
-            return "D"
-        else:
-            return "F"
+        return PROGRESS_SCALE.letter(self.score)
 
 
-class AssignmentSubmission(models.Model):
+class AssignmentSubmission(FileMetadata):
     """Student submissions for assignments"""
 
+    FILE_FIELD = "submission_file"
+    PREVIEW_URL_NAME = "hub:submission_preview"
+
     SUBMISSION_STATUS = (
         ("submitted", "Submitted"),
         ("under_review", "Under Review"),
@@ -549,30 +745,9 @@ class AssignmentSubmission(models.Model):
 
         if self.numeric_score and not self.grade:
             # Auto-assign letter grade based on numeric score
-            if self.numeric_score >= 97:
-                self.grade = "A+"
-            elif self.numeric_score >= 93:
-                self.grade = "A"
-            elif self.numeric_score >= 90:
-                self.grade = "A-"
-            elif self.numeric_score >= 87:
-                self.grade = "B+"
-            elif self.numeric_score >= 83:
-                self.grade = "B"
-            elif self.numeric_score >= 80:
-                self.grade = "B-"
-            elif self.numeric_score >= 77:
-                self.grade = "C+"
-            elif self.numeric_score >= 73:
-                self.grade = "C"
-            elif self.numeric_score >= 70:
-                self.grade = "C-"
-            elif self.numeric_score >= 60:
-                self.grade = "D"
-            else:
-                self.grade = "F"
+            self.grade = SUBMISSION_SCALE.letter(self.numeric_score)
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, defer_metadata=False, **kwargs):
         # Update grading timestamp when grade is added
         if self.grade and not self.graded_at:
             from django.utils import timezone
@@ -585,6 +760,11 @@ class AssignmentSubmission(models.Model):
             self.status = "returned"
 
         self.full_clean()
+        if defer_metadata:
+            # Hashing a large upload is left to hub.submissions
+            self.forget_file_metadata()
+        else:
+            self.capture_file_metadata()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -603,16 +783,146 @@ class AssignmentSubmission(models.Model):
         delta = self.submitted_at.date() - self.assignment.due_date.date()
         return delta.days
 
-    @property
-    def file_extension(self):
-        """Return file extension of submitted file"""
-        if self.submission_file:
-            return os.path.splitext(self.submission_file.name)[1][1:].upper()
-        return None
 
-    @property
-    def file_size_mb(self):
-        """Return file size in MB"""
-        if self.submission_file:
-            return round(self.submission_file.size / (1024 * 1024), 2)
-        return 0
+class UploadSession(models.Model):
+    """
+    A resumable upload in progress.
+
+    Bytes are appended to a part file on local disk; its size is the upload
+    offset, so an interrupted transfer resumes where the disk says it ended.
+    """
+
+    PURPOSES = (
+        ("material", "Material file"),
+        ("submission", "Assignment submission"),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="upload_sessions",
+    )
+    purpose = models.CharField(max_length=20, choices=PURPOSES)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(help_text="Declared total size in bytes")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Upload Session"
+        verbose_name_plural = "Upload Sessions"
+
+    def __str__(self):
+        return f"{self.filename} ({self.user_id})"
+
+
+class MaterialSimilarity(models.Model):
+    """Precomputed top-K neighbours of a material (see hub.recommendations)"""
+
+    material = models.ForeignKey(
+        Material, on_delete=models.CASCADE, related_name="similar_entries"
+    )
+    similar = models.ForeignKey(Material, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ("material", "similar")
+        verbose_name = "Material Similarity"
+        verbose_name_plural = "Material Similarities"
+        indexes = [
+            # Serving reads one material's neighbours in rank order
+            models.Index(fields=["material", "rank"]),
+        ]
+
+    def __str__(self):
+        return f"{self.material_id} -> {self.similar_id} ({self.score:.3f})"
+
+
+class MaterialPopularity(models.Model):
+    """Time-decayed activity score of a material (see hub.popularity)"""
+
+    material = models.OneToOneField(
+        Material, on_delete=models.CASCADE, primary_key=True, related_name="popularity"
+    )
+    # Forward-decayed: compare scores directly, divide by the current boost
+    # for an absolute value
+    score = models.FloatField(default=0, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Material Popularity"
+        verbose_name_plural = "Material Popularity"
+
+    def __str__(self):
+        return f"{self.material_id}: {self.score:.3g}"
+
+
+class ReminderLog(models.Model):
+    """Ledger of reminders, claimed before sending so each goes out once"""
+
+    KINDS = (("due_soon", "Due Soon"),)
+
+    assignment = models.ForeignKey(
+        Assignment, on_delete=models.CASCADE, related_name="reminder_logs"
+    )
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="reminder_logs",
+    )
+    kind = models.CharField(max_length=20, choices=KINDS, default="due_soon")
+    # Which scheduler run owns the row, and since when
+    claimed_by = models.CharField(max_length=32)
+    claimed_at = models.DateTimeField()
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("assignment", "student", "kind")
+        verbose_name = "Reminder Log"
+        verbose_name_plural = "Reminder Logs"
+        indexes = [
+            models.Index(fields=["claimed_by", "sent_at"]),
+            models.Index(fields=["sent_at", "claimed_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.assignment_id} -> {self.student_id}"
+
+
+class SubmissionJob(models.Model):
+    """Background processing still owed to a submission (see hub.submissions)"""
+
+    STAGES = (
+        ("metadata", "Checksum and metadata"),
+        ("preview", "Preview"),
+        ("notify", "Teacher notification"),
+    )
+    STATES = (
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    )
+
+    submission = models.OneToOneField(
+        AssignmentSubmission, on_delete=models.CASCADE, related_name="processing_job"
+    )
+    # The next stage to run; finished stages are not repeated on retry
+    stage = models.CharField(max_length=20, choices=STAGES, default="metadata")
+    state = models.CharField(max_length=20, choices=STATES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Submission Job"
+        verbose_name_plural = "Submission Jobs"
+        indexes = [models.Index(fields=["state", "run_after"])]
+
+    def __str__(self):
+        return f"Submission {self.submission_id}: {self.stage} ({self.state})"
@@ -0,0 +1,103 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder, but keeping datetimes to the microsecond"""
+
+    def default(self, o):
+        # The stock encoder rounds to milliseconds, so the seek would land
+        # before the last row and repeat it on the next page
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    """Encode the ordering values of the last row into an opaque cursor"""
+    payload = json.dumps(list(values), cls=CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, model, ordering):
+    """Decode a cursor back into python values matching ``ordering``"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor("Cursor does not match ordering")
+
+    decoded = []
+    for value, field_name in zip(values, ordering):
+        try:
+            field = model._meta.get_field(field_name.lstrip("-"))
+        except FieldDoesNotExist:
+            # Annotations carry plain JSON values (numbers, strings)
+            decoded.append(value)
+            continue
+        try:
+            decoded.append(field.to_python(value))
+        except ValidationError as e:
+            raise InvalidCursor("Cursor value is invalid") from e
+    return decoded
+
+
+def _seek_filter(ordering, values):
+    """Build the row-value comparison ``(a, b) > (x, y)`` as an OR of ANDs"""
+    condition = Q()
+    for i, field_name in enumerate(ordering):
+        name = field_name.lstrip("-")
+        lookup = "lt" if field_name.startswith("-") else "gt"
+        step = Q(**{f"{name}__{lookup}": values[i]})
+        for prev_name, prev_value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev_name.lstrip("-"): prev_value})
+        condition |= step
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, limit=20):
+    """
+    Return one page of ``queryset`` using keyset (seek) pagination.
+
+    ``ordering`` must be a unique, total ordering (end it with ``id``) so
+    the cursor identifies exactly one position. The cost of fetching a page
+    is independent of how deep into the result set it is.
+
+    Returns a ``(items, next_cursor)`` tuple; ``next_cursor`` is None on the
+    last page. Raises InvalidCursor for tampered or stale cursors.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(cursor, queryset.model, ordering)
+        queryset = queryset.filter(_seek_filter(ordering, values))
+
+    items = list(queryset[: limit + 1])
+    if len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    last = items[-1]
+    next_cursor = encode_cursor(
+        getattr(last, _attname(queryset.model, name.lstrip("-"))) for name in ordering
+    )
+    return items, next_cursor
+
+
+def _attname(model, name):
+    """Map a field name (e.g. ``subject``) to its attribute (``subject_id``)"""
+    try:
+        return model._meta.get_field(name).attname
+    except FieldDoesNotExist:
+        return name
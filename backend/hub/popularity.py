@@ -0,0 +1,130 @@
+"""
+Trending materials: activity scores with exponential time decay.
+
+Scores use forward decay. An event at time ``t`` adds
+``weight * 2 ** ((t - EPOCH) / HALF_LIFE)`` to the material's stored score,
+so older events never have to be rewritten. Every stored score shrinks by
+the same factor as time passes, which means the stored values rank
+materials exactly as their decayed scores would. Dividing by
+``current_boost()`` turns a stored score back into "weighted events, decayed
+to now".
+
+Each update is one indexed increment on the ``MaterialPopularity`` row.
+Reading the top K is an index scan of K rows. Downloads arrive in batches
+through the download-counter flush; progress events arrive from signals.
+"""
+
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.utils import timezone
+
+from .cache import bump_version
+from .models import Material, MaterialPopularity, StudentProgress
+
+# Bumped whenever scores move, so pages ordered by them revalidate
+POPULARITY_CACHE_NAMESPACE = "popularity"
+
+# A 7-day half-life stays within double precision for about 19 years
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+HALF_LIFE = timedelta(days=7)
+
+EVENT_WEIGHTS = {
+    "download": 1.0,
+    "start": 2.0,
+    "complete": 4.0,
+}
+
+UPDATE_CHUNK_SIZE = 500
+
+
+def current_boost(when=None):
+    """Multiplier applied to an event happening at ``when`` (default: now)"""
+    elapsed = (when or timezone.now()) - EPOCH
+    return 2 ** (elapsed / HALF_LIFE)
+
+
+def decayed_score(score, when=None):
+    """A stored score expressed as weighted events decayed to ``when``"""
+    return score / current_boost(when)
+
+
+def add_activity(weights, when=None):
+    """Add ``{material_id: weighted events}`` at time ``when`` in bulk"""
+    boost = current_boost(when)
+    now = timezone.now()
+    items = [(pk, weight * boost) for pk, weight in weights.items() if weight]
+    with transaction.atomic():
+        for start in range(0, len(items), UPDATE_CHUNK_SIZE):
+            chunk = dict(items[start : start + UPDATE_CHUNK_SIZE])
+            # Rows for materials seen for the first time; deleted ones drop out
+            existing = Material.objects.filter(pk__in=chunk).values_list(
+                "pk", flat=True
+            )
+            MaterialPopularity.objects.bulk_create(
+                [MaterialPopularity(material_id=pk, score=0) for pk in existing],
+                ignore_conflicts=True,
+            )
+            MaterialPopularity.objects.filter(material_id__in=chunk).update(
+                score=F("score")
+                + Case(
+                    *[
+                        When(material_id=pk, then=Value(inc))
+                        for pk, inc in chunk.items()
+                    ],
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                ),
+                updated_at=now,
+            )
+        transaction.on_commit(lambda: bump_version(POPULARITY_CACHE_NAMESPACE))
+    return len(items)
+
+
+def record_event(material_id, kind, when=None):
+    """Count one ``download``, ``start`` or ``complete`` for a material"""
+    add_activity({material_id: EVENT_WEIGHTS[kind]}, when)
+
+
+def rebuild_from_progress():
+    """
+    Replace every score with one computed from ``StudentProgress`` history.
+
+    Only needed once, to seed the table; downloads have no timestamps and
+    are left out. Afterwards the scores are maintained event by event.
+    """
+    scores = {}
+    progress = StudentProgress.objects.exclude(status="not_started").values_list(
+        "material_id", "status", "started_at", "completed_at"
+    )
+    for material_id, status, started_at, completed_at in progress.iterator(
+        chunk_size=5000
+    ):
+        score = EVENT_WEIGHTS["start"] * current_boost(started_at)
+        if status == "completed" and completed_at:
+            score += EVENT_WEIGHTS["complete"] * current_boost(completed_at)
+        scores[material_id] = scores.get(material_id, 0) + score
+
+    with transaction.atomic():
+        MaterialPopularity.objects.all().delete()
+        MaterialPopularity.objects.bulk_create(
+            [
+                MaterialPopularity(material_id=pk, score=score)
+                for pk, score in scores.items()
+            ],
+            batch_size=UPDATE_CHUNK_SIZE,
+        )
+        transaction.on_commit(lambda: bump_version(POPULARITY_CACHE_NAMESPACE))
+    return len(scores)
+
+
+def trending_materials(limit=10):
+    """Active materials with recent activity, hottest first"""
+    return (
+        Material.objects.filter(is_active=True, popularity__isnull=False)
+        .select_related("subject")
+        .annotate(popularity_score=F("popularity__score"))
+        .order_by("-popularity_score", "-id")[:limit]
+    )
@@ -0,0 +1,193 @@
+"""
+Background preview generation for uploaded files.
+
+Saving a material or submission with a new file queues a job once the
+transaction commits. A dispatcher thread takes jobs off a bounded queue and
+hands the CPU-heavy rendering (``hub.thumbnails``) to a small process pool;
+at most two jobs per worker are in flight, so a burst of uploads waits in
+the queue instead of piling onto the pool. The finished thumbnail is stored
+next to the original and recorded in ``preview_name``. Recording it moves
+the material's ``updated_at``, or the student's cache version for a
+submission, so conditional GETs and cached fragments show the thumbnail.
+
+With ``PREVIEW_WORKERS = 0`` previews are rendered synchronously instead,
+which is what the tests and the ``generate_previews`` command use.
+"""
+
+import atexit
+import logging
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.utils import timezone
+
+from .cache import bump_version, user_namespace
+from .catalog import FACETS_CACHE_NAMESPACE
+from .files import preview_name_for
+from .thumbnails import can_preview, render_preview
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 1000
+JOBS_PER_WORKER = 2
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+@dataclass
+class PreviewTask:
+    model: type
+    pk: int
+    storage: object
+    source_name: str
+    preview_name: str
+    path: str
+    mime_type: str
+
+
+def _prepare(label, pk):
+    """Load what a worker needs, or return None when there is nothing to do"""
+    model = apps.get_model(label)
+    instance = (
+        model.objects.filter(pk=pk)
+        .only("pk", model.FILE_FIELD, "file_mime_type")
+        .first()
+    )
+    if instance is None:
+        return None
+    fieldfile = getattr(instance, model.FILE_FIELD)
+    if not fieldfile or not can_preview(instance.file_mime_type):
+        return None
+
+    storage = fieldfile.storage
+    preview_name = preview_name_for(fieldfile.name)
+    if storage.exists(preview_name):
+        # Content-addressed files share their preview
+        _record(model, pk, fieldfile.name, preview_name)
+        return None
+    try:
+        path = storage.path(fieldfile.name)
+    except NotImplementedError:
+        logger.info(f"Skipping preview for {label} {pk}: storage has no local path")
+        return None
+    return PreviewTask(
+        model, pk, storage, fieldfile.name, preview_name, path, instance.file_mime_type
+    )
+
+
+def _record(model, pk, source_name, preview_name):
+    # Only if the file was not replaced while the preview was rendering
+    rows = model.objects.filter(pk=pk, **{model.FILE_FIELD: source_name}).exclude(
+        preview_name=preview_name
+    )
+    fields = {field.name for field in model._meta.concrete_fields}
+    changes = {"preview_name": preview_name}
+    if "updated_at" in fields:
+        changes["updated_at"] = timezone.now()
+    if not rows.update(**changes):
+        return
+    if "student" in fields:
+        # Submission panels are cached under the student's version
+        student = model.objects.filter(pk=pk).values_list("student_id", flat=True)
+        for student_id in student:
+            bump_version(user_namespace(student_id))
+    else:
+        # Catalog cards show the thumbnail; their ETag follows this version
+        bump_version(FACETS_CACHE_NAMESPACE)
+
+
+def _store(task, data):
+    if not data:
+        return
+    name = task.preview_name
+    if not task.storage.exists(name):
+        name = task.storage.save(name, ContentFile(data))
+    _record(task.model, task.pk, task.source_name, name)
+
+
+def generate_preview(label, pk):
+    """Render and store a preview in the calling process"""
+    task = _prepare(label, pk)
+    if task is not None:
+        _store(task, render_preview(task.path, task.mime_type))
+
+
+class PreviewPipeline:
+    """Bounded queue -> dispatcher thread -> process pool"""
+
+    def __init__(self, workers):
+        self.jobs = queue.Queue(maxsize=QUEUE_SIZE)
+        self.slots = threading.BoundedSemaphore(workers * JOBS_PER_WORKER)
+        # spawn: forking a threaded server process is not safe
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.thread = threading.Thread(
+            target=self._dispatch, name="preview-dispatcher", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, label, pk):
+        self.jobs.put_nowait((label, pk))
+
+    def _dispatch(self):
+        while True:
+            label, pk = self.jobs.get()
+            self.slots.acquire()
+            try:
+                task = _prepare(label, pk)
+            except Exception:
+                logger.exception(f"Failed to prepare preview for {label} {pk}")
+                task = None
+            finally:
+                connection.close()
+            if task is None:
+                self.slots.release()
+                continue
+            future = self.pool.submit(render_preview, task.path, task.mime_type)
+            future.add_done_callback(partial(self._finished, task))
+
+    def _finished(self, task, future):
+        try:
+            _store(task, future.result())
+        except Exception:
+            logger.exception(f"Failed to render preview for {task.source_name}")
+        finally:
+            connection.close()
+            self.slots.release()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _get_pipeline():
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = PreviewPipeline(settings.PREVIEW_WORKERS)
+            atexit.register(_pipeline.shutdown)
+        return _pipeline
+
+
+def enqueue_preview(label, pk):
+    """Schedule a preview; returns immediately unless PREVIEW_WORKERS is 0"""
+    if getattr(settings, "PREVIEW_WORKERS", 0) <= 0:
+        try:
+            generate_preview(label, pk)
+        except Exception:
+            logger.exception(f"Failed to render preview for {label} {pk}")
+        return
+    try:
+        _get_pipeline().submit(label, pk)
+    except queue.Full:
+        # generate_previews picks up anything dropped here
+        logger.warning(f"Preview queue full, skipping {label} {pk}")
@@ -0,0 +1,101 @@
+"""
+"Students who did this also did" recommendations.
+
+``build_similarities`` is a batch job (the ``build_recommendations``
+command). It turns ``StudentProgress`` into a sparse student x material
+matrix, weighted by status and score, and takes the cosine similarity
+between material columns. Shared subject and tags are added as a second,
+content-based cosine term so that materials nobody has worked on yet still
+get neighbours. Rows of the combined item x item matrix are scored a block
+at a time, so memory stays bounded, and only the top K neighbours of each
+material are kept.
+
+The result replaces the ``MaterialSimilarity`` table in one transaction.
+Serving (``similar_materials``) is then a single indexed lookup. The matrix
+code is in ``hub.similarity`` and is imported by the batch job only, so
+web workers never load NumPy or SciPy.
+"""
+
+from django.db import transaction
+
+from .cache import bump_version
+from .models import Material, MaterialSimilarity
+
+RECOMMENDATIONS_CACHE_NAMESPACE = "recommendations"
+
+TOP_K = 10
+CONTENT_WEIGHT = 0.3
+SIMILAR_LIMIT = 4
+
+# Cells of the dense score block computed at once (float32: ~16MB)
+BLOCK_CELLS = 4_000_000
+WRITE_BATCH_SIZE = 1000
+
+
+def build_similarities(top_k=TOP_K, content_weight=CONTENT_WEIGHT):
+    """Compute ``[(material_id, similar_id, score, rank)]`` for active materials"""
+    subject_ids = dict(
+        Material.objects.filter(is_active=True)
+        .order_by("pk")
+        .values_list("pk", "subject_id")
+    )
+    ids = list(subject_ids)
+    if len(ids) < 2 or top_k < 1:
+        return []
+    from .similarity import (feature_matrix, interaction_matrix,
+                             normalize_rows, top_neighbours)
+
+    index = {material_id: row for row, material_id in enumerate(ids)}
+
+    interactions = normalize_rows(interaction_matrix(index))
+    features = normalize_rows(feature_matrix(index, subject_ids))
+    interactions_t = interactions.T.tocsr()
+    features_t = features.T.tocsr()
+
+    results = []
+    block_size = max(1, BLOCK_CELLS // len(ids))
+    for start in range(0, len(ids), block_size):
+        stop = min(start + block_size, len(ids))
+        scores = (1 - content_weight) * (
+            interactions[start:stop] @ interactions_t
+        ).toarray()
+        scores += content_weight * (features[start:stop] @ features_t).toarray()
+
+        rank = 0
+        previous = None
+        for row, column, score in top_neighbours(scores, start, top_k):
+            rank = rank + 1 if row == previous else 1
+            previous = row
+            results.append((ids[row], ids[column], round(score, 6), rank))
+    return results
+
+
+def store_similarities(results):
+    """Replace every stored neighbour list with ``results`` atomically"""
+    with transaction.atomic():
+        MaterialSimilarity.objects.all().delete()
+        MaterialSimilarity.objects.bulk_create(
+            [
+                MaterialSimilarity(
+                    material_id=material_id,
+                    similar_id=similar_id,
+                    score=score,
+                    rank=rank,
+                )
+                for material_id, similar_id, score, rank in results
+            ],
+            batch_size=WRITE_BATCH_SIZE,
+        )
+        transaction.on_commit(lambda: bump_version(RECOMMENDATIONS_CACHE_NAMESPACE))
+    return len(results)
+
+
+def similar_materials(material_id, limit=SIMILAR_LIMIT):
+    """Stored neighbours of a material, best first (one indexed query)"""
+    return (
+        MaterialSimilarity.objects.filter(
+            material_id=material_id, similar__is_active=True
+        )
+        .select_related("similar__subject")
+        .order_by("rank")[:limit]
+    )
@@ -0,0 +1,140 @@
+"""
+"Due soon" reminders for students who have not submitted yet.
+
+Each sweep looks at active assignments falling due within the lead time,
+which is a range scan of the (due_date, is_active) index. One anti-join
+query over the roster then finds the students with neither a submission
+nor a reminder ledger row.
+
+The ledger makes sweeps idempotent and safe to run on several nodes at
+once. Each run claims its (assignment, student) rows with a fresh token
+through ``bulk_create(ignore_conflicts=True)``. The unique constraint
+means only one run's rows land. A run sends only what it claimed, in
+batches of students whose devices fit one FCM multicast, and stamps
+``sent_at`` after each batch goes out. Claims left unsent by a crashed run
+or a failed batch are taken over once their lease expires, and batches
+already sent are never repeated.
+"""
+
+import logging
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+
+from users.firebase_utils import MULTICAST_LIMIT, send_assignment_notification
+from users.models import FirebaseToken
+
+from .models import Assignment, AssignmentSubmission, ReminderLog
+from .roster import ROSTER_ASSIGNMENT, ROSTER_USER, Roster
+
+logger = logging.getLogger(__name__)
+
+REMINDER_LEAD = timedelta(hours=24)
+CLAIM_LEASE = timedelta(minutes=10)
+CLAIM_CHUNK_SIZE = 1000
+KIND = "due_soon"
+
+
+def due_window(now, lead=REMINDER_LEAD):
+    """Active assignments falling due in ``(now, now + lead]``"""
+    return Assignment.objects.filter(
+        is_active=True, due_date__gt=now, due_date__lte=now + lead
+    )
+
+
+def unreminded_students(assignments):
+    """``(assignment_id, student_id)`` pairs still owed a reminder"""
+    submitted = AssignmentSubmission.objects.filter(
+        assignment_id=OuterRef(ROSTER_ASSIGNMENT), student_id=OuterRef(ROSTER_USER)
+    )
+    reminded = ReminderLog.objects.filter(
+        assignment_id=OuterRef(ROSTER_ASSIGNMENT),
+        student_id=OuterRef(ROSTER_USER),
+        kind=KIND,
+    )
+    return (
+        Roster.objects.filter(**{f"{ROSTER_ASSIGNMENT}__in": assignments.values("pk")})
+        .filter(~Exists(submitted), ~Exists(reminded))
+        .values_list(ROSTER_ASSIGNMENT, ROSTER_USER)
+    )
+
+
+def claim_reminders(token, now, assignments):
+    """Claim owed and abandoned reminders for this run"""
+    pairs = list(unreminded_students(assignments))
+    for start in range(0, len(pairs), CLAIM_CHUNK_SIZE):
+        ReminderLog.objects.bulk_create(
+            [
+                ReminderLog(
+                    assignment_id=assignment_id,
+                    student_id=student_id,
+                    kind=KIND,
+                    claimed_by=token,
+                    claimed_at=now,
+                )
+                for assignment_id, student_id in pairs[start : start + CLAIM_CHUNK_SIZE]
+            ],
+            ignore_conflicts=True,
+        )
+    # Claims of a run that died before sending
+    ReminderLog.objects.filter(
+        kind=KIND,
+        sent_at__isnull=True,
+        claimed_at__lt=now - CLAIM_LEASE,
+        assignment__in=assignments,
+    ).update(claimed_by=token, claimed_at=now)
+
+    claimed = defaultdict(list)
+    rows = ReminderLog.objects.filter(claimed_by=token, sent_at__isnull=True)
+    for assignment_id, student_id in rows.values_list("assignment_id", "student_id"):
+        claimed[assignment_id].append(student_id)
+    return claimed
+
+
+def reminder_batches(student_ids):
+    """Split students so each batch's active devices fit one multicast"""
+    devices = dict(
+        FirebaseToken.objects.filter(user_id__in=student_ids, is_active=True)
+        .order_by()
+        .values("user_id")
+        .annotate(count=Count("pk"))
+        .values_list("user_id", "count")
+    )
+    batch, size = [], 0
+    for student_id in student_ids:
+        count = devices.get(student_id, 0)
+        if batch and size + count > MULTICAST_LIMIT:
+            yield batch
+            batch, size = [], 0
+        batch.append(student_id)
+        size += count
+    if batch:
+        yield batch
+
+
+def send_due_reminders(now=None, lead=REMINDER_LEAD):
+    """Run one sweep; returns the number of students reminded"""
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    claimed = claim_reminders(token, now, due_window(now, lead))
+    assignments = Assignment.objects.in_bulk(list(claimed))
+
+    reminded = 0
+    for assignment_id, student_ids in claimed.items():
+        for batch in reminder_batches(student_ids):
+            try:
+                send_assignment_notification(
+                    assignments[assignment_id], "due_soon", batch, strict=True
+                )
+            except Exception as e:
+                # Left claimed; the next run after the lease retries the batch
+                logger.error(f"Failed to send reminders for {assignment_id}: {e}")
+                continue
+            ReminderLog.objects.filter(
+                claimed_by=token, assignment_id=assignment_id, student_id__in=batch
+            ).update(sent_at=timezone.now())
+            reminded += len(batch)
+    return reminded
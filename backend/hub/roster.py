@@ -0,0 +1,52 @@
+"""
+Assignment roster membership checks.
+
+Whether a student is on an assignment's roster is answered from the cache,
+one key per (assignment, student), and otherwise by an EXISTS on the
+roster table's (assignment, user) unique index. The cost does not depend
+on the class size. Each assignment's keys carry a version that
+``hub.signals`` bumps whenever its roster changes.
+"""
+
+from .cache import cache_get, cache_set, get_version
+from .models import Assignment
+
+ROSTER_CACHE_TIMEOUT = 60 * 60 * 24  # invalidated by version bumps, not expiry
+
+_roster_field = Assignment._meta.get_field("assigned_to")
+
+# Roster (through) table and its foreign key columns
+Roster = _roster_field.remote_field.through
+ROSTER_ASSIGNMENT = f"{_roster_field.m2m_field_name()}_id"
+ROSTER_USER = f"{_roster_field.m2m_reverse_field_name()}_id"
+
+
+def roster_namespace(assignment_id):
+    """Version namespace for one assignment's membership keys"""
+    return f"roster:{assignment_id}"
+
+
+def _roster_exists(assignment_id, user_id):
+    return Roster.objects.filter(
+        **{ROSTER_ASSIGNMENT: assignment_id, ROSTER_USER: user_id}
+    ).exists()
+
+
+def is_assigned(assignment_id, user_id):
+    """Whether user ``user_id`` is on the roster of assignment ``assignment_id``"""
+    version = get_version(roster_namespace(assignment_id))
+    key = f"hub:roster:{assignment_id}:{version}:{user_id}"
+    member = cache_get(key)
+    if member is None:
+        member = _roster_exists(assignment_id, user_id)
+        cache_set(key, member, ROSTER_CACHE_TIMEOUT)
+    return member
+
+
+def can_submit(user, assignment_id):
+    """Only students on the roster may submit work for an assignment"""
+    return (
+        user.is_authenticated
+        and user.user_type == "student"
+        and is_assigned(assignment_id, user.pk)
+    )
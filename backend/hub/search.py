@@ -0,0 +1,229 @@
+"""
+Ranked full-text search over Material title, description and tags.
+
+PostgreSQL deployments use the ``Material.search_vector`` tsvector column
+(GIN indexed, weighted A/B/C). SQLite deployments (``USE_SQLITE``) use the
+``hub_material_fts`` FTS5 table keyed by material id. Both are refreshed
+from the Material post_save/post_delete signals.
+"""
+
+import re
+
+from django.contrib.postgres.search import (SearchHeadline, SearchQuery,
+                                            SearchRank, SearchVector)
+from django.db import connection
+from django.db.models import F, Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Material
+
+SEARCH_CONFIG = "english"
+FTS_TABLE = "hub_material_fts"
+
+# Private-use characters mark highlighted terms until the text is escaped
+HIGHLIGHT_START = "\ue000"
+HIGHLIGHT_STOP = "\ue001"
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _vendor():
+    return connection.vendor
+
+
+def _material_vector():
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("tags", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def update_search_index(material):
+    """Refresh the search index entry for one material"""
+    vendor = _vendor()
+    if vendor == "postgresql":
+        Material.objects.filter(pk=material.pk).update(
+            search_vector=_material_vector()
+        )
+    elif vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [material.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, tags) "
+                "VALUES (%s, %s, %s, %s)",
+                [material.pk, material.title, material.description, material.tags],
+            )
+
+
+def remove_from_search_index(material_id):
+    """Drop a deleted material from the SQLite FTS table"""
+    if _vendor() == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [material_id])
+
+
+def rebuild_search_index(material_ids=None):
+    """Recompute index entries in bulk (all materials, or just ``material_ids``)"""
+    vendor = _vendor()
+    materials = Material.objects.all()
+    if material_ids is not None:
+        materials = materials.filter(pk__in=material_ids)
+
+    if vendor == "postgresql":
+        materials.update(search_vector=_material_vector())
+    elif vendor == "sqlite":
+        with connection.cursor() as cursor:
+            if material_ids is None:
+                cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            else:
+                ids = list(material_ids)
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start : start + 500]
+                    placeholders = ", ".join(["%s"] * len(chunk))
+                    cursor.execute(
+                        f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})",
+                        chunk,
+                    )
+            rows = materials.values_list("pk", "title", "description", "tags")
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, tags) "
+                "VALUES (%s, %s, %s, %s)",
+                list(rows.iterator(chunk_size=2000)),
+            )
+
+
+def render_highlight(text):
+    """Escape indexed text and turn highlight markers into <mark> tags"""
+    if not text:
+        return ""
+    html = escape(text)
+    html = html.replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_STOP, "</mark>")
+    return mark_safe(html)
+
+
+def _fts5_query(query):
+    """Turn free text into a safe FTS5 expression (all terms, last as prefix)"""
+    terms = _TERM_RE.findall(query)
+    if not terms:
+        return None
+    quoted = ['"%s"' % term.replace('"', '""') for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _search_postgres(query, limit):
+    search_query = SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+    ranked = list(
+        Material.objects.filter(is_active=True, search_vector=search_query)
+        .annotate(rank=SearchRank(F("search_vector"), search_query))
+        .order_by("-rank", "-id")
+        .values_list("pk", "rank")[:limit]
+    )
+    if not ranked:
+        return []
+
+    # Headlines are expensive, so only compute them for the returned page
+    headlines = (
+        Material.objects.filter(pk__in=[pk for pk, _ in ranked])
+        .annotate(
+            title_highlight=SearchHeadline(
+                "title",
+                search_query,
+                config=SEARCH_CONFIG,
+                start_sel=HIGHLIGHT_START,
+                stop_sel=HIGHLIGHT_STOP,
+                highlight_all=True,
+            ),
+            snippet=SearchHeadline(
+                "description",
+                search_query,
+                config=SEARCH_CONFIG,
+                start_sel=HIGHLIGHT_START,
+                stop_sel=HIGHLIGHT_STOP,
+                max_words=30,
+                min_words=12,
+            ),
+        )
+        .values_list("pk", "title_highlight", "snippet")
+    )
+    highlighted = {pk: (title, snippet) for pk, title, snippet in headlines}
+    return [(pk, rank, *highlighted[pk]) for pk, rank in ranked]
+
+
+def _search_sqlite(query, limit):
+    match = _fts5_query(query)
+    if match is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {FTS_TABLE}.rowid, "
+            f"bm25({FTS_TABLE}, 10.0, 4.0, 2.0), "
+            f"highlight({FTS_TABLE}, 0, %s, %s), "
+            f"snippet({FTS_TABLE}, 1, %s, %s, '...', 24) "
+            f"FROM {FTS_TABLE} "
+            f"JOIN hub_material ON hub_material.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND hub_material.is_active "
+            f"ORDER BY bm25({FTS_TABLE}, 10.0, 4.0, 2.0), {FTS_TABLE}.rowid DESC "
+            "LIMIT %s",
+            [
+                HIGHLIGHT_START,
+                HIGHLIGHT_STOP,
+                HIGHLIGHT_START,
+                HIGHLIGHT_STOP,
+                match,
+                limit,
+            ],
+        )
+        # bm25() is lower-is-better; flip it so rank reads like ts_rank
+        return [(pk, -score, title, snippet) for pk, score, title, snippet in cursor]
+
+
+def _search_fallback(query, limit):
+    terms = _TERM_RE.findall(query)
+    if not terms:
+        return []
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(description__icontains=term)
+    rows = (
+        Material.objects.filter(condition, is_active=True)
+        .order_by("-created_at", "-id")
+        .values_list("pk", "title", "description")[:limit]
+    )
+    return [(pk, 0.0, title, description[:200]) for pk, title, description in rows]
+
+
+def search_materials(query, limit=20):
+    """
+    Return up to ``limit`` ranked hits for ``query``.
+
+    Each hit is a dict with the Material (subject preloaded), its rank and
+    HTML-safe ``title_html``/``snippet_html`` with matches wrapped in <mark>.
+    """
+    query = (query or "").strip()
+    if not query:
+        return []
+
+    vendor = _vendor()
+    if vendor == "postgresql":
+        rows = _search_postgres(query, limit)
+    elif vendor == "sqlite":
+        rows = _search_sqlite(query, limit)
+    else:
+        rows = _search_fallback(query, limit)
+
+    materials = Material.objects.select_related("subject").in_bulk(
+        [row[0] for row in rows]
+    )
+    return [
+        {
+            "material": materials[pk],
+            "rank": rank,
+            "title_html": render_highlight(title),
+            "snippet_html": render_highlight(snippet),
+        }
+        for pk, rank, title, snippet in rows
+        if pk in materials
+    ]
@@ -0,0 +1,222 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from .blobs import release_blob
+from .cache import bump_version, user_namespace
+from .catalog import FACETS_CACHE_NAMESPACE
+from .fanout import cohort_joined, enqueue_fanout
+from .ical import MEMBERSHIP_FIELDS, bump_calendars, bump_parent_calendars
+from .models import (Assignment, AssignmentSubmission, Cohort, Material,
+                     StudentProgress, Subject)
+from .popularity import record_event
+from .previews import enqueue_preview
+from .recommendations import RECOMMENDATIONS_CACHE_NAMESPACE
+from .roster import roster_namespace
+from .search import remove_from_search_index, update_search_index
+from .tags import refresh_tag_counts, sync_material_tags
+
+
+@receiver(post_save, sender=Material)
+def material_saved(sender, instance, raw=False, **kwargs):
+    """Keep the search index and tag index in step with material edits"""
+    if raw:
+        return
+    update_search_index(instance)
+    sync_material_tags([instance])
+    bump_version(FACETS_CACHE_NAMESPACE)
+    # Neighbour panels show titles and subjects of other materials
+    bump_version(RECOMMENDATIONS_CACHE_NAMESPACE)
+
+
+@receiver(post_save, sender=Material)
+@receiver(post_save, sender=AssignmentSubmission)
+def file_uploaded(sender, instance, raw=False, **kwargs):
+    """Render a thumbnail for new uploads once the row is committed"""
+    if raw or not getattr(instance, "_file_changed", False):
+        return
+    instance._file_changed = False
+    if getattr(instance, instance.FILE_FIELD):
+        transaction.on_commit(
+            partial(enqueue_preview, instance._meta.label, instance.pk)
+        )
+
+
+@receiver(pre_delete, sender=Material)
+def material_deleting(sender, instance, **kwargs):
+    """Remember the material's tags before the links cascade away"""
+    instance._deleted_tag_ids = list(
+        instance.material_tags.values_list("tag_id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Material)
+def material_deleted(sender, instance, **kwargs):
+    """Remove deleted materials from the indexes and release their file"""
+    remove_from_search_index(instance.pk)
+    refresh_tag_counts(getattr(instance, "_deleted_tag_ids", []))
+    release_blob(instance.file.name)
+    bump_version(FACETS_CACHE_NAMESPACE)
+    bump_version(RECOMMENDATIONS_CACHE_NAMESPACE)
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+def subject_changed(sender, instance, raw=False, **kwargs):
+    """Subject names appear in the facet counts"""
+    if raw:
+        return
+    bump_version(FACETS_CACHE_NAMESPACE)
+
+
+@receiver(post_save, sender=AssignmentSubmission)
+@receiver(post_delete, sender=AssignmentSubmission)
+def submission_changed(sender, instance, raw=False, **kwargs):
+    """The student's cached assignment panels show their submission"""
+    if raw:
+        return
+    bump_version(user_namespace(instance.student_id))
+
+
+@receiver(m2m_changed, sender=Assignment.assigned_to.through)
+def assignment_roster_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Adding or removing students changes rosters and their assignment pages"""
+    # Forward: instance is an assignment and pk_set holds users; reverse is
+    # the other way round
+    if action == "pre_clear":
+        if reverse:
+            others = instance.assignments.values_list("pk", flat=True)
+        else:
+            others = instance.assigned_to.values_list("pk", flat=True)
+        instance._cleared_roster_ids = list(others)
+        return
+    if action == "post_clear":
+        others = getattr(instance, "_cleared_roster_ids", [])
+    elif action in ("post_add", "post_remove"):
+        others = pk_set or []
+    else:
+        return
+
+    user_ids, assignment_ids = (others, [instance.pk])
+    if reverse:
+        user_ids, assignment_ids = ([instance.pk], others)
+    for user_id in user_ids:
+        bump_version(user_namespace(user_id))
+    for assignment_id in assignment_ids:
+        bump_version(roster_namespace(assignment_id))
+    bump_calendars(user_ids)
+
+
+def _roster_user_ids(assignment):
+    return assignment.assigned_to.values_list("pk", flat=True)
+
+
+@receiver(post_save, sender=Assignment)
+def assignment_saved(sender, instance, created, raw=False, **kwargs):
+    """Titles and due dates appear in the calendar feeds of the roster"""
+    if raw or created:
+        return
+    bump_calendars(_roster_user_ids(instance))
+
+
+@receiver(pre_delete, sender=Assignment)
+def assignment_deleting(sender, instance, **kwargs):
+    """Remember the roster before its rows cascade away"""
+    instance._deleted_roster_ids = list(_roster_user_ids(instance))
+
+
+@receiver(post_delete, sender=Assignment)
+def assignment_deleted(sender, instance, **kwargs):
+    bump_calendars(getattr(instance, "_deleted_roster_ids", []))
+
+
+def _membership_changes(update_fields):
+    return update_fields is None or not MEMBERSHIP_FIELDS.isdisjoint(update_fields)
+
+
+@receiver(pre_save, sender=get_user_model())
+def user_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Note who the user counted as before a save that may move them"""
+    if raw or not instance.pk or not _membership_changes(update_fields):
+        return
+    instance._previous_membership = (
+        sender.objects.filter(pk=instance.pk)
+        .values_list("user_type", "parent_email")
+        .first()
+    )
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Feeds of parents a student joined or left, and the user's own feed"""
+    if raw or not (created or _membership_changes(update_fields)):
+        return
+    previous = getattr(instance, "_previous_membership", None)
+    current = (instance.user_type, instance.parent_email)
+    if previous != current:
+        bump_parent_calendars(
+            email
+            for user_type, email in filter(None, (previous, current))
+            if user_type == "student"
+        )
+    bump_calendars([instance.pk])
+
+
+@receiver(post_delete, sender=get_user_model())
+def user_deleted(sender, instance, **kwargs):
+    """A deleted student drops out of their parent's feed"""
+    if instance.user_type == "student":
+        bump_parent_calendars([instance.parent_email])
+
+
+@receiver(m2m_changed, sender=Assignment.cohorts.through)
+def assignment_cohorts_added(sender, instance, action, reverse, pk_set, **kwargs):
+    """Fan cohort members out onto the roster after the request commits"""
+    if action != "post_add" or not pk_set:
+        return
+    assignment_ids = list(pk_set) if reverse else [instance.pk]
+    Assignment.objects.filter(pk__in=assignment_ids).update(roster_pending=True)
+    for assignment_id in assignment_ids:
+        transaction.on_commit(partial(enqueue_fanout, assignment_id))
+
+
+@receiver(m2m_changed, sender=Cohort.students.through)
+def cohort_members_added(sender, instance, action, reverse, pk_set, **kwargs):
+    """Students joining a cohort get its open assignments"""
+    if action != "post_add" or not pk_set:
+        return
+    if reverse:
+        cohort_joined(list(pk_set), [instance.pk])
+    else:
+        cohort_joined([instance.pk], list(pk_set))
+
+
+@receiver(pre_save, sender=StudentProgress)
+def progress_saving(sender, instance, raw=False, **kwargs):
+    """Remember the stored status so post_save can spot transitions"""
+    if raw or instance.pk is None:
+        instance._previous_status = None
+        return
+    instance._previous_status = (
+        StudentProgress.objects.filter(pk=instance.pk)
+        .values_list("status", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=StudentProgress)
+def progress_saved(sender, instance, raw=False, **kwargs):
+    """Starting or completing a material counts towards its trending score"""
+    if raw:
+        return
+    previous = getattr(instance, "_previous_status", None)
+    if instance.status == previous:
+        return
+    if instance.status == "completed":
+        record_event(instance.material_id, "complete")
+    elif instance.status == "in_progress" and previous in (None, "not_started"):
+        record_event(instance.material_id, "start")
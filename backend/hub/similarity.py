@@ -0,0 +1,91 @@
+"""
+Sparse matrix helpers for ``hub.recommendations.build_similarities``.
+
+They need NumPy and SciPy, so they live apart from the serving code: web
+workers import ``hub.recommendations`` for ``similar_materials`` and its
+cache namespace, and only the batch job loads this module.
+"""
+
+import numpy as np
+from scipy import sparse
+
+from .models import MaterialTag, StudentProgress
+
+# How strongly a progress record says "this student did this material"
+STATUS_WEIGHTS = {
+    "completed": 1.0,
+    "needs_review": 0.6,
+    "in_progress": 0.4,
+}
+
+
+def progress_weight(status, score):
+    """Interaction strength of one progress record; scores scale 0.5x-1.5x"""
+    weight = STATUS_WEIGHTS.get(status, 0.0)
+    if score is not None:
+        weight *= 0.5 + min(score, 100) / 100
+    return weight
+
+
+def normalize_rows(matrix):
+    """Scale each row to unit length; empty rows stay zero"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return sparse.diags(inverse) @ matrix
+
+
+def interaction_matrix(index):
+    """Sparse material x student matrix of progress weights"""
+    students = {}
+    rows, cols, data = [], [], []
+    progress = StudentProgress.objects.filter(
+        material__is_active=True, status__in=STATUS_WEIGHTS
+    ).values_list("material_id", "student_id", "status", "score")
+    for material_id, student_id, status, score in progress.iterator(chunk_size=5000):
+        row = index.get(material_id)
+        if row is None:
+            continue
+        rows.append(row)
+        cols.append(students.setdefault(student_id, len(students)))
+        data.append(progress_weight(status, score))
+    return sparse.coo_matrix(
+        (np.asarray(data, dtype=np.float32), (rows, cols)),
+        shape=(len(index), max(len(students), 1)),
+    ).tocsr()
+
+
+def feature_matrix(index, subject_ids):
+    """Sparse material x (subjects + tags) indicator matrix"""
+    features = {}
+    rows, cols = [], []
+    for material_id, subject_id in subject_ids.items():
+        rows.append(index[material_id])
+        cols.append(features.setdefault(("subject", subject_id), len(features)))
+    links = MaterialTag.objects.filter(material__is_active=True).values_list(
+        "material_id", "tag_id"
+    )
+    for material_id, tag_id in links.iterator(chunk_size=5000):
+        if material_id in index:
+            rows.append(index[material_id])
+            cols.append(features.setdefault(("tag", tag_id), len(features)))
+    return sparse.coo_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(index), max(len(features), 1)),
+    ).tocsr()
+
+
+def top_neighbours(scores, offset, top_k):
+    """``[(row, column, score)]`` for the best ``top_k`` columns of each row"""
+    block, count = scores.shape
+    # A material is never its own neighbour
+    scores[np.arange(block), np.arange(offset, offset + block)] = 0
+    k = min(top_k, count - 1)
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    picked = np.take_along_axis(scores, candidates, axis=1)
+    for row in range(block):
+        # Highest score first; ties go to the lower column for stable output
+        order = np.lexsort((candidates[row], -picked[row]))
+        for column, score in zip(candidates[row][order], picked[row][order]):
+            if score <= 0:
+                break
+            yield offset + row, int(column), float(score)
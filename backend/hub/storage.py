@@ -0,0 +1,25 @@
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage for names derived from the file's content hash.
+
+    A name that already exists holds identical bytes, so saving it again
+    is a no-op instead of writing a renamed copy.
+    """
+
+    def __init__(self, **kwargs):
+        # Never rename on collision: the existing file is the same content
+        kwargs.setdefault("allow_overwrite", True)
+        super().__init__(**kwargs)
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+def material_storage():
+    """Storage for material uploads (callable so tests can swap MEDIA_ROOT)"""
+    return ContentAddressedStorage()
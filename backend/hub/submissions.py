@@ -0,0 +1,200 @@
+"""
+Background processing of student submissions.
+
+Submitting only stores the file and the row, then answers. The remaining
+work is recorded as a ``SubmissionJob`` in the same transaction and run
+by a worker thread once it commits:
+
+* the checksum and file metadata,
+* the preview thumbnail (handed to ``hub.previews``),
+* the teacher's push notification.
+
+The job records each stage as it finishes, so a retry resumes where the
+last attempt failed and never notifies twice. Failed attempts are retried
+with exponential backoff up to ``MAX_ATTEMPTS`` times. Jobs live in the
+database, so none are lost when a process restarts or the queue is full.
+The ``process_submissions`` command runs whatever is due or was abandoned.
+With ``SUBMISSION_WORKERS = 0`` jobs run inline on commit, which is what
+the tests use.
+"""
+
+import logging
+import queue
+import threading
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from users.firebase_utils import send_submission_notification
+
+from .cache import bump_version, user_namespace
+from .files import file_metadata
+from .models import AssignmentSubmission, SubmissionJob
+from .previews import enqueue_preview
+
+logger = logging.getLogger(__name__)
+
+STAGES = [stage for stage, _ in SubmissionJob.STAGES]
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(seconds=30)
+CLAIM_LEASE = timedelta(minutes=10)
+QUEUE_SIZE = 1000
+
+_jobs = None
+_jobs_lock = threading.Lock()
+
+
+def schedule_processing(submission):
+    """Record a job for ``submission`` and start it once the transaction commits"""
+    job, _ = SubmissionJob.objects.update_or_create(
+        submission=submission,
+        defaults={
+            "stage": STAGES[0],
+            "state": "pending",
+            "attempts": 0,
+            "run_after": timezone.now(),
+            "claimed_at": None,
+            "last_error": "",
+        },
+    )
+    transaction.on_commit(partial(enqueue_job, job.pk))
+    return job
+
+
+def capture_metadata(submission):
+    """Hash the stored file and record its size and type"""
+    fieldfile = submission.submission_file
+    if not fieldfile or submission.file_sha256:
+        return
+    metadata = file_metadata(fieldfile)
+    # Only if the file was not replaced in the meantime
+    AssignmentSubmission.objects.filter(
+        pk=submission.pk, submission_file=fieldfile.name
+    ).update(
+        file_size=metadata["size"],
+        file_mime_type=metadata["mime_type"],
+        file_ext=metadata["ext"],
+        file_sha256=metadata["sha256"],
+    )
+    bump_version(user_namespace(submission.student_id))
+
+
+def render_preview(submission):
+    if submission.submission_file:
+        enqueue_preview(AssignmentSubmission._meta.label, submission.pk)
+
+
+def notify_teacher(submission):
+    # Strict so a failed push raises and the job retries this stage
+    send_submission_notification(submission, strict=True)
+
+
+STAGE_RUNNERS = {
+    "metadata": capture_metadata,
+    "preview": render_preview,
+    "notify": notify_teacher,
+}
+
+
+def retry_delay(attempts):
+    return RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def _claim(job_id, now):
+    """Take a due or abandoned job; False when it is not ours to run"""
+    due = Q(state="pending", run_after__lte=now)
+    abandoned = Q(state="running", claimed_at__lt=now - CLAIM_LEASE)
+    claimed = SubmissionJob.objects.filter(due | abandoned, pk=job_id).update(
+        state="running", claimed_at=now
+    )
+    return claimed == 1
+
+
+def run_job(job_id, now=None):
+    """Run a job's remaining stages; returns its new state, or None if not claimed"""
+    now = now or timezone.now()
+    if not _claim(job_id, now):
+        return None
+    job = SubmissionJob.objects.select_related(
+        "submission__assignment__created_by", "submission__student"
+    ).get(pk=job_id)
+    # Updates only land while the claim is ours; a resubmission resets it
+    ours = SubmissionJob.objects.filter(pk=job_id, state="running", claimed_at=now)
+
+    remaining = STAGES[STAGES.index(job.stage) :]
+    try:
+        for stage, following in zip(remaining, remaining[1:] + [None]):
+            STAGE_RUNNERS[stage](job.submission)
+            if following:
+                ours.update(stage=following)
+    except Exception as e:
+        logger.exception(f"Submission job {job_id} failed at {stage}")
+        attempts = job.attempts + 1
+        state = "failed" if attempts >= MAX_ATTEMPTS else "pending"
+        ours.update(
+            state=state,
+            attempts=attempts,
+            run_after=timezone.now() + retry_delay(attempts),
+            last_error=str(e)[:1000],
+        )
+        return state
+    ours.update(state="done", last_error="")
+    return "done"
+
+
+def due_jobs(now=None):
+    """Ids of jobs waiting to run, including ones a dead worker abandoned"""
+    now = now or timezone.now()
+    return SubmissionJob.objects.filter(
+        Q(state="pending", run_after__lte=now)
+        | Q(state="running", claimed_at__lt=now - CLAIM_LEASE)
+    ).values_list("pk", flat=True)
+
+
+def _run_and_reschedule(job_id):
+    if run_job(job_id) == "pending":
+        attempts = SubmissionJob.objects.get(pk=job_id).attempts
+        timer = threading.Timer(
+            retry_delay(attempts).total_seconds(), enqueue_job, [job_id]
+        )
+        timer.daemon = True
+        timer.start()
+
+
+def _work():
+    while True:
+        job_id = _jobs.get()
+        try:
+            _run_and_reschedule(job_id)
+        except Exception:
+            logger.exception(f"Failed to process submission job {job_id}")
+        finally:
+            connection.close()
+
+
+def _get_jobs():
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = queue.Queue(maxsize=QUEUE_SIZE)
+            for i in range(settings.SUBMISSION_WORKERS):
+                threading.Thread(
+                    target=_work, name=f"submission-worker-{i}", daemon=True
+                ).start()
+        return _jobs
+
+
+def enqueue_job(job_id):
+    """Run a job in the background; inline when SUBMISSION_WORKERS is 0"""
+    if getattr(settings, "SUBMISSION_WORKERS", 0) <= 0:
+        run_job(job_id)
+        return
+    try:
+        _get_jobs().put_nowait(job_id)
+    except queue.Full:
+        # process_submissions picks up anything left pending
+        logger.warning(f"Submission queue full, leaving job {job_id} pending")
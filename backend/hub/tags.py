@@ -0,0 +1,122 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import MaterialTag, Tag
+
+MAX_TAG_LENGTH = 50
+
+TAG_MODE_ANY = "any"
+TAG_MODE_ALL = "all"
+
+
+def parse_tags(raw):
+    """Split a comma-separated tag string into normalized, unique names"""
+    names = []
+    for part in (raw or "").split(","):
+        name = " ".join(part.split()).lower()[:MAX_TAG_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _tag_ids_for(names):
+    """Return ``{name: id}``, creating any tags that do not exist yet"""
+    existing = dict(Tag.objects.filter(name__in=names).values_list("name", "pk"))
+    missing = [name for name in names if name not in existing]
+    if missing:
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in missing], ignore_conflicts=True
+        )
+        existing.update(Tag.objects.filter(name__in=missing).values_list("name", "pk"))
+    return existing
+
+
+def refresh_tag_counts(tag_ids):
+    """Recompute ``material_count`` for the given tags in one UPDATE"""
+    if not tag_ids:
+        return
+    active_links = (
+        MaterialTag.objects.filter(tag=OuterRef("pk"), material__is_active=True)
+        .values("tag")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    Tag.objects.filter(pk__in=tag_ids).update(
+        material_count=Coalesce(
+            Subquery(active_links, output_field=IntegerField()), Value(0)
+        )
+    )
+
+
+def sync_material_tags(materials):
+    """
+    Bring the MaterialTag rows of ``materials`` in line with their tag strings.
+
+    Works on any number of materials with a fixed number of queries, and
+    refreshes the counts of every tag that gained or lost a material.
+    """
+    materials = [material for material in materials if material.pk]
+    if not materials:
+        return
+
+    wanted = {material.pk: parse_tags(material.tags) for material in materials}
+    tag_ids = _tag_ids_for(sorted({n for names in wanted.values() for n in names}))
+    wanted_ids = {pk: {tag_ids[name] for name in names} for pk, names in wanted.items()}
+
+    current = {pk: {} for pk in wanted}
+    for link_id, material_id, tag_id in MaterialTag.objects.filter(
+        material_id__in=wanted
+    ).values_list("pk", "material_id", "tag_id"):
+        current[material_id][tag_id] = link_id
+
+    to_add = []
+    stale_link_ids = []
+    for pk, desired in wanted_ids.items():
+        to_add.extend(
+            MaterialTag(material_id=pk, tag_id=tag_id)
+            for tag_id in desired - current[pk].keys()
+        )
+        stale_link_ids.extend(
+            link_id for tag_id, link_id in current[pk].items() if tag_id not in desired
+        )
+
+    if to_add:
+        MaterialTag.objects.bulk_create(to_add, ignore_conflicts=True)
+    if stale_link_ids:
+        MaterialTag.objects.filter(pk__in=stale_link_ids).delete()
+
+    touched = set()
+    for pk in wanted:
+        touched |= wanted_ids[pk] | current[pk].keys()
+    refresh_tag_counts(touched)
+
+
+def filter_by_tags(queryset, names, mode=TAG_MODE_ANY):
+    """
+    Narrow a Material queryset to those tagged with ``names``.
+
+    ``any`` matches materials carrying at least one of the tags, ``all``
+    requires every tag. Both resolve through the (tag, material) index.
+    """
+    if not isinstance(names, str):
+        names = ",".join(names)
+    names = parse_tags(names)
+    if not names:
+        return queryset
+
+    links = MaterialTag.objects.filter(tag__name__in=names)
+    if mode == TAG_MODE_ALL:
+        links = (
+            links.values("material_id")
+            .annotate(matched=Count("tag_id"))
+            .filter(matched=len(names))
+        )
+    return queryset.filter(pk__in=links.values("material_id"))
+
+
+def popular_tags(prefix="", limit=50):
+    """Tags ordered by precomputed active-material count"""
+    tags = Tag.objects.filter(material_count__gt=0)
+    if prefix:
+        tags = tags.filter(name__startswith=prefix.strip().lower())
+    return tags.order_by("-material_count", "name")[:limit]
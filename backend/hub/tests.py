@@ -1,19 +1,54 @@
+import base64
+import csv
+import hashlib
+import os
 import tempfile
-from io import BytesIO
+from datetime import timezone as dt_timezone
+from io import BytesIO, StringIO
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
+from PIL import Image
 
-from hub.models import Assignment, AssignmentSubmission, Material, Subject
+from hub.cache import get_version, user_namespace
+from hub.counters import flush_download_counts
+from hub.grade_scales import PROGRESS_SCALE, SUBMISSION_SCALE
+from hub.gradebook import (apply_import, gradebook_rows, plan_import,
+                           read_gradebook)
+from hub.ical import feed_token
+from hub.models import (Assignment, AssignmentSubmission, Cohort, FileBlob,
+                        Material, MaterialPopularity, MaterialSimilarity,
+                        MaterialTag, ReminderLog, StudentProgress, Subject,
+                        SubmissionJob, Tag, UploadSession)
+from hub.popularity import decayed_score, record_event
+from hub.previews import generate_preview
+from hub.recommendations import build_similarities
+from hub.reminders import send_due_reminders
+from hub.roster import is_assigned
+from hub.storage import material_storage
+from hub.submissions import MAX_ATTEMPTS, due_jobs, run_job
+from hub.uploads import open_completed_upload
+from users.firebase_utils import NotificationError
 from users.models import FirebaseToken
 
 User = get_user_model()
 
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
 
+
+@override_settings(CACHES=LOCMEM_CACHES, SUBMISSION_WORKERS=0)
 class AssignmentSubmissionTestCase(TestCase):
     """Test cases for assignment submission functionality"""
 
@@ -120,7 +155,7 @@ class AssignmentSubmissionTestCase(TestCase):
             assignment=self.assignment, student=self.student
         )
         self.assertEqual(submission.submission_text, "Here is my text solution")
-        self.assertIsNone(submission.submission_file)
+        self.assertFalse(submission.submission_file)
 
     def test_submission_validation_requires_content(self):
         """Test that submission requires either text or file"""
@@ -223,15 +258,16 @@ class AssignmentSubmissionTestCase(TestCase):
         self.assertEqual(response.context["assignment"], self.assignment)
         self.assertIsNone(response.context["existing_submission"])
 
-    @patch("users.firebase_utils.send_submission_notification")
+    @patch("hub.submissions.send_submission_notification")
     def test_submission_triggers_firebase_push(self, mock_send_notification):
         """Test that assignment submission triggers Firebase push notification"""
         self.client.force_login(self.student)
 
-        response = self.client.post(
-            reverse("hub:submit_assignment", args=[self.assignment.id]),
-            {"submission_text": "Test submission for Firebase"},
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("hub:submit_assignment", args=[self.assignment.id]),
+                {"submission_text": "Test submission for Firebase"},
+            )
 
         self.assertEqual(response.status_code, 302)
 
@@ -240,4 +276,2551 @@ class AssignmentSubmissionTestCase(TestCase):
         submission = AssignmentSubmission.objects.get(
             assignment=self.assignment, student=self.student
         )
-        mock_send_notification.assert_called_with(submission)
+        mock_send_notification.assert_called_with(submission, strict=True)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MaterialCatalogTestCase(TestCase):
+    """Test cases for the keyset-paginated materials catalog"""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.math = Subject.objects.create(name="Mathematics")
+        self.science = Subject.objects.create(name="Science")
+
+        for i in range(7):
+            Material.objects.create(
+                title=f"Math Worksheet {i}",
+                description="Practice problems",
+                material_type="worksheet",
+                subject=self.math,
+                difficulty_level="beginner",
+                grade_level="5",
+                estimated_time=30,
+                uploaded_by=self.teacher,
+                external_link=f"https://example.com/math-{i}.pdf",
+            )
+        for i in range(3):
+            Material.objects.create(
+                title=f"Science Video {i}",
+                description="Experiments",
+                material_type="video",
+                subject=self.science,
+                difficulty_level="advanced",
+                grade_level="9",
+                estimated_time=45,
+                uploaded_by=self.teacher,
+                external_link=f"https://example.com/science-{i}.mp4",
+            )
+
+    def test_api_pages_through_catalog_without_overlap(self):
+        """Following next cursors visits every active material exactly once"""
+        seen = []
+        url = reverse("hub:materials_api") + "?limit=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertLessEqual(len(data["results"]), 3)
+            seen.extend(item["id"] for item in data["results"])
+            url = data["next"]
+
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(len(set(seen)), 10)
+        expected = list(
+            Material.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_cursor_keeps_microseconds(self):
+        """Rows less than a millisecond apart are neither skipped nor repeated"""
+        base = timezone.now().replace(microsecond=0)
+        for i, pk in enumerate(Material.objects.values_list("pk", flat=True)):
+            Material.objects.filter(pk=pk).update(
+                created_at=base + timezone.timedelta(microseconds=10 * i + 1)
+            )
+        seen = []
+        url = reverse("hub:materials_api") + "?limit=3"
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(item["id"] for item in data["results"])
+            url = data["next"]
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(len(set(seen)), 10)
+
+    def test_api_filters(self):
+        """Filters narrow results to matching materials"""
+        response = self.client.get(
+            reverse("hub:materials_api"),
+            {"subject": self.science.pk, "material_type": "video"},
+        )
+        data = response.json()
+        self.assertEqual(len(data["results"]), 3)
+        self.assertTrue(
+            all(item["subject"]["id"] == self.science.pk for item in data["results"])
+        )
+        self.assertIsNone(data["next_cursor"])
+
+    def test_api_rejects_invalid_input(self):
+        """Unknown choices and tampered cursors return 400"""
+        response = self.client.get(
+            reverse("hub:materials_api"), {"difficulty_level": "impossible"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse("hub:materials_api"), {"cursor": "bogus"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_inactive_materials_hidden(self):
+        """Inactive materials are excluded from the catalog"""
+        Material.objects.filter(subject=self.science).update(is_active=False)
+        response = self.client.get(reverse("hub:materials_api"))
+        self.assertEqual(len(response.json()["results"]), 7)
+
+    def test_html_page_query_count_is_constant(self):
+        """Rendering a page does not issue per-material queries"""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("hub:materials_list"), {"limit": 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["materials"]), 5)
+        self.assertIsNotNone(response.context["next_page_url"])
+
+    def test_facet_counts(self):
+        """Facets count active materials per subject, grade, type and level"""
+        facets = self.client.get(reverse("hub:facets_api")).json()
+        self.assertEqual(facets["total"], 10)
+        self.assertEqual(
+            facets["subject"],
+            [
+                {"id": self.math.pk, "name": "Mathematics", "count": 7},
+                {"id": self.science.pk, "name": "Science", "count": 3},
+            ],
+        )
+        self.assertEqual(
+            facets["material_type"],
+            [
+                {"value": "worksheet", "label": "Worksheet", "count": 7},
+                {"value": "video", "label": "Video", "count": 3},
+            ],
+        )
+        self.assertEqual(
+            [grade["value"] for grade in facets["grade_level"]], ["5", "9"]
+        )
+
+    def test_facets_are_cached_until_materials_change(self):
+        """Cached facets cost no queries and refresh after a save"""
+        self.client.get(reverse("hub:materials_list"))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("hub:materials_list"))
+        self.assertEqual(response.context["facets"]["total"], 10)
+
+        material = Material.objects.filter(subject=self.science).first()
+        material.is_active = False
+        material.save()
+
+        response = self.client.get(reverse("hub:materials_list"))
+        self.assertEqual(response.context["facets"]["total"], 9)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MaterialSearchTestCase(TestCase):
+    """Test cases for full-text material search"""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.subject = Subject.objects.create(name="Science")
+        self.photosynthesis = Material.objects.create(
+            title="Photosynthesis Basics",
+            description="How plants turn sunlight into energy",
+            material_type="reading",
+            subject=self.subject,
+            difficulty_level="beginner",
+            grade_level="5",
+            estimated_time=20,
+            uploaded_by=self.teacher,
+            external_link="https://example.com/photosynthesis",
+            tags="biology,plants",
+        )
+        self.volcanoes = Material.objects.create(
+            title="Volcano Experiment",
+            description="Build a baking soda volcano <script>alert(1)</script>",
+            material_type="worksheet",
+            subject=self.subject,
+            difficulty_level="intermediate",
+            grade_level="6",
+            estimated_time=40,
+            uploaded_by=self.teacher,
+            external_link="https://example.com/volcano",
+            tags="geology",
+        )
+
+    def test_search_matches_title_description_and_tags(self):
+        """Terms in any indexed field find the material"""
+        for query in ("photosynthesis", "sunlight", "biology", "plant"):
+            response = self.client.get(reverse("hub:search_api"), {"q": query})
+            ids = [item["id"] for item in response.json()["results"]]
+            self.assertEqual(ids, [self.photosynthesis.pk], query)
+
+    def test_title_matches_rank_above_description_matches(self):
+        """Title hits outrank description-only hits"""
+        Material.objects.create(
+            title="Energy in Food Chains",
+            description="Animals get their energy from photosynthesis indirectly",
+            material_type="reading",
+            subject=self.subject,
+            difficulty_level="beginner",
+            grade_level="5",
+            estimated_time=20,
+            uploaded_by=self.teacher,
+            external_link="https://example.com/food-chains",
+        )
+        response = self.client.get(reverse("hub:search_api"), {"q": "photosynthesis"})
+        results = response.json()["results"]
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]["id"], self.photosynthesis.pk)
+
+    def test_highlighting_is_html_safe(self):
+        """Matches are wrapped in <mark> and indexed text is escaped"""
+        response = self.client.get(reverse("hub:search_api"), {"q": "volcano"})
+        hit = response.json()["results"][0]
+        self.assertIn("<mark>Volcano</mark>", hit["title_html"])
+        self.assertIn("&lt;script&gt;", hit["snippet_html"])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Saving or deleting a material updates the index"""
+        self.volcanoes.title = "Earthquake Experiment"
+        self.volcanoes.save()
+        response = self.client.get(reverse("hub:search_api"), {"q": "earthquake"})
+        self.assertEqual(len(response.json()["results"]), 1)
+
+        self.volcanoes.delete()
+        response = self.client.get(reverse("hub:search_api"), {"q": "earthquake"})
+        self.assertEqual(response.json()["results"], [])
+
+    def test_search_page_renders(self):
+        """The HTML search page lists hits"""
+        response = self.client.get(reverse("hub:search"), {"q": "plants"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Photosynthesis")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MaterialTagIndexTestCase(TestCase):
+    """Test cases for the normalized tag index"""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.subject = Subject.objects.create(name="Mathematics")
+        self.fractions = self._material("Fractions", " Fractions, Math ,beginner")
+        self.algebra = self._material("Algebra", "algebra, math")
+        self.geometry = self._material("Geometry", "geometry")
+
+    def _material(self, title, tags):
+        return Material.objects.create(
+            title=title,
+            description="Practice",
+            material_type="worksheet",
+            subject=self.subject,
+            difficulty_level="beginner",
+            grade_level="5",
+            estimated_time=30,
+            uploaded_by=self.teacher,
+            external_link="https://example.com/material",
+            tags=tags,
+        )
+
+    def _ids(self, **params):
+        response = self.client.get(reverse("hub:materials_api"), params)
+        return {item["id"] for item in response.json()["results"]}
+
+    def test_tags_are_normalized_on_save(self):
+        """Tag strings become lowercase, deduplicated Tag rows"""
+        self.assertEqual(
+            sorted(self.fractions.normalized_tags.values_list("name", flat=True)),
+            ["beginner", "fractions", "math"],
+        )
+        self.assertEqual(Tag.objects.get(name="math").material_count, 2)
+
+    def test_any_and_all_tag_queries(self):
+        """OR queries match any tag, AND queries require every tag"""
+        self.assertEqual(
+            self._ids(tags="fractions,geometry"), {self.fractions.pk, self.geometry.pk}
+        )
+        self.assertEqual(
+            self._ids(tags="math, beginner", tag_mode="all"), {self.fractions.pk}
+        )
+        self.assertEqual(
+            self._ids(tags="math", tag_mode="all"),
+            {
+                self.fractions.pk,
+                self.algebra.pk,
+            },
+        )
+
+    def test_counts_follow_edits_deactivation_and_deletes(self):
+        """Per-tag counts track retagging, deactivation and deletion"""
+        self.algebra.tags = "algebra"
+        self.algebra.save()
+        self.assertEqual(Tag.objects.get(name="math").material_count, 1)
+        self.assertFalse(
+            MaterialTag.objects.filter(material=self.algebra, tag__name="math").exists()
+        )
+
+        self.fractions.is_active = False
+        self.fractions.save()
+        self.assertEqual(Tag.objects.get(name="math").material_count, 0)
+
+        self.geometry.delete()
+        self.assertEqual(Tag.objects.get(name="geometry").material_count, 0)
+
+    def test_tags_api_lists_counts(self):
+        """The tag endpoint returns precomputed counts, most used first"""
+        response = self.client.get(reverse("hub:tags_api"))
+        results = response.json()["results"]
+        self.assertEqual(results[0], {"name": "math", "material_count": 2})
+
+        response = self.client.get(reverse("hub:tags_api"), {"prefix": "geo"})
+        self.assertEqual(
+            response.json()["results"], [{"name": "geometry", "material_count": 1}]
+        )
+
+
+class FakeRedis:
+    """The few hash and key commands the download counter uses"""
+
+    def __init__(self):
+        self.data = {}
+
+    def hincrby(self, key, field, amount):
+        fields = self.data.setdefault(key, {})
+        fields[field] = fields.get(field, 0) + amount
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def rename(self, key, new_key):
+        self.data[new_key] = self.data.pop(key)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, MEDIA_ROOT=tempfile.mkdtemp())
+class MaterialDownloadTestCase(TestCase):
+    """Test cases for the protected material download view"""
+
+    CONTENT = b"0123456789abcdefghij"
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.student = User.objects.create_user(
+            username="student1",
+            email="student@example.com",
+            password="password123",
+            user_type="student",
+            grade_level="5",
+            parent_email="parent@example.com",
+        )
+        self.subject = Subject.objects.create(name="Music")
+        self.material = Material.objects.create(
+            title="Listening Exercise",
+            description="Audio clip",
+            material_type="audio",
+            subject=self.subject,
+            difficulty_level="beginner",
+            grade_level="5",
+            estimated_time=10,
+            uploaded_by=self.teacher,
+            file=ContentFile(self.CONTENT, name="clip.mp3"),
+        )
+        self.url = reverse("hub:download_material", args=[self.material.pk])
+        self.client.force_login(self.student)
+        flush_download_counts()
+
+    def test_requires_login(self):
+        """Anonymous users are sent to the login page"""
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_full_download(self):
+        """A plain GET streams the whole file inline with validators"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.CONTENT)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Length"], str(len(self.CONTENT)))
+        self.assertTrue(response["Content-Disposition"].startswith("inline"))
+        self.assertIn("ETag", response)
+
+    def test_range_requests(self):
+        """Byte and suffix ranges return 206 with the requested slice"""
+        response = self.client.get(self.url, HTTP_RANGE="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+        self.assertEqual(response["Content-Range"], "bytes 2-5/20")
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-3")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"hij")
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=50-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */20")
+
+    def test_if_none_match_and_if_range(self):
+        """Matching ETags revalidate; stale If-Range sends the full file"""
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(
+            self.url, HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(SENDFILE_BACKEND="nginx")
+    def test_nginx_offload(self):
+        """With nginx configured the view only sets X-Accel-Redirect"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response["X-Accel-Redirect"],
+            "/protected-media/" + self.material.file.name,
+        )
+        self.assertEqual(response.content, b"")
+
+    def test_inactive_material_hidden_from_students(self):
+        """Students cannot download deactivated materials"""
+        self.material.is_active = False
+        self.material.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_file_metadata_captured_on_upload(self):
+        """Size, type and checksum are stored so listings never stat storage"""
+        self.assertEqual(self.material.file_size, len(self.CONTENT))
+        self.assertEqual(self.material.file_mime_type, "audio/mpeg")
+        self.assertEqual(self.material.file_extension, "MP3")
+        self.assertEqual(
+            self.material.file_sha256, hashlib.sha256(self.CONTENT).hexdigest()
+        )
+
+        material = Material.objects.get(pk=self.material.pk)
+        with patch.object(FileSystemStorage, "size", side_effect=AssertionError):
+            self.assertEqual(material.file_size_mb, 0.0)
+
+    def test_backfill_file_metadata(self):
+        """Rows saved before metadata capture are filled in by the command"""
+        Material.objects.filter(pk=self.material.pk).update(
+            file_size=None, file_mime_type="", file_ext="", file_sha256=""
+        )
+        call_command("backfill_file_metadata", stdout=StringIO())
+
+        self.material.refresh_from_db()
+        self.assertEqual(self.material.file_size, len(self.CONTENT))
+        self.assertEqual(self.material.file_ext, "mp3")
+        self.assertEqual(
+            self.material.file_sha256, hashlib.sha256(self.CONTENT).hexdigest()
+        )
+
+    @override_settings(DOWNLOAD_COUNTER_FLUSH_INTERVAL=3600)
+    def test_downloads_are_counted_write_behind(self):
+        """Hits are buffered, then applied in bulk by the flush command"""
+        etag = self.client.get(self.url)["ETag"]
+        self.client.get(self.url, HTTP_RANGE="bytes=0-")
+        self.client.get(self.url, HTTP_RANGE="bytes=10-")  # seek, not a new hit
+        self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)  # 304, nothing sent
+
+        self.material.refresh_from_db()
+        self.assertEqual(self.material.download_count, 0)
+
+        call_command("flush_download_counts", stdout=StringIO())
+        self.material.refresh_from_db()
+        self.assertEqual(self.material.download_count, 2)
+
+    @override_settings(DOWNLOAD_COUNTER_FLUSH_INTERVAL=0)
+    def test_buffer_flushes_when_interval_elapses(self):
+        """With a zero interval each hit is written straight away"""
+        self.client.get(self.url)
+        self.material.refresh_from_db()
+        self.assertEqual(self.material.download_count, 1)
+
+    @override_settings(DOWNLOAD_COUNTER_FLUSH_INTERVAL=3600)
+    def test_redis_counter_flushes_once_per_interval(self):
+        """The first hit after the lock expires flushes the shared hash"""
+        redis = FakeRedis()
+        with patch("hub.counters.get_redis_client", return_value=redis):
+            self.client.get(self.url)
+            self.client.get(self.url)
+        self.material.refresh_from_db()
+        self.assertEqual(self.material.download_count, 1)
+        self.assertEqual(
+            redis.hgetall("hub:downloads:pending"), {str(self.material.pk): 1}
+        )
+
+        del redis.data["hub:downloads:flush-lock"]  # the interval lapses
+        with patch("hub.counters.get_redis_client", return_value=redis):
+            self.client.get(self.url)
+        self.material.refresh_from_db()
+        self.assertEqual(self.material.download_count, 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, MEDIA_ROOT=tempfile.mkdtemp())
+class FileBlobTestCase(TestCase):
+    """Test cases for content-addressed, reference-counted material files"""
+
+    CONTENT = b"%PDF-1.4 worksheet"
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.maths = Subject.objects.create(name="Maths")
+        self.science = Subject.objects.create(name="Science")
+
+    def create_material(self, subject, filename, content=CONTENT):
+        return Material.objects.create(
+            title=f"{subject.name} worksheet",
+            description="Shared worksheet",
+            material_type="worksheet",
+            subject=subject,
+            difficulty_level="beginner",
+            grade_level="5",
+            estimated_time=20,
+            uploaded_by=self.teacher,
+            file=ContentFile(content, name=filename),
+        )
+
+    def test_duplicate_uploads_share_one_file(self):
+        """Re-uploading the same bytes stores no second copy"""
+        first = self.create_material(self.maths, "fractions.pdf")
+        second = self.create_material(self.science, "fractions-v2.pdf")
+
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(second.original_filename, "fractions-v2.pdf")
+        blob = FileBlob.objects.get()
+        self.assertEqual(blob.name, first.file.name)
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.size, len(self.CONTENT))
+
+    def test_replacing_a_file_moves_the_reference(self):
+        """Uploading a new file releases the old blob"""
+        material = self.create_material(self.maths, "fractions.pdf")
+        old_name = material.file.name
+        material.file = ContentFile(b"%PDF-1.4 revised", name="fractions.pdf")
+        material.save()
+
+        self.assertEqual(FileBlob.objects.get(name=old_name).ref_count, 0)
+        self.assertEqual(FileBlob.objects.get(name=material.file.name).ref_count, 1)
+
+    def test_garbage_collection_removes_unreferenced_blobs(self):
+        """Blobs are deleted only once no material points at them"""
+        first = self.create_material(self.maths, "fractions.pdf")
+        second = self.create_material(self.science, "fractions.pdf")
+        name = first.file.name
+        storage = first.file.storage
+
+        first.delete()
+        call_command("gc_file_blobs", "--grace-minutes=0", stdout=StringIO())
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(FileBlob.objects.get().ref_count, 1)
+
+        second.delete()
+        call_command("gc_file_blobs", "--grace-minutes=0", stdout=StringIO())
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(FileBlob.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES, MEDIA_ROOT=tempfile.mkdtemp())
+class ResumableUploadTestCase(TestCase):
+    """Test cases for the tus-style resumable upload API"""
+
+    CONTENT = b"%PDF-1.4 " + b"x" * 1000
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.subject = Subject.objects.create(name="Geography")
+        self.client.force_login(self.teacher)
+
+    def create_upload(self, filename="atlas.pdf", purpose="material", size=None):
+        metadata = ",".join(
+            f"{key} {base64.b64encode(value.encode()).decode()}"
+            for key, value in (("filename", filename), ("purpose", purpose))
+        )
+        return self.client.post(
+            reverse("hub:uploads_api"),
+            headers={
+                "Upload-Length": str(len(self.CONTENT) if size is None else size),
+                "Upload-Metadata": metadata,
+                "Tus-Resumable": "1.0.0",
+            },
+        )
+
+    def patch(self, location, offset, data, **headers):
+        return self.client.generic(
+            "PATCH",
+            location,
+            data,
+            content_type="application/offset+octet-stream",
+            headers={"Upload-Offset": str(offset), **headers},
+        )
+
+    def test_upload_resumes_and_attaches_to_material(self):
+        """Chunks append at the reported offset and the file becomes a material"""
+        response = self.create_upload()
+        self.assertEqual(response.status_code, 201)
+        location = response["Location"]
+
+        response = self.patch(location, 0, self.CONTENT[:400])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response["Upload-Offset"], "400")
+
+        # After a dropped connection the client asks where to resume
+        response = self.client.head(location)
+        self.assertEqual(response["Upload-Offset"], "400")
+        self.assertEqual(response["Upload-Length"], str(len(self.CONTENT)))
+
+        response = self.patch(location, 400, self.CONTENT[400:])
+        self.assertEqual(response["Upload-Offset"], str(len(self.CONTENT)))
+
+        upload_id = location.rstrip("/").rsplit("/", 1)[-1]
+        response = self.client.post(
+            reverse("dashboard:create_material"),
+            {
+                "title": "World Atlas",
+                "description": "Maps",
+                "material_type": "reference",
+                "subject": self.subject.pk,
+                "difficulty_level": "beginner",
+                "grade_level": "5",
+                "estimated_time": 30,
+                "upload_id": upload_id,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+
+        material = Material.objects.get(title="World Atlas")
+        self.assertEqual(material.original_filename, "atlas.pdf")
+        self.assertEqual(material.file_size, len(self.CONTENT))
+        with material.file.open("rb") as stored:
+            self.assertEqual(stored.read(), self.CONTENT)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_chunk_must_start_at_current_offset(self):
+        """A PATCH at the wrong offset is rejected without writing"""
+        location = self.create_upload()["Location"]
+        self.patch(location, 0, self.CONTENT[:100])
+
+        response = self.patch(location, 50, self.CONTENT[50:200])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.head(location)["Upload-Offset"], "100")
+
+    def test_checksum_mismatch_rolls_back_chunk(self):
+        """A chunk that fails its checksum is discarded"""
+        location = self.create_upload()["Location"]
+        wrong = base64.b64encode(hashlib.sha256(b"other").digest()).decode()
+
+        response = self.patch(
+            location, 0, self.CONTENT[:100], **{"Upload-Checksum": f"sha256 {wrong}"}
+        )
+        self.assertEqual(response.status_code, 460)
+        self.assertEqual(self.client.head(location)["Upload-Offset"], "0")
+
+    def test_expired_upload_cannot_be_attached(self):
+        """A finished upload past its expiry is refused, purged or not"""
+        location = self.create_upload()["Location"]
+        self.patch(location, 0, self.CONTENT)
+        upload_id = location.rstrip("/").rsplit("/", 1)[-1]
+        UploadSession.objects.update(expires_at=timezone.now())
+
+        with self.assertRaisesMessage(ValidationError, "Upload has expired."):
+            open_completed_upload(upload_id, self.teacher, "material")
+
+    def test_rejects_invalid_uploads_up_front(self):
+        """Type, size and role are checked before any bytes are sent"""
+        self.assertEqual(self.create_upload(filename="virus.exe").status_code, 400)
+        self.assertEqual(self.create_upload(size=51 * 1024 * 1024).status_code, 413)
+        self.assertEqual(self.create_upload(purpose="submission").status_code, 403)
+        self.assertFalse(UploadSession.objects.exists())
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, MEDIA_ROOT=tempfile.mkdtemp(), PREVIEW_WORKERS=0
+)
+class FilePreviewTestCase(TestCase):
+    """Test cases for upload thumbnails"""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.subject = Subject.objects.create(name="Art")
+
+    def png(self, size=(1200, 800)):
+        output = BytesIO()
+        Image.new("RGBA", size, (200, 40, 40, 255)).save(output, "PNG")
+        return output.getvalue()
+
+    def test_thumbnail_generated_after_commit(self):
+        """Image uploads get a bounded JPEG preview once the save commits"""
+        with self.captureOnCommitCallbacks(execute=True):
+            material = Material.objects.create(
+                title="Colour Wheel",
+                description="Poster",
+                material_type="reference",
+                subject=self.subject,
+                difficulty_level="beginner",
+                grade_level="3",
+                estimated_time=5,
+                uploaded_by=self.teacher,
+                file=ContentFile(self.png(), name="wheel.png"),
+            )
+
+        material.refresh_from_db()
+        self.assertEqual(material.preview_name, f"{material.file.name}.preview.jpg")
+        with material.file.storage.open(material.preview_name) as preview:
+            image = Image.open(preview)
+            self.assertEqual(image.format, "JPEG")
+            self.assertLessEqual(max(image.size), 480)
+
+        # Like the download, the preview needs a signed-in user
+        self.assertEqual(self.client.get(material.preview_url).status_code, 302)
+        self.client.force_login(self.teacher)
+        response = self.client.get(material.preview_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(
+            response["Cache-Control"], "private, max-age=31536000, immutable"
+        )
+
+    def test_new_thumbnail_changes_catalog_etag(self):
+        """A preview landing after the upload is not hidden behind a 304"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            Material.objects.create(
+                title="Colour Wheel",
+                description="Poster",
+                material_type="reference",
+                subject=self.subject,
+                difficulty_level="beginner",
+                grade_level="3",
+                estimated_time=5,
+                uploaded_by=self.teacher,
+                file=ContentFile(self.png(), name="wheel.png"),
+            )
+        url = reverse("hub:materials_list")
+        etag = self.client.get(url)["ETag"]
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_unsupported_types_have_no_preview(self):
+        """Files the renderer cannot handle are left without a thumbnail"""
+        with self.captureOnCommitCallbacks(execute=True):
+            material = Material.objects.create(
+                title="Notes",
+                description="Plain text",
+                material_type="reading",
+                subject=self.subject,
+                difficulty_level="beginner",
+                grade_level="3",
+                estimated_time=5,
+                uploaded_by=self.teacher,
+                file=ContentFile(b"just text", name="notes.txt"),
+            )
+
+        material.refresh_from_db()
+        self.assertEqual(material.preview_name, "")
+        self.assertIsNone(material.preview_url)
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse("hub:material_preview", args=[material.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DetailFragmentCacheTestCase(TestCase):
+    """Test cases for the cached material and assignment detail pages"""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.student = User.objects.create_user(
+            username="student1",
+            email="student@example.com",
+            password="password123",
+            user_type="student",
+            grade_level="9",
+            parent_email="parent@example.com",
+        )
+        self.subject = Subject.objects.create(name="Mathematics")
+        self.material = Material.objects.create(
+            title="Algebra Worksheet",
+            description="Basic algebra problems",
+            material_type="worksheet",
+            subject=self.subject,
+            difficulty_level="intermediate",
+            grade_level="9",
+            estimated_time=60,
+            uploaded_by=self.teacher,
+            external_link="https://example.com/algebra.pdf",
+            tags="algebra",
+        )
+        self.assignment = Assignment.objects.create(
+            title="Complete Algebra Worksheet",
+            description="Solve all problems",
+            material=self.material,
+            due_date=timezone.now() + timezone.timedelta(days=7),
+            created_by=self.teacher,
+        )
+        self.assignment.assigned_to.add(self.student)
+
+    def test_material_detail_repeat_view_costs_one_query(self):
+        """A cached material page only loads the material row"""
+        url = reverse("hub:material_detail", args=[self.material.pk])
+        self.client.get(url)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertContains(response, "Basic algebra problems")
+
+    def test_material_detail_invalidated_by_subject_change(self):
+        """Renaming the subject shows up without clearing the cache"""
+        url = reverse("hub:material_detail", args=[self.material.pk])
+        self.client.get(url)
+
+        self.subject.name = "Maths"
+        self.subject.save()
+        self.assertContains(self.client.get(url), "Maths</span>")
+
+    def test_assignment_detail_panel_is_per_user(self):
+        """The submission panel is cached per user and follows submissions"""
+        url = reverse("hub:assignment_detail", args=[self.assignment.pk])
+        self.client.force_login(self.student)
+        self.assertContains(self.client.get(url), "No submission yet")
+
+        # Besides the session and user lookups, only the assignment row
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        hub_queries = [q["sql"] for q in queries if '"hub_' in q["sql"]]
+        self.assertEqual(len(hub_queries), 1)
+
+        AssignmentSubmission.objects.create(
+            assignment=self.assignment,
+            student=self.student,
+            submission_text="x = 4",
+        )
+        response = self.client.get(url)
+        self.assertContains(response, "Submitted!")
+
+        self.client.force_login(self.teacher)
+        response = self.client.get(url)
+        self.assertNotContains(response, "Submitted!")
+        self.assertContains(response, "not authorized to submit")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalGetTestCase(TestCase):
+    """Test cases for ETag / Last-Modified handling on hub pages"""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.student = User.objects.create_user(
+            username="student1",
+            email="student@example.com",
+            password="password123",
+            user_type="student",
+            grade_level="9",
+            parent_email="parent@example.com",
+        )
+        self.subject = Subject.objects.create(name="Mathematics")
+        self.material = Material.objects.create(
+            title="Algebra Worksheet",
+            description="Basic algebra problems",
+            material_type="worksheet",
+            subject=self.subject,
+            difficulty_level="intermediate",
+            grade_level="9",
+            estimated_time=60,
+            uploaded_by=self.teacher,
+            external_link="https://example.com/algebra.pdf",
+        )
+        self.assignment = Assignment.objects.create(
+            title="Complete Algebra Worksheet",
+            description="Solve all problems",
+            material=self.material,
+            due_date=timezone.now() + timezone.timedelta(days=7),
+            created_by=self.teacher,
+        )
+        self.assignment.assigned_to.add(self.student)
+
+    def test_unchanged_catalog_returns_304(self):
+        """A matching If-None-Match skips rendering until a material changes"""
+        url = reverse("hub:materials_list")
+        etag = self.client.get(url)["ETag"]
+
+        # Validated from cache versions alone
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.material.title = "Algebra Worksheet (revised)"
+        self.material.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_popular_catalog_revalidates_after_activity(self):
+        """The trending order is validated by the popularity version"""
+        url = reverse("hub:materials_list") + "?sort=popular"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            record_event(self.material.pk, "download")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_anonymous_material_detail_supports_if_modified_since(self):
+        """Anonymous pages also validate by Last-Modified"""
+        url = reverse("hub:material_detail", args=[self.material.pk])
+        last_modified = self.client.get(url)["Last-Modified"]
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_assignment_etag_follows_user_version(self):
+        """A student's own submission invalidates their cached page"""
+        url = reverse("hub:assignment_detail", args=[self.assignment.pk])
+        self.client.force_login(self.student)
+        response = self.client.get(url)
+        self.assertFalse(response.has_header("Last-Modified"))
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        AssignmentSubmission.objects.create(
+            assignment=self.assignment,
+            student=self.student,
+            submission_text="x = 4",
+        )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # Other users never share the student's validator
+        self.client.force_login(self.teacher)
+        self.assertNotEqual(self.client.get(url)["ETag"], etag)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, MEDIA_ROOT=tempfile.mkdtemp())
+class ImportMaterialsTestCase(TestCase):
+    """Test cases for the bulk import_materials command"""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        Subject.objects.create(name="Mathematics")
+        self.workdir = tempfile.mkdtemp()
+        self.files = os.path.join(self.workdir, "files")
+        os.makedirs(self.files)
+        for name in ("fractions.pdf", "fractions-copy.pdf"):
+            with open(os.path.join(self.files, name), "wb") as handle:
+                handle.write(b"%PDF-1.4 fractions")
+        self.manifest = os.path.join(self.workdir, "manifest.csv")
+        rows = [
+            ["Fractions 1", "fractions.pdf", "", "mathematics", "fractions"],
+            ["Fractions 2", "fractions-copy.pdf", "", "Mathematics", "fractions"],
+            ["Number Line", "", "https://example.com/line", "Mathematics", ""],
+            ["Broken", "missing.pdf", "", "Mathematics", ""],
+        ]
+        with open(self.manifest, "w", newline="") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(
+                [
+                    "title",
+                    "file",
+                    "external_link",
+                    "subject",
+                    "tags",
+                    "description",
+                    "material_type",
+                    "difficulty_level",
+                    "grade_level",
+                    "estimated_time",
+                ]
+            )
+            for row in rows:
+                writer.writerow(row + ["Imported", "worksheet", "beginner", "4", "20"])
+
+    def run_import(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            "import_materials",
+            self.manifest,
+            "--files",
+            self.files,
+            "--uploaded-by",
+            "teacher1",
+            *args,
+            stdout=stdout,
+            stderr=stderr,
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_creates_materials_in_bulk(self):
+        """Valid rows are inserted with files, tags and blob references"""
+        stdout, stderr = self.run_import()
+
+        self.assertIn("Row 4: file not found: missing.pdf", stderr)
+        self.assertEqual(Material.objects.count(), 3)
+        first, second = Material.objects.filter(title__startswith="Fractions")
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(FileBlob.objects.get().ref_count, 2)
+        self.assertEqual(Tag.objects.get(name="fractions").material_count, 2)
+        self.assertEqual(
+            {m.original_filename for m in (first, second)},
+            {"fractions.pdf", "fractions-copy.pdf"},
+        )
+
+    def test_resume_skips_rows_already_imported(self):
+        """Re-running after fixing a row imports only what is left"""
+        self.run_import()
+        with open(os.path.join(self.files, "missing.pdf"), "wb") as handle:
+            handle.write(b"%PDF-1.4 found")
+
+        stdout, _ = self.run_import()
+        self.assertIn("Resuming: 3 rows already imported", stdout)
+        self.assertEqual(Material.objects.count(), 4)
+        self.assertFalse(os.path.exists(f"{self.manifest}.import-state"))
+
+    def test_dry_run_writes_nothing(self):
+        """--dry-run only reports validation results"""
+        stdout, stderr = self.run_import("--dry-run")
+        self.assertIn("Validated 3 materials, 1 invalid rows", stdout)
+        self.assertFalse(Material.objects.exists())
+
+    def add_row(self, title, link, subject):
+        with open(self.manifest, "a", newline="") as handle:
+            csv.writer(handle).writerow(
+                [title, "", link, subject, "", "Imported"]
+                + ["worksheet", "beginner", "4", "20"]
+            )
+
+    def test_dry_run_reports_subjects_it_would_create(self):
+        """With --create-subjects a dry run accepts the rows the real run will"""
+        self.add_row("Cells", "https://example.com/cells", "Science")
+        stdout, stderr = self.run_import("--dry-run", "--create-subjects")
+        self.assertIn("Would create subjects: Science", stdout)
+        self.assertIn("Validated 4 materials, 1 invalid rows", stdout)
+        self.assertNotIn("unknown subject", stderr)
+        self.assertFalse(Subject.objects.filter(name="Science").exists())
+
+        stdout, _ = self.run_import("--create-subjects")
+        self.assertIn("Created subjects: Science", stdout)
+        self.assertEqual(Material.objects.count(), 4)
+
+    def test_long_external_link_is_rejected(self):
+        self.add_row("Long", "https://example.com/" + "a" * 200, "Mathematics")
+        _, stderr = self.run_import("--dry-run")
+        self.assertIn("Row 5: external_link longer than 200 characters", stderr)
+
+    def test_failed_batch_leaves_its_files_collectable(self):
+        """Files copied for a batch that rolls back get unreferenced blob rows"""
+        with patch("hub.importer.sync_material_tags", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.run_import()
+        self.assertFalse(Material.objects.exists())
+        blob = FileBlob.objects.get()
+        self.assertEqual(blob.ref_count, 0)
+        self.assertTrue(material_storage().exists(blob.name))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MaterialRecommendationTestCase(TestCase):
+    """Test cases for the precomputed similar-materials panel"""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        math = Subject.objects.create(name="Mathematics")
+        art = Subject.objects.create(name="Art")
+        self.fractions, self.decimals, self.geometry, self.painting = [
+            Material.objects.create(
+                title=title,
+                description=f"{title} practice",
+                material_type="worksheet",
+                subject=subject,
+                difficulty_level="beginner",
+                grade_level="5",
+                estimated_time=30,
+                uploaded_by=self.teacher,
+                external_link="https://example.com/material",
+                tags=tags,
+            )
+            for title, subject, tags in [
+                ("Fractions", math, "numbers"),
+                ("Decimals", math, "numbers"),
+                ("Geometry", math, "shapes"),
+                ("Painting", art, "colour"),
+            ]
+        ]
+        students = [
+            User.objects.create_user(
+                username=f"student{i}",
+                email=f"student{i}@example.com",
+                password="password123",
+                user_type="student",
+                grade_level="5",
+                parent_email="parent@example.com",
+            )
+            for i in range(3)
+        ]
+        # Everyone who did fractions also painted; nobody did the others
+        for student in students:
+            for material in (self.fractions, self.painting):
+                StudentProgress.objects.create(
+                    student=student, material=material, status="in_progress", score=90
+                )
+
+    def neighbours(self, material):
+        return list(
+            MaterialSimilarity.objects.filter(material=material)
+            .order_by("rank")
+            .values_list("similar__title", flat=True)
+        )
+
+    def test_build_ranks_co_occurrence_then_content(self):
+        """Shared students outrank a shared subject; tags break subject ties"""
+        call_command("build_recommendations", "--top-k", "3", stdout=StringIO())
+
+        self.assertEqual(
+            self.neighbours(self.fractions), ["Painting", "Decimals", "Geometry"]
+        )
+        # Geometry has no progress at all but still gets its subject-mates
+        self.assertCountEqual(self.neighbours(self.geometry), ["Decimals", "Fractions"])
+        self.assertNotIn("Fractions", self.neighbours(self.fractions))
+        self.assertNotIn("Painting", self.neighbours(self.geometry))
+
+    def test_rebuild_replaces_rows_and_skips_inactive(self):
+        """A rebuild drops stale neighbours and inactive materials"""
+        call_command("build_recommendations", stdout=StringIO())
+        self.painting.is_active = False
+        self.painting.save()
+
+        results = build_similarities()
+        self.assertNotIn(self.painting.pk, {pk for row in results for pk in row[:2]})
+        call_command("build_recommendations", stdout=StringIO())
+        self.assertFalse(
+            MaterialSimilarity.objects.filter(similar=self.painting).exists()
+        )
+
+    def test_detail_panel_is_cached_until_rebuild(self):
+        """The panel is one lookup, cached until the next build"""
+        url = reverse("hub:material_detail", args=[self.fractions.pk])
+        self.assertNotContains(self.client.get(url), "Students who did this")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("build_recommendations", stdout=StringIO())
+        response = self.client.get(url)
+        self.assertContains(response, "Students who did this also did")
+        self.assertContains(response, "Painting")
+
+        # Only the material row; the neighbours come from cache
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MaterialPopularityTestCase(TestCase):
+    """Test cases for time-decayed trending scores"""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.student = User.objects.create_user(
+            username="student1",
+            email="student@example.com",
+            password="password123",
+            user_type="student",
+            grade_level="5",
+            parent_email="parent@example.com",
+        )
+        subject = Subject.objects.create(name="Mathematics")
+        self.old, self.fresh, self.quiet = [
+            Material.objects.create(
+                title=title,
+                description="Practice problems",
+                material_type="worksheet",
+                subject=subject,
+                difficulty_level="beginner",
+                grade_level="5",
+                estimated_time=30,
+                uploaded_by=self.teacher,
+                external_link="https://example.com/material",
+            )
+            for title in ("Old Favourite", "Fresh Hit", "Quiet One")
+        ]
+
+    def score(self, material):
+        return decayed_score(MaterialPopularity.objects.get(material=material).score)
+
+    def test_older_events_decay(self):
+        """Three half-lives shrink an event to an eighth of its weight"""
+        record_event(self.old.pk, "complete", timezone.now() - timezone.timedelta(21))
+        record_event(self.fresh.pk, "download")
+
+        self.assertAlmostEqual(self.score(self.old), 0.5, places=3)
+        self.assertAlmostEqual(self.score(self.fresh), 1.0, places=3)
+
+    def test_progress_and_downloads_are_counted(self):
+        """Starting, completing and downloading all feed the score"""
+        progress = StudentProgress.objects.create(
+            student=self.student, material=self.old, status="in_progress"
+        )
+        self.assertAlmostEqual(self.score(self.old), 2.0, places=3)
+        progress.status = "completed"
+        progress.completed_at = timezone.now()
+        progress.save()
+        progress.save()  # unchanged status is not another completion
+        self.assertAlmostEqual(self.score(self.old), 6.0, places=3)
+
+        self.client.force_login(self.student)
+        self.client.get(reverse("hub:download_material", args=[self.fresh.pk]))
+        self.assertFalse(MaterialPopularity.objects.filter(material=self.fresh))
+        flush_download_counts()
+        self.assertAlmostEqual(self.score(self.fresh), 1.0, places=3)
+
+    def test_popular_sort_pages_through_active_materials(self):
+        """sort=popular orders by score and skips materials without activity"""
+        record_event(self.old.pk, "download")
+        record_event(self.fresh.pk, "complete")
+
+        seen = []
+        url = reverse("hub:materials_api") + "?sort=popular&limit=1"
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(item["title"] for item in data["results"])
+            url = data["next"]
+        self.assertEqual(seen, ["Fresh Hit", "Old Favourite"])
+
+        response = self.client.get(reverse("hub:trending_api"))
+        results = response.json()["results"]
+        self.assertEqual([r["title"] for r in results], ["Fresh Hit", "Old Favourite"])
+        self.assertAlmostEqual(results[0]["trend"], 4.0, places=2)
+
+    def test_rebuild_from_progress(self):
+        """The seeding command scores progress history by its timestamps"""
+        StudentProgress.objects.create(
+            student=self.student, material=self.quiet, status="in_progress"
+        )
+        MaterialPopularity.objects.all().delete()
+
+        call_command("rebuild_popularity", stdout=StringIO())
+        self.assertAlmostEqual(self.score(self.quiet), 2.0, places=3)
+        self.assertEqual(MaterialPopularity.objects.count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AssignmentFeedTestCase(TestCase):
+    """Test cases for the annotated, keyset-paginated assignment feed"""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.student = User.objects.create_user(
+            username="student1",
+            email="student@example.com",
+            password="password123",
+            user_type="student",
+            grade_level="5",
+            parent_email="parent@example.com",
+        )
+        subject = Subject.objects.create(name="Mathematics")
+        self.material = Material.objects.create(
+            title="Fractions",
+            description="Practice problems",
+            material_type="worksheet",
+            subject=subject,
+            difficulty_level="beginner",
+            grade_level="5",
+            estimated_time=30,
+            uploaded_by=self.teacher,
+            external_link="https://example.com/fractions",
+        )
+        self.assignments = [self.assign(f"Homework {i}", days=i + 1) for i in range(4)]
+        self.client.force_login(self.student)
+
+    def assign(self, title, days, students=None):
+        assignment = Assignment.objects.create(
+            title=title,
+            description="Do the worksheet",
+            material=self.material,
+            due_date=timezone.now() + timezone.timedelta(days=days),
+            created_by=self.teacher,
+        )
+        assignment.assigned_to.set(students or [self.student])
+        return assignment
+
+    def feed_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("hub:assignments_list"))
+        self.assertEqual(response.status_code, 200)
+        return [q["sql"] for q in queries if '"hub_' in q["sql"]]
+
+    def test_page_query_count_does_not_grow_with_rows(self):
+        """ETag validator, total and the annotated page, however many rows"""
+        AssignmentSubmission.objects.create(
+            assignment=self.assignments[0],
+            student=self.student,
+            submission_text="1/2",
+            grade="A",
+        )
+        self.assertEqual(len(self.feed_queries()), 3)
+
+        for i in range(5):
+            self.assign(f"Extra {i}", days=10 + i)
+        self.assertEqual(len(self.feed_queries()), 3)
+
+        response = self.client.get(reverse("hub:assignments_list"))
+        self.assertContains(response, "9 total")
+        self.assertContains(response, "Submitted!", count=1)
+
+    def test_api_pages_in_due_date_order_with_submission_status(self):
+        """Only the student's active assignments, soonest first, annotated"""
+        other = User.objects.create_user(
+            username="student2",
+            email="student2@example.com",
+            password="password123",
+            user_type="student",
+            grade_level="5",
+            parent_email="parent@example.com",
+        )
+        self.assign("Someone else's", days=1, students=[other])
+        hidden = self.assign("Withdrawn", days=1)
+        Assignment.objects.filter(pk=hidden.pk).update(is_active=False)
+        Assignment.objects.filter(pk=self.assignments[0].pk).update(
+            due_date=timezone.now() - timezone.timedelta(days=1)
+        )
+        AssignmentSubmission.objects.create(
+            assignment=self.assignments[1],
+            student=self.student,
+            submission_text="0.5",
+            grade="B+",
+        )
+
+        results = []
+        url = reverse("hub:assignments_api") + "?limit=3"
+        while url:
+            data = self.client.get(url).json()
+            results.extend(data["results"])
+            url = data["next"]
+
+        self.assertEqual(
+            [r["title"] for r in results], [f"Homework {i}" for i in range(4)]
+        )
+        self.assertEqual([r["overdue"] for r in results], [True, False, False, False])
+        self.assertIsNone(results[0]["submission"])
+        self.assertEqual(results[1]["submission"]["status"], "graded")
+        self.assertEqual(results[1]["submission"]["grade"], "B+")
+
+        response = self.client.get(reverse("hub:assignments_api"), {"cursor": "x"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RosterMembershipTestCase(TestCase):
+    """Test cases for cached assignment roster checks"""
+
+    def setUp(self):
+        cache.clear()
+        teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.student = User.objects.create_user(
+            username="student1",
+            email="student@example.com",
+            password="password123",
+            user_type="student",
+            grade_level="5",
+            parent_email="parent@example.com",
+        )
+        material = Material.objects.create(
+            title="Fractions",
+            description="Practice problems",
+            material_type="worksheet",
+            subject=Subject.objects.create(name="Mathematics"),
+            difficulty_level="beginner",
+            grade_level="5",
+            estimated_time=30,
+            uploaded_by=teacher,
+            external_link="https://example.com/fractions",
+        )
+        self.assignment = Assignment.objects.create(
+            title="Homework",
+            description="Do the worksheet",
+            material=material,
+            due_date=timezone.now() + timezone.timedelta(days=7),
+            created_by=teacher,
+        )
+
+    def test_membership_is_cached_until_roster_changes(self):
+        """Repeat checks skip the database; roster edits take effect at once"""
+        self.assertFalse(is_assigned(self.assignment.pk, self.student.pk))
+        self.assignment.assigned_to.add(self.student)
+        with self.assertNumQueries(1):
+            self.assertTrue(is_assigned(self.assignment.pk, self.student.pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(is_assigned(self.assignment.pk, self.student.pk))
+
+        self.assignment.assigned_to.remove(self.student)
+        self.assertFalse(is_assigned(self.assignment.pk, self.student.pk))
+
+    def test_reverse_side_changes_invalidate(self):
+        """Editing a student's assignments invalidates those rosters too"""
+        self.student.assignments.add(self.assignment)
+        self.assertTrue(is_assigned(self.assignment.pk, self.student.pk))
+        self.student.assignments.clear()
+        self.assertFalse(is_assigned(self.assignment.pk, self.student.pk))
+
+    def test_submit_page_checks_membership_without_loading_roster(self):
+        """The submit view asks about one student, not the whole class"""
+        self.assignment.assigned_to.add(self.student)
+        self.client.force_login(self.student)
+        url = reverse("hub:submit_assignment", args=[self.assignment.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        roster = [q["sql"] for q in queries if "assigned_to" in q["sql"]]
+        self.assertEqual(roster, [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ROSTER_FANOUT_WORKERS=0)
+class CohortFanOutTestCase(TestCase):
+    """Test cases for assigning work to whole cohorts"""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.students = [
+            User.objects.create_user(
+                username=f"student{i}",
+                email=f"student{i}@example.com",
+                password="password123",
+                user_type="student",
+                grade_level="5",
+                parent_email="parent@example.com",
+            )
+            for i in range(6)
+        ]
+        self.cohort = Cohort.objects.create(name="Grade 5", created_by=self.teacher)
+        self.cohort.students.set(self.students[:4])
+        self.material = Material.objects.create(
+            title="Fractions",
+            description="Practice problems",
+            material_type="worksheet",
+            subject=Subject.objects.create(name="Mathematics"),
+            difficulty_level="beginner",
+            grade_level="5",
+            estimated_time=30,
+            uploaded_by=self.teacher,
+            external_link="https://example.com/fractions",
+        )
+        self.client.force_login(self.teacher)
+
+    def create_assignment(self, **extra):
+        data = {
+            "title": "Homework",
+            "description": "Do the worksheet",
+            "material": self.material.pk,
+            "due_date": (timezone.now() + timezone.timedelta(days=7)).strftime(
+                "%Y-%m-%dT%H:%M"
+            ),
+            **extra,
+        }
+        return self.client.post(reverse("dashboard:create_assignment"), data)
+
+    def test_cohort_is_fanned_out_after_the_request(self):
+        """The request only records the cohort; members are added on commit"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.create_assignment(
+                cohorts=[self.cohort.pk], assigned_to=[self.students[5].pk]
+            )
+        self.assertRedirects(
+            response, reverse("dashboard:teacher"), fetch_redirect_response=False
+        )
+        assignment = Assignment.objects.get()
+        self.assertTrue(assignment.roster_pending)
+        self.assertEqual(assignment.assigned_to.count(), 1)
+
+        for callback in callbacks:
+            callback()
+        assignment.refresh_from_db()
+        self.assertFalse(assignment.roster_pending)
+        self.assertEqual(assignment.assigned_to.count(), 5)
+        self.assertTrue(is_assigned(assignment.pk, self.students[0].pk))
+        self.assertFalse(is_assigned(assignment.pk, self.students[4].pk))
+
+    def test_form_needs_students_or_cohort(self):
+        """An assignment with nobody to do it is rejected"""
+        response = self.create_assignment()
+        self.assertContains(response, "Choose at least one student or cohort.")
+        self.assertFalse(Assignment.objects.exists())
+
+    def test_other_teachers_cohorts_are_not_offered(self):
+        other = User.objects.create_user(
+            username="teacher2",
+            email="teacher2@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        theirs = Cohort.objects.create(name="Grade 6", created_by=other)
+        response = self.create_assignment(cohorts=[theirs.pk])
+        self.assertIn("cohorts", response.context["form"].errors)
+        self.assertFalse(Assignment.objects.exists())
+
+    def test_late_joiners_get_open_assignments(self):
+        """Joining a cohort adds its open assignments, pending ones via command"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_assignment(cohorts=[self.cohort.pk])
+        assignment = Assignment.objects.get()
+        late = self.students[4]
+        self.assertFalse(is_assigned(assignment.pk, late.pk))
+
+        late.cohorts.add(self.cohort)
+        self.assertTrue(is_assigned(assignment.pk, late.pk))
+
+        # A fan-out lost with its worker is redone by the command
+        assignment.assigned_to.clear()
+        Assignment.objects.filter(pk=assignment.pk).update(roster_pending=True)
+        call_command("fan_out_rosters", stdout=StringIO())
+        self.assertEqual(assignment.assigned_to.count(), 5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DueReminderTestCase(TestCase):
+    """Test cases for the due-soon reminder sweep"""
+
+    def setUp(self):
+        teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.students = [
+            User.objects.create_user(
+                username=f"student{i}",
+                email=f"student{i}@example.com",
+                password="password123",
+                user_type="student",
+                grade_level="5",
+                parent_email="parent@example.com",
+            )
+            for i in range(3)
+        ]
+        material = Material.objects.create(
+            title="Fractions",
+            description="Practice problems",
+            material_type="worksheet",
+            subject=Subject.objects.create(name="Mathematics"),
+            difficulty_level="beginner",
+            grade_level="5",
+            estimated_time=30,
+            uploaded_by=teacher,
+            external_link="https://example.com/fractions",
+        )
+        self.soon, self.later = [
+            Assignment.objects.create(
+                title=title,
+                description="Do the worksheet",
+                material=material,
+                due_date=timezone.now() + timezone.timedelta(hours=hours),
+                created_by=teacher,
+            )
+            for title, hours in (("Due tomorrow", 12), ("Due next week", 24 * 7))
+        ]
+        for assignment in (self.soon, self.later):
+            assignment.assigned_to.set(self.students)
+        AssignmentSubmission.objects.create(
+            assignment=self.soon, student=self.students[0], submission_text="done"
+        )
+
+    @patch("hub.reminders.send_assignment_notification")
+    def test_reminds_unsubmitted_students_once(self, mock_send):
+        """Only the window's non-submitters, and never twice"""
+        self.assertEqual(send_due_reminders(), 2)
+        mock_send.assert_called_once()
+        assignment, action, student_ids = mock_send.call_args.args
+        self.assertEqual(assignment, self.soon)
+        self.assertEqual(action, "due_soon")
+        self.assertCountEqual(student_ids, [s.pk for s in self.students[1:]])
+        self.assertEqual(ReminderLog.objects.filter(sent_at__isnull=False).count(), 2)
+
+        self.assertEqual(send_due_reminders(), 0)
+        mock_send.assert_called_once()
+
+    @patch("hub.reminders.send_assignment_notification")
+    def test_other_runs_claims_are_respected_until_lease_expires(self, mock_send):
+        """A live claim elsewhere is skipped; an abandoned one is taken over"""
+        ReminderLog.objects.create(
+            assignment=self.soon,
+            student=self.students[1],
+            claimed_by="othernode",
+            claimed_at=timezone.now(),
+        )
+        self.assertEqual(send_due_reminders(), 1)
+        self.assertEqual(mock_send.call_args.args[2], [self.students[2].pk])
+
+        later = timezone.now() + timezone.timedelta(minutes=15)
+        self.assertEqual(send_due_reminders(now=later), 1)
+        self.assertEqual(mock_send.call_args.args[2], [self.students[1].pk])
+        self.assertFalse(ReminderLog.objects.filter(sent_at__isnull=True).exists())
+
+    @patch("users.firebase_utils.send_notification_to_tokens", return_value=1)
+    def test_notification_targets_given_students(self, mock_tokens):
+        """Reminders reach the active devices of the chosen students only"""
+        for i, student in enumerate(self.students):
+            FirebaseToken.objects.create(user=student, token=f"token-{i}")
+        call_command("send_due_reminders", stdout=StringIO())
+
+        tokens, notification, data = mock_tokens.call_args.args
+        self.assertCountEqual(tokens, ["token-1", "token-2"])
+        self.assertEqual(notification["title"], "Assignment Due Soon")
+        self.assertEqual(data["action"], "due_soon")
+
+    @patch("users.firebase_utils.initialize_firebase", return_value=None)
+    def test_failed_send_stays_claimed_for_retry(self, mock_init):
+        """An FCM outage or missing config must not mark reminders as sent"""
+        FirebaseToken.objects.create(user=self.students[1], token="token-1")
+        self.assertEqual(send_due_reminders(), 0)
+        self.assertFalse(ReminderLog.objects.filter(sent_at__isnull=False).exists())
+
+        later = timezone.now() + timezone.timedelta(minutes=15)
+        with patch("hub.reminders.send_assignment_notification") as mock_send:
+            self.assertEqual(send_due_reminders(now=later), 2)
+        mock_send.assert_called_once()
+
+    @patch("hub.reminders.MULTICAST_LIMIT", 1)
+    @patch("users.firebase_utils.send_notification_to_tokens")
+    def test_sent_batches_are_not_repeated_after_a_failure(self, mock_tokens):
+        """Each multicast is stamped on its own; only the failed one is retried"""
+        for i, student in enumerate(self.students):
+            FirebaseToken.objects.create(user=student, token=f"token-{i}")
+        mock_tokens.side_effect = [1, NotificationError("FCM unavailable")]
+        self.assertEqual(send_due_reminders(), 1)
+        (sent,) = ReminderLog.objects.filter(sent_at__isnull=False)
+        first_tokens = mock_tokens.call_args_list[0].args[0]
+        self.assertEqual(first_tokens, [f"token-{self.students.index(sent.student)}"])
+
+        mock_tokens.side_effect = None
+        mock_tokens.return_value = 1
+        later = timezone.now() + timezone.timedelta(minutes=15)
+        self.assertEqual(send_due_reminders(now=later), 1)
+        self.assertEqual(mock_tokens.call_count, 3)
+        self.assertNotEqual(mock_tokens.call_args.args[0], first_tokens)
+        self.assertFalse(ReminderLog.objects.filter(sent_at__isnull=True).exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CalendarFeedTestCase(TestCase):
+    """Test cases for the signed, version-cached iCalendar feeds"""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.parent = User.objects.create_user(
+            username="parent1",
+            email="parent@example.com",
+            password="password123",
+            user_type="parent",
+        )
+        self.student = User.objects.create_user(
+            username="student1",
+            email="student@example.com",
+            password="password123",
+            user_type="student",
+            first_name="Ada",
+            grade_level="5",
+            parent_email="parent@example.com",
+        )
+        material = Material.objects.create(
+            title="Fractions",
+            description="Practice problems",
+            material_type="worksheet",
+            subject=Subject.objects.create(name="Mathematics"),
+            difficulty_level="beginner",
+            grade_level="5",
+            estimated_time=30,
+            uploaded_by=self.teacher,
+            external_link="https://example.com/fractions",
+        )
+        self.assignment = Assignment.objects.create(
+            title="Homework, part 1",
+            description="Do the worksheet",
+            material=material,
+            due_date=timezone.now() + timezone.timedelta(days=7),
+            created_by=self.teacher,
+        )
+        self.assignment.assigned_to.add(self.student)
+        self.url = reverse("hub:calendar_feed", args=[feed_token(self.student)])
+
+    def test_feed_lists_roster_due_dates(self):
+        """Events carry the escaped title and the UTC due date"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        body = response.content.decode()
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertIn("SUMMARY:Homework\\, part 1\r\n", body)
+        due = self.assignment.due_date.astimezone(dt_timezone.utc)
+        self.assertIn(f"DTSTART:{due:%Y%m%dT%H%M%SZ}\r\n", body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split("\r\n")))
+
+    def test_unchanged_feed_is_served_without_queries(self):
+        """Repeat polls and conditional polls are answered from the cache"""
+        etag = self.client.get(self.url)["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_assignment_changes_regenerate_only_affected_feeds(self):
+        """Edits bump the roster's feeds; other students keep their ETag"""
+        other = User.objects.create_user(
+            username="student2",
+            email="student2@example.com",
+            password="password123",
+            user_type="student",
+            grade_level="5",
+            parent_email="other@example.com",
+        )
+        other_url = reverse("hub:calendar_feed", args=[feed_token(other)])
+        etag = self.client.get(self.url)["ETag"]
+        other_etag = self.client.get(other_url)["ETag"]
+
+        self.assignment.title = "Renamed"
+        self.assignment.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("SUMMARY:Renamed", response.content.decode())
+        response = self.client.get(other_url, HTTP_IF_NONE_MATCH=other_etag)
+        self.assertEqual(response.status_code, 304)
+
+        etag = self.client.get(self.url)["ETag"]
+        self.assignment.assigned_to.remove(self.student)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertNotIn("BEGIN:VEVENT", response.content.decode())
+
+    def test_parent_feed_follows_children(self):
+        """A parent's feed names the child and tracks who their children are"""
+        url = reverse("hub:calendar_feed", args=[feed_token(self.parent)])
+        body = self.client.get(url).content.decode()
+        self.assertIn("SUMMARY:Ada: Homework\\, part 1", body)
+
+        self.student.parent_email = "someone-else@example.com"
+        self.student.save()
+        self.assertNotIn("BEGIN:VEVENT", self.client.get(url).content.decode())
+
+    def test_forged_token_is_rejected(self):
+        url = reverse("hub:calendar_feed", args=[f"{self.teacher.pk}:forged"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    PREVIEW_WORKERS=0,
+    SUBMISSION_WORKERS=0,
+)
+class SubmissionPipelineTestCase(TestCase):
+    """Test cases for background processing of submissions"""
+
+    def setUp(self):
+        teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.student = User.objects.create_user(
+            username="student1",
+            email="student@example.com",
+            password="password123",
+            user_type="student",
+            grade_level="5",
+            parent_email="parent@example.com",
+        )
+        material = Material.objects.create(
+            title="Fractions",
+            description="Practice problems",
+            material_type="worksheet",
+            subject=Subject.objects.create(name="Mathematics"),
+            difficulty_level="beginner",
+            grade_level="5",
+            estimated_time=30,
+            uploaded_by=teacher,
+            external_link="https://example.com/fractions",
+        )
+        self.assignment = Assignment.objects.create(
+            title="Homework",
+            description="Do the worksheet",
+            material=material,
+            due_date=timezone.now() + timezone.timedelta(days=7),
+            created_by=teacher,
+        )
+        self.assignment.assigned_to.add(self.student)
+        self.client.force_login(self.student)
+
+    def submit(self, data):
+        return self.client.post(
+            reverse("hub:submit_assignment", args=[self.assignment.pk]), data
+        )
+
+    def png(self):
+        output = BytesIO()
+        Image.new("RGB", (300, 200), (40, 120, 200)).save(output, "PNG")
+        return output.getvalue()
+
+    @patch("hub.submissions.send_submission_notification")
+    def test_processing_waits_for_commit(self, notify):
+        """The request only stores the file; hashing and previews follow"""
+        data = self.png()
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.submit(
+                {"submission_file": ContentFile(data, name="answer.png")}
+            )
+        self.assertEqual(response.status_code, 302)
+        submission = AssignmentSubmission.objects.get(student=self.student)
+        self.assertEqual(submission.file_sha256, "")
+        self.assertEqual(submission.processing_job.state, "pending")
+        notify.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+        submission.refresh_from_db()
+        self.assertEqual(submission.file_sha256, hashlib.sha256(data).hexdigest())
+        self.assertEqual(submission.file_mime_type, "image/png")
+        self.assertTrue(submission.preview_name)
+        self.assertEqual(submission.processing_job.state, "done")
+        notify.assert_called_once_with(submission, strict=True)
+
+        # A thumbnail landing later still refreshes the student's panels
+        AssignmentSubmission.objects.filter(pk=submission.pk).update(preview_name="")
+        version = get_version(user_namespace(self.student.pk))
+        generate_preview(AssignmentSubmission._meta.label, submission.pk)
+        self.assertNotEqual(get_version(user_namespace(self.student.pk)), version)
+
+    @patch("hub.submissions.send_submission_notification")
+    def test_preview_is_only_shown_to_student_and_assignment_teacher(self, notify):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submit({"submission_file": ContentFile(self.png(), name="a.png")})
+        submission = AssignmentSubmission.objects.get(student=self.student)
+        url = reverse("hub:submission_preview", args=[submission.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.client.force_login(self.assignment.created_by)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        other = User.objects.create_user(
+            username="teacher2",
+            email="teacher2@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    @patch("hub.submissions.send_submission_notification")
+    def test_failed_stage_is_retried_with_backoff(self, notify):
+        """A retry resumes at the failed stage without redoing earlier ones"""
+        notify.side_effect = RuntimeError("FCM unavailable")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submit({"submission_text": "My answer"})
+        job = SubmissionJob.objects.get()
+        self.assertEqual(job.state, "pending")
+        self.assertEqual(job.stage, "notify")
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("FCM unavailable", job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(list(due_jobs()), [])
+
+        notify.side_effect = None
+        later = job.run_after + timezone.timedelta(seconds=1)
+        self.assertEqual(list(due_jobs(later)), [job.pk])
+        self.assertEqual(run_job(job.pk, later), "done")
+        self.assertEqual(notify.call_count, 2)
+        self.assertIsNone(run_job(job.pk, later))
+
+    @patch("users.firebase_utils.initialize_firebase", return_value=None)
+    def test_undelivered_notification_is_retried(self, mock_init):
+        """A push that reaches no device fails the stage instead of passing"""
+        FirebaseToken.objects.create(
+            user=self.assignment.created_by, token="teacher-token"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submit({"submission_text": "My answer"})
+        job = SubmissionJob.objects.get()
+        self.assertEqual(job.state, "pending")
+        self.assertEqual(job.stage, "notify")
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("Firebase is not initialized", job.last_error)
+
+    @patch("hub.submissions.send_submission_notification")
+    def test_jobs_give_up_after_max_attempts(self, notify):
+        notify.side_effect = RuntimeError("FCM unavailable")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submit({"submission_text": "My answer"})
+        job = SubmissionJob.objects.get()
+        for _ in range(MAX_ATTEMPTS - 1):
+            job.refresh_from_db()
+            run_job(job.pk, job.run_after)
+        job.refresh_from_db()
+        self.assertEqual(job.state, "failed")
+        self.assertEqual(job.attempts, MAX_ATTEMPTS)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GradingQueueTestCase(TestCase):
+    """Test cases for the grading queue and bulk grading"""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        material = Material.objects.create(
+            title="Fractions",
+            description="Practice problems",
+            material_type="worksheet",
+            subject=Subject.objects.create(name="Mathematics"),
+            difficulty_level="beginner",
+            grade_level="5",
+            estimated_time=30,
+            uploaded_by=self.teacher,
+            external_link="https://example.com/fractions",
+        )
+        self.assignment = Assignment.objects.create(
+            title="Homework",
+            description="Do the worksheet",
+            material=material,
+            due_date=timezone.now() + timezone.timedelta(days=7),
+            created_by=self.teacher,
+        )
+        self.submissions = []
+        for i in range(3):
+            student = User.objects.create_user(
+                username=f"student{i}",
+                email=f"student{i}@example.com",
+                password="password123",
+                user_type="student",
+                grade_level="5",
+                parent_email="parent@example.com",
+            )
+            self.submissions.append(
+                AssignmentSubmission.objects.create(
+                    assignment=self.assignment,
+                    student=student,
+                    submission_text=f"Answer {i}",
+                )
+            )
+        self.client.force_login(self.teacher)
+
+    def grade(self, grades):
+        return self.client.post(
+            reverse("hub:bulk_grade_api"),
+            {"grades": grades},
+            content_type="application/json",
+        )
+
+    def test_queue_pages_through_ungraded_work(self):
+        """Graded submissions leave the queue; pages follow the cursor"""
+        self.submissions[0].grade = "B"
+        self.submissions[0].save()
+        url = reverse("hub:grading_queue_api")
+        data = self.client.get(url, {"limit": 1}).json()
+        self.assertEqual([r["id"] for r in data["results"]], [self.submissions[1].pk])
+        data = self.client.get(url, {"limit": 1, "cursor": data["next_cursor"]}).json()
+        self.assertEqual([r["id"] for r in data["results"]], [self.submissions[2].pk])
+        self.assertIsNone(data["next_cursor"])
+
+    def test_bulk_grade_is_one_update(self):
+        """A whole class is graded with a single UPDATE statement"""
+        grades = [
+            {"id": self.submissions[0].pk, "numeric_score": 95},
+            {"id": self.submissions[1].pk, "numeric_score": 72, "grade": "B"},
+            {"id": self.submissions[2].pk, "grade": "A+", "teacher_feedback": "Great"},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.grade(grades)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["graded"], 3)
+        table = AssignmentSubmission._meta.db_table
+        updates = [q for q in queries if q["sql"].startswith(f'UPDATE "{table}"')]
+        self.assertEqual(len(updates), 1)
+
+        graded = AssignmentSubmission.objects.in_bulk([g["id"] for g in grades])
+        self.assertEqual(graded[self.submissions[0].pk].grade, "A")
+        self.assertEqual(graded[self.submissions[1].pk].grade, "B")
+        self.assertEqual(graded[self.submissions[2].pk].teacher_feedback, "Great")
+        for submission in graded.values():
+            self.assertEqual(submission.status, "graded")
+            self.assertEqual(submission.graded_by, self.teacher)
+            self.assertIsNotNone(submission.graded_at)
+
+    def test_bulk_grade_keeps_feedback_and_revision_requests(self):
+        """Omitted feedback is kept; a requested revision stays returned"""
+        first, second = self.submissions[:2]
+        AssignmentSubmission.objects.filter(pk=first.pk).update(
+            teacher_feedback="Show your working"
+        )
+        AssignmentSubmission.objects.filter(pk=second.pk).update(
+            revision_requested=True, status="returned"
+        )
+        response = self.grade(
+            [
+                {"id": first.pk, "numeric_score": 88},
+                {"id": second.pk, "numeric_score": 60},
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.teacher_feedback, "Show your working")
+        self.assertEqual(first.status, "graded")
+        self.assertEqual(second.status, "returned")
+        self.assertEqual(second.numeric_score, 60)
+
+    def test_invalid_rows_reject_the_whole_request(self):
+        """Bad scores and other teachers' submissions change nothing"""
+        response = self.grade(
+            [
+                {"id": self.submissions[0].pk, "numeric_score": 95},
+                {"id": self.submissions[1].pk, "numeric_score": 130},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("1", response.json()["errors"])
+
+        other = User.objects.create_user(
+            username="teacher2",
+            email="teacher2@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        self.client.force_login(other)
+        response = self.grade([{"id": self.submissions[0].pk, "numeric_score": 95}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(AssignmentSubmission.objects.filter(status="graded").exists())
+
+    def test_distribution_is_grouped_by_letter(self):
+        self.grade(
+            [
+                {"id": self.submissions[0].pk, "numeric_score": 95},
+                {"id": self.submissions[1].pk, "numeric_score": 94},
+                {"id": self.submissions[2].pk, "numeric_score": 40},
+            ]
+        )
+        data = self.client.get(reverse("hub:grade_distribution_api")).json()
+        (report,) = data["assignments"]
+        self.assertEqual(report["id"], self.assignment.pk)
+        self.assertEqual(report["letters"]["A"], 2)
+        self.assertEqual(report["letters"]["F"], 1)
+        self.assertEqual(sum(report["letters"].values()), 3)
+
+    def test_distribution_counts_entered_letters(self):
+        """A letter entered by hand counts over the score, or without one"""
+        self.grade(
+            [
+                {"id": self.submissions[0].pk, "numeric_score": 95, "grade": "B"},
+                {"id": self.submissions[1].pk, "numeric_score": 40},
+            ]
+        )
+        AssignmentSubmission.objects.filter(pk=self.submissions[2].pk).update(grade="C")
+        data = self.client.get(reverse("hub:grade_distribution_api")).json()
+        (report,) = data["assignments"]
+        self.assertEqual(report["title"], "Homework")
+        self.assertEqual(report["letters"]["A"], 0)
+        self.assertEqual(report["letters"]["B"], 1)
+        self.assertEqual(report["letters"]["C"], 1)
+        self.assertEqual(report["letters"]["F"], 1)
+
+    def test_students_cannot_grade(self):
+        self.client.force_login(self.submissions[0].student)
+        response = self.grade([{"id": self.submissions[0].pk, "numeric_score": 99}])
+        self.assertEqual(response.status_code, 403)
+
+    def test_dashboard_queue_grades_filled_rows(self):
+        """Rows left blank on the queue page stay in the queue"""
+        url = reverse("dashboard:grading_queue")
+        self.assertContains(self.client.get(url), 'name="submission"', count=3)
+        pks = [s.pk for s in self.submissions]
+        response = self.client.post(
+            url,
+            {
+                "submission": pks,
+                f"score-{pks[0]}": "88",
+                f"score-{pks[1]}": "",
+                f"grade-{pks[2]}": "C",
+            },
+        )
+        self.assertRedirects(response, url)
+        self.assertEqual(
+            list(
+                AssignmentSubmission.objects.filter(status="graded")
+                .order_by("pk")
+                .values_list("grade", flat=True)
+            ),
+            ["B+", "C"],
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GradebookImportTestCase(TestCase):
+    """Test cases for importing grades from a spreadsheet"""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        material = Material.objects.create(
+            title="Fractions",
+            description="Practice problems",
+            material_type="worksheet",
+            subject=Subject.objects.create(name="Mathematics"),
+            difficulty_level="beginner",
+            grade_level="5",
+            estimated_time=30,
+            uploaded_by=self.teacher,
+            external_link="https://example.com/fractions",
+        )
+        self.assignment = Assignment.objects.create(
+            title="Homework",
+            description="Do the worksheet",
+            material=material,
+            due_date=timezone.now() + timezone.timedelta(days=7),
+            created_by=self.teacher,
+        )
+        self.ada, self.bob = [
+            User.objects.create_user(
+                username=name,
+                email=f"{name}@example.com",
+                password="password123",
+                user_type="student",
+                grade_level="5",
+                parent_email="parent@example.com",
+            )
+            for name in ("ada", "bob")
+        ]
+        self.submission = AssignmentSubmission.objects.create(
+            assignment=self.assignment, student=self.ada, submission_text="Answer"
+        )
+        # Bob did the work offline; only his progress record exists
+        self.progress = StudentProgress.objects.create(
+            student=self.bob, material=material, status="in_progress"
+        )
+
+    def sheet(self, rows):
+        output = StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["username", "assignment", "score", "grade", "feedback"])
+        writer.writerows(rows)
+        handle = tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False)
+        with handle:
+            handle.write(output.getvalue())
+        self.addCleanup(os.remove, handle.name)
+        return handle.name
+
+    def test_dry_run_prints_diff_without_saving(self):
+        path = self.sheet(
+            [
+                ["ada", "Homework", "91", "", "Well done"],
+                ["bob", self.assignment.pk, 78],
+            ]
+        )
+        out = StringIO()
+        call_command(
+            "import_grades", path, teacher="teacher1", dry_run=True, stdout=out
+        )
+        self.assertIn(
+            "Row 1: ada / Homework: None -> 91 A- (submission)", out.getvalue()
+        )
+        self.assertIn("Row 2: bob / Homework: None -> 78", out.getvalue())
+        self.submission.refresh_from_db()
+        self.assertIsNone(self.submission.numeric_score)
+
+    def test_import_updates_submissions_and_progress(self):
+        """Letters follow the submission scale; lookups don't grow per row"""
+        path = self.sheet(
+            [["ada", "homework", "91", "", "Well done"], ["bob", "Homework", "78", "B"]]
+        )
+        with open(path, "rb") as handle:
+            rows = read_gradebook(handle, path)
+        with self.assertNumQueries(4):
+            plan = plan_import(self.teacher, rows)
+        self.assertEqual(apply_import(self.teacher, plan), 2)
+
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.numeric_score, 91)
+        self.assertEqual(self.submission.grade, "A-")
+        self.assertEqual(self.submission.status, "graded")
+        self.assertEqual(self.submission.teacher_feedback, "Well done")
+        self.progress.refresh_from_db()
+        self.assertEqual(self.progress.score, 78)
+        self.assertEqual(self.progress.graded_by, self.teacher)
+
+        # Re-importing the same sheet changes nothing
+        self.assertEqual(plan_import(self.teacher, rows).unchanged, 2)
+
+    def test_import_keeps_revision_requests(self):
+        AssignmentSubmission.objects.filter(pk=self.submission.pk).update(
+            revision_requested=True, status="returned"
+        )
+        path = self.sheet([["ada", "Homework", "85"]])
+        with open(path, "rb") as handle:
+            rows = read_gradebook(handle, path)
+        with self.assertNumQueries(4):
+            plan = plan_import(self.teacher, rows)
+        apply_import(self.teacher, plan)
+
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.numeric_score, 85)
+        self.assertEqual(self.submission.status, "returned")
+
+    def test_invalid_rows_are_reported(self):
+        path = self.sheet(
+            [
+                ["ada", "Homework", "101"],
+                ["nobody", "Homework", "80"],
+                ["bob", "Other", "80"],
+                ["bob", "Homework", "80", "Z"],
+            ]
+        )
+        with open(path, "rb") as handle:
+            plan = plan_import(self.teacher, read_gradebook(handle, path))
+        self.assertEqual([number for number, _ in plan.errors], [1, 2, 3, 4])
+        self.assertEqual(plan.changes, [])
+
+    def test_xlsx_upload_on_dashboard(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        workbook.active.append(["Username", "Assignment", "Score"])
+        workbook.active.append(["ada", self.assignment.pk, 64])
+        output = BytesIO()
+        workbook.save(output)
+
+        self.client.force_login(self.teacher)
+        response = self.client.post(
+            reverse("dashboard:import_grades"),
+            {"gradebook": ContentFile(output.getvalue(), name="grades.xlsx")},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Changed")
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.grade, "D")
+
+    def test_corrupt_xlsx_is_reported(self):
+        """A sheet that is not a real workbook is an error, not a crash"""
+        self.client.force_login(self.teacher)
+        response = self.client.post(
+            reverse("dashboard:import_grades"),
+            {"gradebook": ContentFile(b"username,score\n", name="grades.xlsx")},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("gradebook", response.context["form"].errors)
+
+        handle = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
+        with handle:
+            handle.write(b"PK\x03\x04 truncated")
+        self.addCleanup(os.remove, handle.name)
+        with self.assertRaisesMessage(CommandError, "not a valid .xlsx workbook"):
+            call_command("import_grades", handle.name, teacher="teacher1")
+
+    def test_malformed_csv_is_reported(self):
+        """csv.Error, such as a field over the size limit, is a form error"""
+        data = "username,assignment,score\nada,Homework," + "9" * 200_000 + "\n"
+        self.client.force_login(self.teacher)
+        response = self.client.post(
+            reverse("dashboard:import_grades"),
+            {"gradebook": ContentFile(data.encode(), name="grades.csv")},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("not a valid CSV file", str(response.context["form"].errors))
+
+
+class GradingScaleTestCase(TestCase):
+    """Test cases for letter grades computed in Python, SQL and NumPy"""
+
+    SCORES = [None, 0, 59, 60, 69, 70, 79, 80, 89, 90, 100]
+
+    def setUp(self):
+        teacher = User.objects.create_user(
+            username="teacher1",
+            email="teacher@example.com",
+            password="password123",
+            user_type="teacher",
+        )
+        student = User.objects.create_user(
+            username="student1",
+            email="student@example.com",
+            password="password123",
+            user_type="student",
+            grade_level="5",
+            parent_email="parent@example.com",
+        )
+        subject = Subject.objects.create(name="Mathematics")
+        materials = Material.objects.bulk_create(
+            Material(
+                title=f"Worksheet {i}",
+                description="Practice problems",
+                material_type="worksheet",
+                subject=subject,
+                difficulty_level="beginner",
+                grade_level="5",
+                estimated_time=30,
+                uploaded_by=teacher,
+                external_link="https://example.com/sheet",
+            )
+            for i in range(len(self.SCORES))
+        )
+        StudentProgress.objects.bulk_create(
+            StudentProgress(
+                student=student, material=material, status="in_progress", score=score
+            )
+            for material, score in zip(materials, self.SCORES)
+        )
+
+    def test_sql_numpy_and_python_agree(self):
+        """The CASE annotation and the vectorized path match ``letter``"""
+        rows = StudentProgress.objects.annotate(
+            letter=PROGRESS_SCALE.case("score")
+        ).order_by("pk")
+        for progress in rows:
+            self.assertEqual(progress.letter, progress.grade_letter)
+
+        scores = list(range(101)) + [None]
+        vectorized = SUBMISSION_SCALE.letters(
+            [float("nan") if s is None else s for s in scores]
+        )
+        self.assertEqual(list(vectorized), [SUBMISSION_SCALE.letter(s) for s in scores])
+
+    def test_group_by_letter_in_the_database(self):
+        with self.assertNumQueries(1):
+            counts = PROGRESS_SCALE.distribution(StudentProgress.objects.all(), "score")
+        self.assertEqual(counts, {"A": 2, "B": 2, "C": 2, "D": 2, "F": 2})
+
+
+class GradebookExportTestCase(TestCase):
+    """Test cases for the students-by-assignments gradebook export"""
+
+    def setUp(self):
+        self.teacher, other = [
+            User.objects.create_user(
+                username=name,
+                email=f"{name}@example.com",
+                password="password123",
+                user_type="teacher",
+            )
+            for name in ("teacher1", "teacher2")
+        ]
+        material = Material.objects.create(
+            title="Fractions",
+            description="Practice problems",
+            material_type="worksheet",
+            subject=Subject.objects.create(name="Mathematics"),
+            difficulty_level="beginner",
+            grade_level="5",
+            estimated_time=30,
+            uploaded_by=self.teacher,
+            external_link="https://example.com/fractions",
+        )
+        now = timezone.now()
+        self.quiz, self.essay, elsewhere = [
+            Assignment.objects.create(
+                title=title,
+                description="Do the worksheet",
+                material=material,
+                due_date=now + timezone.timedelta(days=days),
+                created_by=teacher,
+            )
+            for title, days, teacher in (
+                ("Quiz", 1, self.teacher),
+                ("Essay", 2, self.teacher),
+                ("Elsewhere", 3, other),
+            )
+        ]
+        ada, bob, cal, dee = [
+            User.objects.create_user(
+                username=name,
+                email=f"{name}@example.com",
+                password="password123",
+                user_type="student",
+                grade_level="5",
+                parent_email="parent@example.com",
+                first_name=first_name,
+            )
+            for name, first_name in (
+                ("ada", "Ada"),
+                ("bob", "Bob"),
+                ("cal", "=HYPERLINK(1)"),
+                ("dee", "Dee"),
+            )
+        ]
+        self.essay.assigned_to.add(bob)
+        for assignment, student, score in (
+            (self.quiz, ada, 90),
+            (self.essay, ada, 75),
+            (self.essay, cal, None),
+            (elsewhere, dee, 50),
+        ):
+            AssignmentSubmission.objects.create(
+                assignment=assignment,
+                student=student,
+                submission_text="Answer",
+                numeric_score=score,
+            )
+
+    def test_csv_streams_one_row_per_student(self):
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse("dashboard:export_grades"))
+        self.assertTrue(response.streaming)
+        body = b"".join(response.streaming_content).decode()
+        self.assertIn("attachment", response["Content-Disposition"])
+        self.assertEqual(
+            list(csv.reader(StringIO(body))),
+            [
+                ["username", "name", "Quiz", "Essay"],
+                ["ada", "Ada", "90", "75"],
+                ["bob", "Bob", "", ""],
+                ["cal", "'=HYPERLINK(1)", "", ""],
+            ],
+        )
+        # Columns, students, and scores per chunk of students
+        with self.assertNumQueries(3):
+            list(gradebook_rows(self.teacher))
+
+    def test_student_leaving_mid_export_keeps_rows_aligned(self):
+        """Scores follow the students read, not a second ordered stream"""
+        from hub.gradebook import _export_students
+
+        bob = User.objects.get(username="bob")
+        AssignmentSubmission.objects.create(
+            assignment=self.quiz, student=bob, submission_text="Late", numeric_score=80
+        )
+
+        def ada_leaves(teacher):
+            students = _export_students(teacher)
+            User.objects.filter(username="ada").update(user_type="parent")
+            return students
+
+        with patch("hub.gradebook._export_students", side_effect=ada_leaves):
+            rows = list(gradebook_rows(self.teacher))
+        self.assertEqual(rows[1], ["bob", "Bob", 80, None])
+        self.assertEqual(rows[2][0], "cal")
+
+    def test_xlsx_export(self):
+        from openpyxl import load_workbook
+
+        self.client.force_login(self.teacher)
+        response = self.client.get(
+            reverse("dashboard:export_grades"), {"format": "xlsx"}
+        )
+        workbook = load_workbook(BytesIO(b"".join(response.streaming_content)))
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(rows[0], ("username", "name", "Quiz", "Essay"))
+        self.assertEqual(rows[1], ("ada", "Ada", 90, 75))
+        self.assertEqual(rows[3], ("cal", "'=HYPERLINK(1)", None, None))
+        self.assertEqual(len(rows), 4)
+
+    def test_students_cannot_export(self):
+        self.client.force_login(User.objects.get(username="ada"))
+        response = self.client.get(reverse("dashboard:export_grades"))
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,85 @@
+"""
+Preview rendering, run inside the preview process pool.
+
+Nothing here touches Django so worker processes start cheaply and cannot
+share database connections with the parent.
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+
+from PIL import Image, ImageOps
+
+PREVIEW_SIZE = (480, 480)
+PREVIEW_FORMAT = "JPEG"
+PREVIEW_EXTENSION = "jpg"
+PREVIEW_QUALITY = 80
+PDF_RENDER_DPI = 72
+PDF_RENDER_TIMEOUT = 30  # seconds
+
+IMAGE_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp", "image/bmp")
+
+
+def can_preview(mime_type):
+    """Whether ``render_preview`` knows how to handle this type"""
+    if mime_type in IMAGE_TYPES:
+        return True
+    return mime_type == "application/pdf" and shutil.which("pdftoppm") is not None
+
+
+def _thumbnail(image):
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(PREVIEW_SIZE)
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    output = io.BytesIO()
+    image.save(output, PREVIEW_FORMAT, quality=PREVIEW_QUALITY, optimize=True)
+    return output.getvalue()
+
+
+def _render_pdf_page(path):
+    """First page of a PDF as a PIL image, via poppler's pdftoppm"""
+    with tempfile.TemporaryDirectory() as workdir:
+        prefix = os.path.join(workdir, "page")
+        subprocess.run(
+            [
+                "pdftoppm",
+                "-f",
+                "1",
+                "-l",
+                "1",
+                "-r",
+                str(PDF_RENDER_DPI),
+                "-png",
+                "-singlefile",
+                path,
+                prefix,
+            ],
+            check=True,
+            capture_output=True,
+            timeout=PDF_RENDER_TIMEOUT,
+        )
+        with Image.open(f"{prefix}.png") as page:
+            page.load()
+            return page.copy()
+
+
+def render_preview(path, mime_type):
+    """JPEG thumbnail bytes for the file at ``path``, or None if unsupported"""
+    if mime_type in IMAGE_TYPES:
+        with Image.open(path) as image:
+            # Decode at reduced size where the format allows it
+            image.draft("RGB", PREVIEW_SIZE)
+            return _thumbnail(image)
+    if mime_type == "application/pdf" and shutil.which("pdftoppm"):
+        return _thumbnail(_render_pdf_page(path))
+    return None
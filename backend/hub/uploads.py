@@ -0,0 +1,255 @@
+"""
+Resumable uploads following the core of the tus 1.0 protocol.
+
+A client creates a session declaring the total size, then sends the bytes
+in one or more PATCH requests. Each PATCH streams straight from the request
+into a part file on local disk; the file's size is the current offset, so
+after a dropped connection the client asks for the offset (HEAD) and
+continues from there. A finished upload is handed to a model FileField by
+``open_completed_upload`` and moved into storage rather than copied.
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import locks
+from django.core.files.uploadedfile import UploadedFile
+from django.core.validators import FileExtensionValidator
+from django.utils import timezone
+
+from .files import file_extension, guess_mime_type
+from .models import AssignmentSubmission, Material, UploadSession
+
+TUS_VERSION = "1.0.0"
+TUS_EXTENSIONS = "creation,termination,checksum,expiration"
+
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # same limit as validate_file_size
+UPLOAD_EXPIRY = timedelta(hours=24)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Which FileField each kind of upload ends up in
+PURPOSE_FIELDS = {
+    "material": (Material, "file"),
+    "submission": (AssignmentSubmission, "submission_file"),
+}
+
+
+class UploadError(Exception):
+    """A protocol error with the HTTP status the client should receive"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def upload_dir():
+    """Directory holding part files (local disk, so they can be appended)"""
+    return getattr(settings, "RESUMABLE_UPLOAD_DIR", "") or os.path.join(
+        settings.MEDIA_ROOT, "partial-uploads"
+    )
+
+
+def part_path(session):
+    return os.path.join(upload_dir(), f"{session.pk}.part")
+
+
+def current_offset(session):
+    """Bytes received so far, read from the part file itself"""
+    try:
+        return os.path.getsize(part_path(session))
+    except FileNotFoundError:
+        return 0
+
+
+def allowed_extensions(purpose):
+    model, field_name = PURPOSE_FIELDS[purpose]
+    for validator in model._meta.get_field(field_name).validators:
+        if isinstance(validator, FileExtensionValidator):
+            return validator.allowed_extensions
+    return None
+
+
+def parse_metadata(header):
+    """Decode a tus ``Upload-Metadata`` header into a dict of strings"""
+    metadata = {}
+    for pair in (header or "").split(","):
+        key, _, value = pair.strip().partition(" ")
+        if not key:
+            continue
+        try:
+            metadata[key] = base64.b64decode(value, validate=True).decode()
+        except (binascii.Error, UnicodeDecodeError):
+            raise UploadError(f"Invalid metadata value for {key}")
+    return metadata
+
+
+def create_session(user, purpose, filename, size):
+    """Validate an upload up front and open a session for it"""
+    if purpose not in PURPOSE_FIELDS:
+        raise UploadError("Unknown upload purpose")
+    if purpose == "material" and not user.is_teacher:
+        raise UploadError("Only teachers can upload materials", status=403)
+    if purpose == "submission" and not user.is_student:
+        raise UploadError("Only students can upload submissions", status=403)
+
+    filename = os.path.basename(filename or "").strip()
+    if not filename:
+        raise UploadError("A filename is required")
+    extensions = allowed_extensions(purpose)
+    if extensions and file_extension(filename) not in extensions:
+        raise UploadError(f"Files of this type are not allowed: {filename}")
+    if size < 0:
+        raise UploadError("Invalid Upload-Length")
+    if size > MAX_UPLOAD_SIZE:
+        raise UploadError(
+            f"File too large ( > {MAX_UPLOAD_SIZE // (1024 * 1024)}MB )", status=413
+        )
+
+    session = UploadSession.objects.create(
+        user=user,
+        purpose=purpose,
+        filename=filename[:255],
+        size=size,
+        expires_at=timezone.now() + UPLOAD_EXPIRY,
+    )
+    os.makedirs(upload_dir(), exist_ok=True)
+    open(part_path(session), "ab").close()
+    if size == 0:
+        session.completed_at = timezone.now()
+        session.save(update_fields=["completed_at"])
+    return session
+
+
+def _parse_checksum(header):
+    """``Upload-Checksum: sha256 <base64>`` -> expected digest bytes"""
+    if not header:
+        return None
+    algorithm, _, value = header.strip().partition(" ")
+    if algorithm.lower() != "sha256":
+        raise UploadError("Unsupported checksum algorithm")
+    try:
+        return base64.b64decode(value, validate=True)
+    except binascii.Error:
+        raise UploadError("Invalid Upload-Checksum")
+
+
+def append_chunk(session, stream, offset, content_length=None, checksum=None):
+    """
+    Append bytes from ``stream`` to the session's part file.
+
+    The chunk is copied in fixed-size pieces, never held in memory whole.
+    It must start at the current offset, may not run past the declared
+    size, and is rolled back if it does not match ``Upload-Checksum``.
+    Returns the new offset.
+    """
+    if session.completed_at:
+        raise UploadError("Upload already complete", status=403)
+    if session.expires_at <= timezone.now():
+        raise UploadError("Upload session expired", status=410)
+    expected_digest = _parse_checksum(checksum)
+    remaining = session.size - offset
+    if content_length is not None and content_length > remaining:
+        raise UploadError("Chunk exceeds declared Upload-Length", status=413)
+
+    with open(part_path(session), "ab") as part:
+        # One writer per session; a second concurrent PATCH is a conflict
+        if not locks.lock(part, locks.LOCK_EX | locks.LOCK_NB):
+            raise UploadError("Upload is locked by another request", status=423)
+        try:
+            start = os.fstat(part.fileno()).st_size
+            if start != offset:
+                raise UploadError(
+                    f"Upload-Offset {offset} does not match {start}", status=409
+                )
+            digest = hashlib.sha256()
+            written = 0
+            while True:
+                chunk = stream.read(min(STREAM_CHUNK_SIZE, remaining - written + 1))
+                if not chunk:
+                    break
+                if written + len(chunk) > remaining:
+                    part.truncate(start)
+                    raise UploadError(
+                        "Chunk exceeds declared Upload-Length", status=413
+                    )
+                part.write(chunk)
+                digest.update(chunk)
+                written += len(chunk)
+            part.flush()
+            if expected_digest is not None and digest.digest() != expected_digest:
+                part.truncate(start)
+                raise UploadError("Checksum mismatch", status=460)
+        finally:
+            locks.unlock(part)
+
+    new_offset = start + written
+    if new_offset == session.size:
+        session.completed_at = timezone.now()
+        session.save(update_fields=["completed_at"])
+    return new_offset
+
+
+def discard_session(session):
+    """Delete a session and whatever part file it left behind"""
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+class CompletedUpload(UploadedFile):
+    """
+    A finished resumable upload, usable wherever ``request.FILES`` is.
+
+    ``temporary_file_path`` lets FileSystemStorage move the part file into
+    place instead of copying it.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._path = part_path(session)
+        super().__init__(
+            open(self._path, "rb"),
+            name=session.filename,
+            content_type=guess_mime_type(session.filename),
+            size=session.size,
+        )
+
+    def temporary_file_path(self):
+        return self._path
+
+
+def open_completed_upload(upload_id, user, purpose):
+    """The finished upload ``upload_id`` of ``user``, ready to assign"""
+    try:
+        session = UploadSession.objects.get(pk=upload_id, user=user, purpose=purpose)
+    except (UploadSession.DoesNotExist, ValidationError, ValueError):
+        raise ValidationError("Upload not found.")
+    if session.expires_at <= timezone.now():
+        # Awaiting purge_expired_sessions; its file may vanish at any moment
+        raise ValidationError("Upload has expired.")
+    if not session.completed_at or current_offset(session) != session.size:
+        raise ValidationError("Upload is not complete yet.")
+    return CompletedUpload(session)
+
+
+def finish_upload(upload):
+    """Close a consumed CompletedUpload and drop its session"""
+    upload.close()
+    discard_session(upload.session)
+
+
+def purge_expired_sessions(now=None):
+    """Remove sessions past their expiry; returns how many were removed"""
+    expired = UploadSession.objects.filter(expires_at__lte=now or timezone.now())
+    count = 0
+    for session in expired.iterator():
+        discard_session(session)
+        count += 1
+    return count
@@ -7,6 +7,21 @@ app_name = "hub"
 urlpatterns = [
     path("", views.materials_list, name="materials_list"),
     path("material/<int:pk>/", views.material_detail, name="material_detail"),
+    path(
+        "material/<int:pk>/download/",
+        views.download_material,
+        name="download_material",
+    ),
+    path(
+        "material/<int:pk>/preview/",
+        views.material_preview,
+        name="material_preview",
+    ),
+    path(
+        "submission/<int:pk>/preview/",
+        views.submission_preview,
+        name="submission_preview",
+    ),
     path("assignments/", views.assignments_list, name="assignments_list"),
     path(
         "assignment/<int:assignment_id>/",
@@ -18,5 +33,26 @@ urlpatterns = [
         views.submit_assignment,
         name="submit_assignment",
     ),
+    path("calendar/<str:token>.ics", views.calendar_feed, name="calendar_feed"),
     path("progress/", views.progress_view, name="progress"),
+    path("search/", views.search, name="search"),
+    path("api/materials/", views.materials_api, name="materials_api"),
+    path("api/materials/facets/", views.facets_api, name="facets_api"),
+    path("api/search/", views.search_api, name="search_api"),
+    path("api/materials/trending/", views.trending_api, name="trending_api"),
+    path("api/assignments/", views.assignments_api, name="assignments_api"),
+    path("api/grading/queue/", views.grading_queue_api, name="grading_queue_api"),
+    path("api/grading/grade/", views.bulk_grade_api, name="bulk_grade_api"),
+    path(
+        "api/grading/distribution/",
+        views.grade_distribution_api,
+        name="grade_distribution_api",
+    ),
+    path("api/tags/", views.tags_api, name="tags_api"),
+    path("api/uploads/", views.uploads_api, name="uploads_api"),
+    path(
+        "api/uploads/<uuid:upload_id>/",
+        views.upload_detail,
+        name="upload_detail",
+    ),
 ]
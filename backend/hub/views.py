@@ -1,38 +1,541 @@
 import json
+import os
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db import models
-from django.http import JsonResponse
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.fields.files import FieldFile
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_http_methods
+
+from . import conditional
+from .cache import get_version, user_namespace
+from .catalog import catalog_facets, catalog_page, serialize_material
+from .counters import record_download
+from .downloads import serve_file
+from .feed import assignment_feed, feed_queryset, serialize_assignment
+from .forms import (AssignmentFeedForm, CatalogFilterForm, GradingQueueForm,
+                    MaterialSearchForm, TagLookupForm, TrendingForm)
+from .grade_scales import SUBMISSION_SCALE
+from .grading import (MAX_BULK_GRADES, GradingError, bulk_grade,
+                      grade_distribution, grading_page, is_teacher,
+                      serialize_submission, validate_grades)
+from .ical import calendar_body, feed_state, feed_token, feed_user_id
+from .models import (Assignment, AssignmentSubmission, Material,
+                     StudentProgress, UploadSession)
+from .pagination import InvalidCursor
+from .popularity import decayed_score, trending_materials
+from .recommendations import RECOMMENDATIONS_CACHE_NAMESPACE, similar_materials
+from .roster import can_submit
+from .search import search_materials
+from .submissions import schedule_processing
+from .tags import popular_tags
+from .uploads import (MAX_UPLOAD_SIZE, TUS_EXTENSIONS, TUS_VERSION,
+                      UploadError, append_chunk, create_session,
+                      current_offset, discard_session, finish_upload,
+                      open_completed_upload, parse_metadata)
+
+
+def _page_url(request, cursor):
+    """Current URL pointed at another cursor, keeping the active filters"""
+    params = request.GET.copy()
+    params.pop("cursor", None)
+    if cursor:
+        params["cursor"] = cursor
+    return f"{request.path}?{params.urlencode()}"
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=conditional.materials_list_etag)
+def materials_list(request):
+    """List available materials, one keyset-paginated page at a time"""
+    form = CatalogFilterForm(request.GET)
+    filters = form.cleaned_data if form.is_valid() else {}
+    try:
+        materials, next_cursor = catalog_page(filters)
+    except InvalidCursor:
+        filters = {**filters, "cursor": None}
+        materials, next_cursor = catalog_page(filters)
+
+    context = {
+        "materials": materials,
+        "filter_form": form,
+        "facets": catalog_facets(),
+        "next_page_url": _page_url(request, next_cursor) if next_cursor else None,
+        "first_page_url": _page_url(request, None) if filters.get("cursor") else None,
+    }
+    return render(request, "hub/materials_list.html", context)
+
+
+def materials_api(request):
+    """JSON version of the materials catalog"""
+    form = CatalogFilterForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    try:
+        materials, next_cursor = catalog_page(form.cleaned_data)
+    except InvalidCursor as e:
+        return JsonResponse({"errors": {"cursor": [str(e)]}}, status=400)
+
+    return JsonResponse(
+        {
+            "results": [serialize_material(material) for material in materials],
+            "next_cursor": next_cursor,
+            "next": _page_url(request, next_cursor) if next_cursor else None,
+        }
+    )
 
-from users.firebase_utils import send_submission_notification
 
-from .models import Assignment, AssignmentSubmission, Material, StudentProgress
+def facets_api(request):
+    """Facet counts for the materials catalog sidebar"""
+    return JsonResponse(catalog_facets())
 
 
-def materials_list(request):
-    """List all available materials"""
-    materials = Material.objects.filter(is_active=True)
-    return render(request, "hub/materials_list.html", {"materials": materials})
+def trending_api(request):
+    """Materials with the most recent downloads and progress, hottest first"""
+    form = TrendingForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+
+    materials = trending_materials(limit=form.cleaned_data["limit"] or 10)
+    return JsonResponse(
+        {
+            "results": [
+                {
+                    **serialize_material(material),
+                    "trend": round(decayed_score(material.popularity_score), 3),
+                }
+                for material in materials
+            ]
+        }
+    )
+
 
+def tags_api(request):
+    """Tags with their precomputed material counts, most used first"""
+    form = TagLookupForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
 
+    tags = popular_tags(
+        prefix=form.cleaned_data["prefix"], limit=form.cleaned_data["limit"] or 50
+    )
+    return JsonResponse(
+        {
+            "results": [
+                {"name": tag.name, "material_count": tag.material_count} for tag in tags
+            ]
+        }
+    )
+
+
+def search(request):
+    """Ranked full-text search over materials"""
+    form = MaterialSearchForm(request.GET)
+    query = form.cleaned_data["q"] if form.is_valid() else ""
+    hits = (
+        search_materials(query, limit=form.cleaned_data.get("limit") or 20)
+        if query
+        else []
+    )
+    return render(
+        request, "hub/search.html", {"form": form, "query": query, "hits": hits}
+    )
+
+
+def search_api(request):
+    """JSON version of material search with highlighted fragments"""
+    form = MaterialSearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+
+    hits = search_materials(
+        form.cleaned_data["q"], limit=form.cleaned_data.get("limit") or 20
+    )
+    return JsonResponse(
+        {
+            "query": form.cleaned_data["q"],
+            "results": [
+                {
+                    **serialize_material(hit["material"]),
+                    "rank": hit["rank"],
+                    "title_html": hit["title_html"],
+                    "snippet_html": hit["snippet_html"],
+                }
+                for hit in hits
+            ],
+        }
+    )
+
+
+@cache_control(private=True, no_cache=True)
+@condition(
+    etag_func=conditional.material_detail_etag,
+    last_modified_func=conditional.material_detail_last_modified,
+)
 def material_detail(request, pk):
     """Show details of a specific material"""
-    material = get_object_or_404(Material, pk=pk)
-    return render(request, "hub/material_detail.html", {"material": material})
+    # The page body is a fragment cached on the material's and subject's
+    # updated_at, so a repeat view costs only this one query, shared with
+    # the validators
+    material = conditional.detail_material(request, pk)
+    if material is None:
+        raise Http404("No Material matches the given query.")
+    context = {
+        "material": material,
+        # Lazy: only queried when the panel's own fragment is not cached
+        "similar_materials": similar_materials(material.pk),
+        "recommendations_version": get_version(RECOMMENDATIONS_CACHE_NAMESPACE),
+    }
+    return render(request, "hub/material_detail.html", context)
 
 
-def assignments_list(request):
-    """List student assignments"""
-    # If logged in, show assigned assignments; otherwise show all
-    if request.user.is_authenticated and request.user.user_type == "student":
-        assignments = Assignment.objects.filter(assigned_to=request.user)
+@login_required
+def download_material(request, pk):
+    """Deliver a material's file to signed-in users"""
+    material = get_object_or_404(
+        Material.objects.only(
+            "id",
+            "file",
+            "original_filename",
+            "file_size",
+            "file_mime_type",
+            "file_sha256",
+            "external_link",
+            "is_active",
+            "uploaded_by",
+            "updated_at",
+        ),
+        pk=pk,
+    )
+    if not material.is_active and not (
+        request.user.is_teacher or material.uploaded_by_id == request.user.pk
+    ):
+        raise Http404("Material not available")
+
+    if not material.file and not material.external_link:
+        raise Http404("Material has no file")
+
+    if not material.file:
+        record_download(material.pk)
+        return redirect(material.external_link)
+    response = serve_file(
+        request,
+        material.file,
+        filename=material.download_filename,
+        size=material.file_size,
+        etag=material.file_sha256 or None,
+        last_modified=material.updated_at,
+        content_type=material.file_mime_type or None,
+    )
+    # Revalidations send no body, and media players fetch in several ranges;
+    # count full responses and the first range only
+    range_header = request.META.get("HTTP_RANGE", "").replace(" ", "")
+    if response.status_code == 200 or (
+        response.status_code == 206 and range_header.startswith("bytes=0-")
+    ):
+        record_download(material.pk)
+    return response
+
+
+def _serve_preview(request, instance):
+    """Thumbnail response; immutable when the URL names the current content"""
+    if not instance.preview_name:
+        raise Http404("No preview available")
+    fieldfile = getattr(instance, instance.FILE_FIELD)
+    preview = FieldFile(instance, fieldfile.field, instance.preview_name)
+    response = serve_file(
+        request,
+        preview,
+        filename=os.path.basename(instance.preview_name),
+        etag=instance.file_sha256 or None,
+        content_type="image/jpeg",
+    )
+    if instance.file_sha256 and request.GET.get("v") == instance.file_sha256[:16]:
+        response["Cache-Control"] = "private, max-age=31536000, immutable"
     else:
-        assignments = Assignment.objects.all()
-    return render(request, "hub/assignments_list.html", {"assignments": assignments})
+        response["Cache-Control"] = "private, max-age=300"
+    return response
+
+
+@login_required
+def material_preview(request, pk):
+    """Thumbnail of a material's file, for the same users as the download"""
+    material = get_object_or_404(
+        Material.objects.only(
+            "id", "file", "file_sha256", "preview_name", "is_active", "uploaded_by"
+        ),
+        pk=pk,
+    )
+    if not material.is_active and not (
+        request.user.is_teacher or material.uploaded_by_id == request.user.pk
+    ):
+        raise Http404("Material not available")
+    return _serve_preview(request, material)
+
+
+@login_required
+def submission_preview(request, pk):
+    """Thumbnail of a submission, for its student and the assignment's teacher"""
+    # Same scope as the grading queue: other teachers' classes are not found
+    submission = get_object_or_404(
+        AssignmentSubmission.objects.filter(
+            Q(student=request.user) | Q(assignment__created_by=request.user)
+        ).only("id", "student", "submission_file", "file_sha256", "preview_name"),
+        pk=pk,
+    )
+    return _serve_preview(request, submission)
+
+
+def _tus_response(status=204, **headers):
+    response = HttpResponse(status=status)
+    response["Tus-Resumable"] = TUS_VERSION
+    for name, value in headers.items():
+        response[name.replace("_", "-")] = str(value)
+    return response
+
+
+def _header_int(request, name):
+    value = request.headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise UploadError(f"Invalid {name} header")
+
+
+@login_required
+@require_http_methods(["OPTIONS", "POST"])
+def uploads_api(request):
+    """Create a resumable upload (tus ``creation`` extension)"""
+    if request.method == "OPTIONS":
+        return _tus_response(
+            Tus_Version=TUS_VERSION,
+            Tus_Extension=TUS_EXTENSIONS,
+            Tus_Max_Size=MAX_UPLOAD_SIZE,
+            Tus_Checksum_Algorithm="sha256",
+        )
+
+    try:
+        size = _header_int(request, "Upload-Length")
+        if size is None:
+            raise UploadError("Upload-Length is required")
+        metadata = parse_metadata(request.headers.get("Upload-Metadata"))
+        session = create_session(
+            request.user, metadata.get("purpose"), metadata.get("filename"), size
+        )
+    except UploadError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+
+    return _tus_response(
+        201,
+        Location=reverse("hub:upload_detail", args=[session.pk]),
+        Upload_Offset=0,
+        Upload_Expires=http_date(session.expires_at.timestamp()),
+    )
+
+
+@login_required
+@require_http_methods(["HEAD", "PATCH", "DELETE"])
+def upload_detail(request, upload_id):
+    """Report (HEAD), extend (PATCH) or cancel (DELETE) a resumable upload"""
+    session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+
+    if request.method == "DELETE":
+        discard_session(session)
+        return _tus_response()
+
+    if request.method == "HEAD":
+        return _tus_response(
+            200,
+            Upload_Offset=current_offset(session),
+            Upload_Length=session.size,
+            Upload_Expires=http_date(session.expires_at.timestamp()),
+            Cache_Control="no-store",
+        )
+
+    if request.content_type != "application/offset+octet-stream":
+        return JsonResponse({"error": "Unsupported content type"}, status=415)
+    try:
+        offset = _header_int(request, "Upload-Offset")
+        if offset is None:
+            raise UploadError("Upload-Offset is required")
+        new_offset = append_chunk(
+            session,
+            request,
+            offset,
+            content_length=_header_int(request, "Content-Length"),
+            checksum=request.headers.get("Upload-Checksum"),
+        )
+    except UploadError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+
+    return _tus_response(
+        Upload_Offset=new_offset,
+        Upload_Expires=http_date(session.expires_at.timestamp()),
+    )
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=conditional.assignments_list_etag)
+def assignments_list(request):
+    """List student assignments, one keyset-paginated page at a time"""
+    # Students see their own assignments; everyone else sees all of them
+    form = AssignmentFeedForm(request.GET)
+    params = form.cleaned_data if form.is_valid() else {}
+    try:
+        assignments, next_cursor = assignment_feed(
+            request.user, params.get("cursor"), params.get("limit")
+        )
+    except InvalidCursor:
+        params = {**params, "cursor": None}
+        assignments, next_cursor = assignment_feed(
+            request.user, None, params.get("limit")
+        )
+
+    context = {
+        "assignments": assignments,
+        "total": feed_queryset(request.user).count(),
+        "next_page_url": _page_url(request, next_cursor) if next_cursor else None,
+        "first_page_url": _page_url(request, None) if params.get("cursor") else None,
+    }
+    if getattr(request.user, "user_type", None) in ("student", "parent"):
+        context["calendar_url"] = request.build_absolute_uri(
+            reverse("hub:calendar_feed", args=[feed_token(request.user)])
+        )
+    return render(request, "hub/assignments_list.html", context)
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=conditional.calendar_feed_etag)
+def calendar_feed(request, token):
+    """iCalendar feed of due dates for a student or a parent's children"""
+    user_id = feed_user_id(token)
+    if user_id is None:
+        raise Http404("Unknown calendar")
+    etag, members = feed_state(user_id)
+
+    def link(assignment):
+        return request.build_absolute_uri(
+            reverse("hub:assignment_detail", args=[assignment.pk])
+        )
+
+    body = calendar_body(user_id, etag, members, link)
+    response = HttpResponse(body, content_type="text/calendar; charset=utf-8")
+    response["Content-Disposition"] = 'inline; filename="assignments.ics"'
+    return response
+
+
+def assignments_api(request):
+    """JSON version of the assignment feed"""
+    form = AssignmentFeedForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    try:
+        assignments, next_cursor = assignment_feed(
+            request.user, form.cleaned_data["cursor"], form.cleaned_data["limit"]
+        )
+    except InvalidCursor as e:
+        return JsonResponse({"errors": {"cursor": [str(e)]}}, status=400)
+
+    return JsonResponse(
+        {
+            "results": [serialize_assignment(a) for a in assignments],
+            "next_cursor": next_cursor,
+            "next": _page_url(request, next_cursor) if next_cursor else None,
+        }
+    )
+
+
+@login_required
+def grading_queue_api(request):
+    """A teacher's ungraded submissions, one keyset-paginated page at a time"""
+    if not is_teacher(request.user):
+        return JsonResponse({"error": "Only teachers can grade work"}, status=403)
+    form = GradingQueueForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    try:
+        submissions, next_cursor = grading_page(
+            request.user,
+            form.cleaned_data["assignment"],
+            form.cleaned_data["cursor"],
+            form.cleaned_data["limit"],
+        )
+    except InvalidCursor as e:
+        return JsonResponse({"errors": {"cursor": [str(e)]}}, status=400)
+
+    return JsonResponse(
+        {
+            "results": [serialize_submission(s) for s in submissions],
+            "next_cursor": next_cursor,
+            "next": _page_url(request, next_cursor) if next_cursor else None,
+        }
+    )
+
+
+@login_required
+def grade_distribution_api(request):
+    """Letter-grade counts per assignment, computed in the database"""
+    if not is_teacher(request.user):
+        return JsonResponse(
+            {"error": "Only teachers can see grade reports"}, status=403
+        )
+    form = GradingQueueForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    return JsonResponse(
+        {
+            "scale": list(SUBMISSION_SCALE.choices),
+            "assignments": grade_distribution(
+                request.user, form.cleaned_data["assignment"]
+            ),
+        }
+    )
+
+
+@login_required
+@require_http_methods(["POST"])
+def bulk_grade_api(request):
+    """Grade many submissions in one transaction"""
+    if not is_teacher(request.user):
+        return JsonResponse({"error": "Only teachers can grade work"}, status=403)
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    rows = payload.get("grades") if isinstance(payload, dict) else None
+    if not isinstance(rows, list) or not 1 <= len(rows) <= MAX_BULK_GRADES:
+        return JsonResponse(
+            {"error": f"Send a list of 1-{MAX_BULK_GRADES} grades"}, status=400
+        )
+
+    grades, errors = validate_grades(rows)
+    if errors:
+        return JsonResponse({"errors": errors}, status=400)
+    try:
+        submissions = bulk_grade(request.user, grades)
+    except GradingError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(
+        {
+            "graded": len(submissions),
+            "results": [
+                {"id": s.pk, "numeric_score": s.numeric_score, "grade": s.grade}
+                for s in submissions
+            ],
+        }
+    )
 
 
 def progress_view(request):
@@ -128,10 +631,7 @@ def submit_assignment(request, assignment_id):
     assignment = get_object_or_404(Assignment, pk=assignment_id)
 
     # Check if user is authorized to submit this assignment
-    if (
-        request.user.user_type != "student"
-        or request.user not in assignment.assigned_to.all()
-    ):
+    if not can_submit(request.user, assignment.pk):
         messages.error(request, "You are not authorized to submit this assignment.")
         return redirect("hub:assignments_list")
 
@@ -145,6 +645,25 @@ def submit_assignment(request, assignment_id):
         submission_notes = request.POST.get("submission_notes", "").strip()
         submission_file = request.FILES.get("submission_file")
 
+        # A file sent earlier through the resumable upload API
+        upload = None
+        upload_id = request.POST.get("upload_id")
+        if not submission_file and upload_id:
+            try:
+                upload = submission_file = open_completed_upload(
+                    upload_id, request.user, "submission"
+                )
+            except ValidationError as e:
+                messages.error(request, e.messages[0])
+                return render(
+                    request,
+                    "hub/submit_assignment.html",
+                    {
+                        "assignment": assignment,
+                        "existing_submission": existing_submission,
+                    },
+                )
+
         # Validate that at least one form of submission is provided
         if not submission_text and not submission_file:
             messages.error(
@@ -157,38 +676,35 @@ def submit_assignment(request, assignment_id):
             )
 
         try:
-            if existing_submission:
-                # Update existing submission
-                existing_submission.submission_text = submission_text
-                existing_submission.submission_notes = submission_notes
+            with transaction.atomic():
+                submission = existing_submission or AssignmentSubmission(
+                    assignment=assignment, student=request.user
+                )
+                submission.submission_text = submission_text
+                submission.submission_notes = submission_notes
                 if submission_file:
-                    existing_submission.submission_file = submission_file
-                existing_submission.status = "submitted"
-                existing_submission.save()
-                send_submission_notification(existing_submission)
+                    submission.submission_file = submission_file
+                submission.status = "submitted"
+                # Checksum, preview and the teacher's notification run after
+                # the response, in hub.submissions
+                submission.save(defer_metadata=True)
+                schedule_processing(submission)
+            if existing_submission:
                 messages.success(
                     request, "Your assignment has been updated successfully!"
                 )
             else:
-                # Create new submission
-                submission = AssignmentSubmission.objects.create(
-                    assignment=assignment,
-                    student=request.user,
-                    submission_text=submission_text,
-                    submission_notes=submission_notes,
-                    submission_file=submission_file,
-                    status="submitted",
-                )
-                send_submission_notification(submission)
                 messages.success(
                     request, "Your assignment has been submitted successfully!"
                 )
-                # Send notification
-                send_submission_notification(request.user, assignment)
 
+            if upload:
+                finish_upload(upload)
             return redirect("hub:assignments_list")
 
         except Exception as e:
+            if upload:
+                upload.close()
             messages.error(request, f"Error submitting assignment: {str(e)}")
 
     return render(
@@ -198,24 +714,32 @@ def submit_assignment(request, assignment_id):
     )
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=conditional.assignment_detail_etag)
 def assignment_detail(request, assignment_id):
     """View assignment details"""
-    assignment = get_object_or_404(Assignment, pk=assignment_id)
-
-    # Check if user has submitted this assignment
-    submission = None
-    if request.user.is_authenticated and request.user.user_type == "student":
-        submission = AssignmentSubmission.objects.filter(
-            assignment=assignment, student=request.user
+    # Loaded once for the validators and the page
+    assignment = conditional.detail_assignment(request, assignment_id)
+    if assignment is None:
+        raise Http404("No Assignment matches the given query.")
+    user = request.user
+    is_student = user.is_authenticated and user.user_type == "student"
+
+    # Evaluated only when the per-user panel is not already cached
+    def load_submission():
+        if not is_student:
+            return None
+        return AssignmentSubmission.objects.filter(
+            assignment=assignment, student=user
         ).first()
 
     context = {
         "assignment": assignment,
-        "submission": submission,
-        "can_submit": (
-            request.user.is_authenticated
-            and request.user.user_type == "student"
-            and request.user in assignment.assigned_to.all()
+        "submission": SimpleLazyObject(load_submission),
+        "can_submit": SimpleLazyObject(lambda: can_submit(user, assignment.pk)),
+        # Bumped when this user's submissions or assignments change
+        "user_version": (
+            get_version(user_namespace(user.pk)) if user.is_authenticated else 0
         ),
     }
 
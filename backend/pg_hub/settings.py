@@ -263,6 +263,16 @@ else:
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Protected downloads: "nginx" (X-Accel-Redirect), "apache" (X-Sendfile),
+# or empty to stream files from Django with Range support
+SENDFILE_BACKEND = config("SENDFILE_BACKEND", default="")
+SENDFILE_URL_PREFIX = config("SENDFILE_URL_PREFIX", default="/protected-media/")
+
+# Seconds between write-behind flushes of buffered material download counts
+DOWNLOAD_COUNTER_FLUSH_INTERVAL = config(
+    "DOWNLOAD_COUNTER_FLUSH_INTERVAL", default=30, cast=int
+)
+
 # Templates directory
 TEMPLATES[0]["DIRS"] = [BASE_DIR / "templates"]
 
@@ -323,6 +333,18 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 1000
 
+# Partial files of resumable uploads (local disk; defaults to MEDIA_ROOT/partial-uploads)
+RESUMABLE_UPLOAD_DIR = config("RESUMABLE_UPLOAD_DIR", default="")
+
+# Processes rendering upload thumbnails in the background (0 = render inline)
+PREVIEW_WORKERS = config("PREVIEW_WORKERS", default=2, cast=int)
+
+# Threads copying cohort members onto new assignment rosters (0 = inline)
+ROSTER_FANOUT_WORKERS = config("ROSTER_FANOUT_WORKERS", default=1, cast=int)
+
+# Threads checksumming, previewing and announcing new submissions (0 = inline)
+SUBMISSION_WORKERS = config("SUBMISSION_WORKERS", default=2, cast=int)
+
 # Cache Configuration (for production)
 REDIS_URL = config("REDIS_URL", default="")
 if REDIS_URL:
@@ -10,10 +10,16 @@ from users.models import CustomUser, FirebaseToken
 
 logger = logging.getLogger(__name__)
 
+MULTICAST_LIMIT = 500
+
 # Initialize Firebase Admin SDK
 _firebase_app = None
 
 
+class NotificationError(Exception):
+    """Raised by strict sends when the notifications could not be sent"""
+
+
 def initialize_firebase():
     """Initialize Firebase Admin SDK"""
     global _firebase_app
@@ -52,7 +58,10 @@ def initialize_firebase():
 
 
 def send_notification_to_tokens(
-    tokens: List[str], notification_data: Dict[str, Any], data: Dict[str, str] = None
+    tokens: List[str],
+    notification_data: Dict[str, Any],
+    data: Dict[str, str] = None,
+    strict: bool = False,
 ) -> int:
     """
     Send notification to specific FCM tokens
@@ -61,6 +70,8 @@ def send_notification_to_tokens(
         tokens: List of FCM tokens
         notification_data: Notification payload with title, body, etc.
         data: Optional data payload
+        strict: Raise NotificationError instead of returning 0 when Firebase
+            is not configured or the send fails, so callers can retry
 
     Returns:
         Number of successful sends
@@ -68,9 +79,23 @@ def send_notification_to_tokens(
     if not tokens:
         return 0
 
+    # FCM accepts at most MULTICAST_LIMIT tokens per multicast
+    if len(tokens) > MULTICAST_LIMIT:
+        return sum(
+            send_notification_to_tokens(
+                tokens[start : start + MULTICAST_LIMIT],
+                notification_data,
+                data,
+                strict=strict,
+            )
+            for start in range(0, len(tokens), MULTICAST_LIMIT)
+        )
+
     app = initialize_firebase()
     if not app:
         logger.error("Firebase not initialized - cannot send notifications")
+        if strict:
+            raise NotificationError("Firebase is not initialized")
         return 0
 
     try:
@@ -137,11 +162,16 @@ def send_notification_to_tokens(
 
     except Exception as e:
         logger.error(f"Error sending notification: {str(e)}")
+        if strict:
+            raise NotificationError(str(e)) from e
         return 0
 
 
 def send_notification_to_user(
-    user: CustomUser, notification_data: Dict[str, Any], data: Dict[str, str] = None
+    user: CustomUser,
+    notification_data: Dict[str, Any],
+    data: Dict[str, str] = None,
+    strict: bool = False,
 ) -> int:
     """
     Send notification to all active devices of a user
@@ -150,6 +180,7 @@ def send_notification_to_user(
         user: User to send notification to
         notification_data: Notification payload
         data: Optional data payload
+        strict: Raise NotificationError when the send fails
 
     Returns:
         Number of successful sends
@@ -163,7 +194,9 @@ def send_notification_to_user(
         logger.info(f"No active FCM tokens found for user {user.username}")
         return 0
 
-    return send_notification_to_tokens(list(active_tokens), notification_data, data)
+    return send_notification_to_tokens(
+        list(active_tokens), notification_data, data, strict=strict
+    )
 
 
 def send_notification_to_users(
@@ -196,8 +229,21 @@ def send_notification_to_users(
     return send_notification_to_tokens(list(active_tokens), notification_data, data)
 
 
-def send_assignment_notification(assignment, action="created"):
-    """Send notification about assignment updates"""
+def send_assignment_notification(
+    assignment, action="created", student_ids=None, strict=False
+):
+    """
+    Send notification about assignment updates
+
+    Args:
+        assignment: The assignment concerned
+        action: "created", "graded" or "due_soon"
+        student_ids: Students to notify; defaults to the whole roster
+        strict: Raise NotificationError when the send fails
+
+    Returns:
+        Number of successful sends
+    """
     if action == "created":
         title = "New Assignment"
         body = f"You have a new assignment: {assignment.title}"
@@ -218,8 +264,15 @@ def send_assignment_notification(assignment, action="created"):
 
     data = {"type": "assignment", "assignment_id": str(assignment.id), "action": action}
 
-    # Send to the student
-    return send_notification_to_user(assignment.student, notification_data, data)
+    # Send to the students, batched into multicasts
+    if student_ids is None:
+        student_ids = assignment.assigned_to.values_list("id", flat=True)
+    active_tokens = FirebaseToken.objects.filter(
+        user_id__in=student_ids, is_active=True
+    ).values_list("token", flat=True)
+    return send_notification_to_tokens(
+        list(active_tokens), notification_data, data, strict=strict
+    )
 
 
 def send_chat_notification(message, room):
@@ -250,7 +303,7 @@ def send_progress_notification(user, achievement):
     return send_notification_to_user(user, notification_data, data)
 
 
-def send_submission_notification(submission):
+def send_submission_notification(submission, strict=False):
     """Send notification when student submits assignment"""
     title = "Assignment Submitted"
     body = f"{submission.student.get_full_name()} submitted '{submission.assignment.title}'"
@@ -270,7 +323,7 @@ def send_submission_notification(submission):
 
     # Send to the teacher who created the assignment
     return send_notification_to_user(
-        submission.assignment.created_by, notification_data, data
+        submission.assignment.created_by, notification_data, data, strict=strict
     )
 
 